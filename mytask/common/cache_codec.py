@@ -0,0 +1,140 @@
+import zlib
+from abc import ABC, abstractmethod
+from typing import Literal, TypeVar
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+M = TypeVar("M", bound=BaseModel)
+
+CodecName = Literal["json", "orjson", "msgpack"]
+CompressionName = Literal["none", "zlib", "zstd"]
+
+
+class CacheCodec(ABC):
+    """Turns cache entries into bytes for Redis and back."""
+
+    @abstractmethod
+    def dumps(self, entry: BaseModel) -> bytes: ...
+
+    @abstractmethod
+    def loads(self, entry_type: type[M], data: bytes) -> M: ...
+
+
+class JsonCodec(CacheCodec):
+    """JSON through pydantic-core, the payload is never materialized as Python dicts."""
+
+    def dumps(self, entry: BaseModel) -> bytes:
+        return entry.model_dump_json().encode()
+
+    def loads(self, entry_type: type[M], data: bytes) -> M:
+        return entry_type.model_validate_json(data)
+
+
+class OrjsonCodec(CacheCodec):
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is required for OrjsonCodec")
+
+    def dumps(self, entry: BaseModel) -> bytes:
+        return orjson.dumps(entry.model_dump(mode="json"))
+
+    def loads(self, entry_type: type[M], data: bytes) -> M:
+        return entry_type.model_validate(orjson.loads(data))
+
+
+class MsgpackCodec(CacheCodec):
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack is required for MsgpackCodec")
+
+    def dumps(self, entry: BaseModel) -> bytes:
+        return msgpack.packb(entry.model_dump(mode="json"))
+
+    def loads(self, entry_type: type[M], data: bytes) -> M:
+        return entry_type.model_validate(msgpack.unpackb(data))
+
+
+class CompressedCodec(CacheCodec):
+    """
+    Compresses payloads of another codec above a size threshold.
+
+    Every payload starts with a one-byte header telling how it was compressed, so the
+    threshold and the algorithm can be changed without flushing the cache.
+    """
+
+    _RAW = b"\x00"
+    _ZLIB = b"\x01"
+    _ZSTD = b"\x02"
+
+    def __init__(
+        self,
+        codec: CacheCodec,
+        algorithm: Literal["zlib", "zstd"] = "zlib",
+        threshold: int = 64 * 1024,
+        level: int = 3,
+    ):
+        if algorithm == "zstd" and zstandard is None:
+            raise ImportError("zstandard is required for zstd compression")
+
+        self.codec = codec
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.level = level
+
+    def dumps(self, entry: BaseModel) -> bytes:
+        data = self.codec.dumps(entry)
+        if len(data) < self.threshold:
+            return self._RAW + data
+        if self.algorithm == "zstd":
+            return self._ZSTD + zstandard.ZstdCompressor(level=self.level).compress(data)
+        return self._ZLIB + zlib.compress(data, self.level)
+
+    def loads(self, entry_type: type[M], data: bytes) -> M:
+        header, payload = data[:1], data[1:]
+        # Corrupt payloads raise ValueError like undecodable ones, so they're cache misses
+        if header == self._ZLIB:
+            try:
+                payload = zlib.decompress(payload)
+            except zlib.error as e:
+                raise ValueError(f"Corrupt zlib compressed cache entry: {e}") from e
+        elif header == self._ZSTD:
+            if zstandard is None:
+                raise ValueError("Cache entry is zstd compressed but zstandard is missing")
+            try:
+                payload = zstandard.ZstdDecompressor().decompress(payload)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"Corrupt zstd compressed cache entry: {e}") from e
+        elif header != self._RAW:
+            raise ValueError(f"Unknown compression header {header!r}")
+        return self.codec.loads(entry_type, payload)
+
+
+def make_codec(
+    name: CodecName = "json",
+    compression: CompressionName = "none",
+    compression_threshold: int = 64 * 1024,
+) -> CacheCodec:
+    codecs: dict[str, type[CacheCodec]] = {
+        "json": JsonCodec,
+        "orjson": OrjsonCodec,
+        "msgpack": MsgpackCodec,
+    }
+    codec = codecs[name]()
+    if compression == "none":
+        return codec
+    return CompressedCodec(codec, algorithm=compression, threshold=compression_threshold)
@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class CacheStatus(str, Enum):
+    FRESH = "fresh"
+    STALE = "stale"
+    MISS = "miss"
+    # Not cached, served from the database while the value is computed in the background
+    DATABASE = "database"
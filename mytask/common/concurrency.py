@@ -0,0 +1,190 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel
+
+from mytask.common.logger import get_logger
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+
+class LimiterStats(BaseModel):
+    limit: int
+    in_flight: int
+    # Callers waiting for a slot
+    queued: int
+    # Baseline latency the limit is adapted against, None before the first call
+    min_latency: float | None
+    errors: int
+
+
+class LimiterSlot:
+    def __init__(self):
+        # Requests made while holding the slot
+        self.requests = 1
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to how the backend responds, AIMD on a latency gradient.
+
+    The limit grows by about one per round of calls while latencies stay within `tolerance`
+    times the lowest latency seen, and is cut by `backoff` on errors, timeouts and latencies
+    above that. The lowest latency slowly drifts up so the baseline follows a backend that
+    got permanently slower.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        backoff: float = 0.5,
+        tolerance: float = 2.0,
+        drift: float = 0.01,
+    ):
+        """
+        Initialize the AdaptiveLimiter.
+
+        Args:
+            initial_limit (int): The concurrency limit to start with.
+            min_limit (int): The limit never goes below this.
+            max_limit (int): The limit never goes above this.
+            backoff (float): The factor the limit is multiplied with on errors and slow calls.
+            tolerance (float): How many times the lowest latency counts as slow.
+            drift (float): The fraction the lowest latency rises by with every call.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.drift = drift
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._queued = 0
+        self._errors = 0
+        self._min_latency: float | None = None
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def stats(self) -> LimiterStats:
+        return LimiterStats(
+            limit=self.limit,
+            in_flight=self._in_flight,
+            queued=self._queued,
+            min_latency=self._min_latency,
+            errors=self._errors,
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[LimiterSlot]:
+        """
+        Wait for a free slot and hold it, the time it's held is the latency of the call.
+
+        Calls making several requests set `requests` on the slot, the latency is averaged
+        over them so it compares to the latency of single requests.
+        """
+        self._queued += 1
+        try:
+            async with self._condition:
+                await self._condition.wait_for(lambda: self._in_flight < self.limit)
+                self._in_flight += 1
+        finally:
+            self._queued -= 1
+
+        slot = LimiterSlot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except BaseException as e:
+            # Cancelled callers say nothing about the backend
+            if not isinstance(e, asyncio.CancelledError):
+                self._on_error()
+            raise
+        else:
+            self._on_success((time.monotonic() - started) / max(slot.requests, 1))
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    async def run(
+        self,
+        func: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+        retries: int = 0,
+        retry_delay: float = 1.0,
+        requests: Callable[[T], int] | None = None,
+    ) -> T:
+        """
+        Run `func` in a slot with a timeout, retrying on errors.
+
+        Retries wait a random delay of up to `retry_delay * 2 ** attempt` seconds, without
+        holding the slot.
+
+        Args:
+            func (Callable[[], Awaitable[T]]): The call to run, called again on retries.
+            timeout (float | None): Seconds one attempt may take.
+            retries (int): How often a failed or timed out attempt is retried.
+            retry_delay (float): The base of the exponential retry delay.
+            requests (Callable[[T], int] | None): The number of requests a call made, from its
+                result, e.g. the pages of a paginated query. A call is one request if not set.
+
+        Returns:
+            T: The result of `func`.
+        """
+        for attempt in range(retries):
+            try:
+                return await self._run_once(func, timeout, requests)
+            except Exception as e:
+                delay = random.uniform(0, retry_delay * 2**attempt)
+                logger.warning(f"Call failed, retrying in {delay:.1f}s: {e!r}")
+                await asyncio.sleep(delay)
+
+        return await self._run_once(func, timeout, requests)
+
+    async def _run_once(
+        self,
+        func: Callable[[], Awaitable[T]],
+        timeout: float | None,
+        requests: Callable[[T], int] | None,
+    ) -> T:
+        async with self.slot() as slot:
+            result = await asyncio.wait_for(func(), timeout)
+            if requests is not None:
+                slot.requests = requests(result)
+            return result
+
+    def _on_success(self, latency: float) -> None:
+        if self._min_latency is None or latency < self._min_latency:
+            self._min_latency = latency
+        else:
+            self._min_latency *= 1 + self.drift
+
+        if latency > self._min_latency * self.tolerance:
+            self._decrease()
+        elif self._in_flight >= self.limit:
+            # Only grow while the limit is actually reached, about +1 per round of calls
+            self._limit = min(self._limit + 1 / self._limit, self.max_limit)
+
+    def _on_error(self) -> None:
+        self._errors += 1
+        self._decrease()
+
+    def _decrease(self) -> None:
+        # Calls failing together are one overload, back off once per baseline latency
+        now = time.monotonic()
+        if now - self._last_decrease < (self._min_latency or 0):
+            return
+        self._last_decrease = now
+        self._limit = max(self._limit * self.backoff, self.min_limit)
+        logger.info(f"Lowered the concurrency limit to {self.limit}")
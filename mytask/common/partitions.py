@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from mytask.common.logger import get_logger
+
+logger = get_logger()
+
+
+class DailyPartitions:
+    """
+    Daily range partitions of a PostgreSQL table partitioned by a timestamp column.
+
+    Partitions are named `<table>_YYYYMMDD` and cover one UTC day. `ensure` creates the
+    partitions up to `premake_days` ahead so writes never miss one, `drop_expired` drops the
+    partitions older than `retention_days`, which is far cheaper than deleting rows.
+    """
+
+    def __init__(self, table_name: str, retention_days: int, premake_days: int = 7):
+        """
+        Initialize the DailyPartitions.
+
+        Args:
+            table_name (str): The partitioned table.
+            retention_days (int): Days of partitions to keep, including today.
+            premake_days (int): Days of partitions to create ahead of today.
+        """
+        self.table_name = table_name
+        self.retention_days = retention_days
+        self.premake_days = premake_days
+
+    def partition_name(self, day: date) -> str:
+        return f"{self.table_name}_{day:%Y%m%d}"
+
+    async def ensure(
+        self, connection: AsyncConnection, today: date | None = None
+    ) -> list[str]:
+        """Create partitions from yesterday to `premake_days` ahead, returns their names."""
+        today = today or datetime.now(timezone.utc).date()
+        names = []
+        # From yesterday, reads of blocks just before midnight are written after it
+        for offset in range(-1, self.premake_days + 1):
+            day = today + timedelta(days=offset)
+            name = self.partition_name(day)
+            await connection.execute(
+                text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{self.table_name}" '
+                    f"FOR VALUES FROM ('{day.isoformat()} 00:00+00') "
+                    f"TO ('{(day + timedelta(days=1)).isoformat()} 00:00+00')"
+                )
+            )
+            names.append(name)
+        return names
+
+    async def drop_expired(
+        self, connection: AsyncConnection, today: date | None = None
+    ) -> list[str]:
+        """Drop the partitions older than `retention_days`, returns their names."""
+        today = today or datetime.now(timezone.utc).date()
+        oldest = today - timedelta(days=self.retention_days - 1)
+        result = await connection.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": self.table_name},
+        )
+
+        dropped = []
+        for name in result.scalars():
+            day = self._partition_day(name)
+            if day is None or day >= oldest:
+                continue
+            await connection.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+            dropped.append(name)
+        if dropped:
+            logger.info(f"Dropped expired partitions {dropped}")
+        return dropped
+
+    def _partition_day(self, name: str) -> date | None:
+        # Partitions not created here, like a default partition, are left alone
+        prefix = f"{self.table_name}_"
+        if not name.startswith(prefix):
+            return None
+        try:
+            return datetime.strptime(name[len(prefix) :], "%Y%m%d").date()
+        except ValueError:
+            return None
@@ -1,81 +1,540 @@
+import asyncio
 import inspect
-import json
-from functools import wraps
-from typing import (
-    Any,
-    Callable,
-    Dict,
-    List,
-    Optional,
-    TypeVar,
-    get_args,
-    get_origin,
-)
+import math
+import random
+import time
+from functools import lru_cache, wraps
+from typing import Any, Awaitable, Callable, Generic, Optional, TypeVar, get_args
+from uuid import uuid4
 
 from pydantic import BaseModel
 from redis.asyncio import Redis
 
+from mytask.common.cache_codec import CacheCodec, JsonCodec
+from mytask.common.cache_status import CacheStatus
+from mytask.common.local_cache import LocalCache
+from mytask.common.logger import get_logger
+
 RT = TypeVar("RT")
 
+logger = get_logger()
+
+# Delete the lock only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class CacheEntry(BaseModel, Generic[RT]):
+    value: RT
+    # Unix timestamps of the soft and the hard TTL
+    fresh_until: float
+    expires_at: float
+    # Seconds it took to compute the value
+    delta: float = 0
+
+    def is_stale(self) -> bool:
+        return time.time() >= self.fresh_until
+
+    def should_refresh(self, beta: float = 0) -> bool:
+        now = time.time()
+        if beta > 0 and self.delta > 0:
+            # XFetch: -log(u) is exponentially distributed, so refreshes spread out before expiry
+            now -= self.delta * beta * math.log(1 - random.random())
+        return now >= self.fresh_until
+
+
+@lru_cache(maxsize=None)
+def cache_entry_type(result_type: Any) -> type[CacheEntry]:
+    """The `CacheEntry` model of a result type, pydantic compiles its validator once per type."""
+    if result_type is inspect.Signature.empty:
+        result_type = Any
+    return CacheEntry[result_type]
+
+
+class CacheInvalidation(BaseModel):
+    origin: str
+    keys: list[str]
+
 
 class RedisCache:
-    def __init__(self, redis: Redis, default_ttl: int = 60 * 2):
+    def __init__(
+        self,
+        redis: Redis,
+        default_ttl: int = 60 * 2,
+        local_cache: LocalCache | None = None,
+        invalidation_channel: str = "mytask:cache:invalidate",
+        codec: CacheCodec | None = None,
+    ):
+        """
+        Initialize the RedisCache.
+
+        Args:
+            redis (Redis): The Redis client.
+            default_ttl (int): The TTL in seconds used when `set` is called without one.
+            local_cache (LocalCache | None): Optional in-process tier in front of Redis.
+            invalidation_channel (str): The Redis pub/sub channel every write is broadcast on, so
+                other processes drop their local copies.
+            codec (CacheCodec | None): Serializes entries for Redis, JSON if not set.
+        """
         self.redis = redis
         self.default_ttl = default_ttl
+        self.local_cache = local_cache
+        self.invalidation_channel = invalidation_channel
+        self.codec = codec or JsonCodec()
+        self.instance_id = uuid4().hex
+        self._listener: asyncio.Task | None = None
+        self._invalidation_callbacks: list[Callable[[list[str] | None], None]] = []
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
 
     async def get(self, key: str, result_type: type[RT]) -> Optional[RT]:
-        data = await self.redis.get(key)
-        if data is None:
+        entry = await self.get_entry(key, result_type)
+        if entry is None:
             return None
+        return entry.value
+
+    async def get_entry(self, key: str, result_type: type[RT]) -> Optional[CacheEntry]:
+        """
+        Get a cache entry together with its freshness metadata.
+
+        Entries are returned until their hard TTL passes, use `CacheEntry.is_stale` to check
+        whether the soft TTL has passed.
+        """
+        entries = await self.get_many_entries([key], result_type)
+        return entries.get(key)
 
-        parsed_data = json.loads(data)
-        return self._parse_with_type(parsed_data, result_type)
+    async def get_many(self, keys: list[str], result_type: type[RT]) -> dict[str, RT]:
+        """Get several values of the same type in one round trip, missing keys are left out."""
+        entries = await self.get_many_entries(keys, result_type)
+        return {key: entry.value for key, entry in entries.items()}
 
-    def _parse_with_type(self, data: Any, type_hint: Any) -> Any:
-        # Handle single Pydantic model
-        if inspect.isclass(type_hint) and issubclass(type_hint, BaseModel):
-            return type_hint.model_validate(data)
+    async def get_many_entries(
+        self, keys: list[str], result_type: type[RT]
+    ) -> dict[str, CacheEntry]:
+        entries: dict[str, CacheEntry] = {}
+        missing = list(keys)
+        if self.local_cache is not None:
+            self.ensure_listener()
+            missing = []
+            for key in keys:
+                entry = self.local_cache.get(key)
+                if entry is None:
+                    missing.append(key)
+                else:
+                    entries[key] = entry
 
-        # Handle container types (list, dict)
-        origin = get_origin(type_hint)
-        if origin is not None:
-            args = get_args(type_hint)
+        if not missing:
+            return entries
 
-            # Handle lists
-            if origin is list or origin is List:
-                item_type = args[0]
-                return [self._parse_with_type(item, item_type) for item in data]
+        entry_type = cache_entry_type(result_type)
+        for key, data in zip(missing, await self.redis.mget(missing)):
+            if data is None:
+                continue
 
-            # Handle dictionaries
-            elif origin is dict or origin is Dict:
-                key_type, value_type = args
-                return {
-                    k: self._parse_with_type(v, value_type) for k, v in data.items()
-                }
+            try:
+                entry = self.codec.loads(entry_type, data)
+            except ValueError:
+                # Also covers pydantic's ValidationError and corrupt compressed payloads
+                logger.warning(f"Ignoring cache entry {key} with an unknown or corrupt format")
+                continue
 
-        # Default case for primitive types
-        return data
+            entries[key] = entry
+            if self.local_cache is not None:
+                self.local_cache.set(key, entry, entry.expires_at - time.time())
+        return entries
 
     async def set(
         self,
         key: str,
         value: Any,
         ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        delta: float = 0,
+        value_type: Any = None,
+        fresh_until: Optional[float] = None,
+        expires_at: Optional[float] = None,
     ) -> None:
-        if isinstance(value, BaseModel):
-            data = value.model_dump_json()
-        elif isinstance(value, list) and value and isinstance(value[0], BaseModel):
-            data = json.dumps([item.model_dump() for item in value])
-        elif (
-            isinstance(value, dict)
-            and value
-            and isinstance(next(iter(value.values())), BaseModel)
+        """
+        Set a value in the cache.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value, pydantic models and containers of them are supported.
+            ttl (int | None): Seconds the value is fresh for, `default_ttl` if not set.
+            stale_ttl (int | None): Extra seconds the value is kept and served as stale.
+            delta (float): Seconds it took to compute the value, used for early refreshes.
+            value_type (Any): The type of the value, serialization is inferred at runtime if not set.
+            fresh_until (float | None): Timestamp the value is fresh until, `expires_at` if not
+                set. Only used together with `expires_at`.
+            expires_at (float | None): Timestamp the value expires at, replaces `ttl` and
+                `stale_ttl`, to keep the expiry of a value that is updated in place.
+        """
+        await self.set_many(
+            {key: value},
+            ttl=ttl,
+            stale_ttl=stale_ttl,
+            delta=delta,
+            value_type=value_type,
+            fresh_until=fresh_until,
+            expires_at=expires_at,
+        )
+
+    async def set_many(
+        self,
+        values: dict[str, Any],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        delta: float = 0,
+        value_type: Any = None,
+        fresh_until: Optional[float] = None,
+        expires_at: Optional[float] = None,
+    ) -> None:
+        """Set several values of the same type in one pipelined round trip, see `set`."""
+        if not values:
+            return
+
+        now = time.time()
+        if expires_at is None:
+            ttl = ttl or self.default_ttl
+            fresh_until = now + ttl
+            expires_at = fresh_until + (stale_ttl or 0)
+        elif fresh_until is None:
+            fresh_until = expires_at
+        # In milliseconds, an absolute expiry rarely falls on a whole second
+        hard_ttl_ms = max(math.ceil((expires_at - now) * 1000), 1)
+        entry_type = cache_entry_type(value_type or Any)
+        # The values are trusted, only their serializer is needed
+        entries = {
+            key: entry_type.model_construct(
+                value=value,
+                fresh_until=fresh_until,
+                expires_at=expires_at,
+                delta=delta,
+            )
+            for key, value in values.items()
+        }
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, entry in entries.items():
+                pipe.set(key, self.codec.dumps(entry), px=hard_ttl_ms)
+            await pipe.execute()
+
+        if self.local_cache is not None:
+            for key, entry in entries.items():
+                self.local_cache.set(key, entry, hard_ttl_ms / 1000)
+        await self._publish_invalidation(list(entries))
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: list[str]) -> None:
+        if not keys:
+            return
+
+        await self.redis.delete(*keys)
+
+        if self.local_cache is not None:
+            for key in keys:
+                self.local_cache.delete(key)
+        await self._publish_invalidation(keys)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        result_type: type[RT],
+        compute: Callable[[], Awaitable[RT]],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        early_refresh_beta: float = 0,
+        lock_ttl: float = 30,
+        lock_wait: float = 10,
+        fallback: Optional[
+            Callable[[Optional[CacheEntry]], Awaitable[Optional[tuple[RT, CacheStatus]]]]
+        ] = None,
+    ) -> tuple[RT, CacheStatus]:
+        """
+        Get a value from the cache, computing and caching it on a miss.
+
+        Concurrent misses for the same key in this process share a single computation, and
+        processes coordinate through a short-lived Redis lock so only one of them computes
+        while the others wait for the result.
+
+        With `stale_ttl`, a value past its TTL is still returned right away for another
+        `stale_ttl` seconds while a single background refresh runs. With `early_refresh_beta`,
+        fresh values are refreshed probabilistically before they expire, the closer to expiry
+        and the slower to compute the likelier (XFetch). 1.0 is a sensible value.
+
+        Args:
+            key (str): The cache key.
+            result_type (type[RT]): The type used to parse the cached value.
+            compute (Callable[[], Awaitable[RT]]): Produces the value on a miss.
+            ttl (int | None): Seconds the value is fresh for.
+            stale_ttl (int | None): Extra seconds a stale value is served while refreshing.
+            early_refresh_beta (float): Aggressiveness of early refreshes, 0 disables them.
+            lock_ttl (float): Seconds until the lock expires if its holder dies.
+            lock_wait (float): Max seconds to wait for another process before computing anyway.
+            fallback (Callable | None): Called with the entry when it's missing or stale, before
+                computing or serving it. A value and status it returns are served instead, as
+                they are, None goes on as usual. It gets the entry that was already read, so
+                callers don't read the key again to decide.
+
+        Returns:
+            tuple[RT, CacheStatus]: The value and whether it was fresh, stale or computed.
+        """
+        entry = await self.get_entry(key, result_type)
+        if fallback is not None and (entry is None or entry.is_stale()):
+            answer = await fallback(entry)
+            if answer is not None:
+                return answer
+
+        if entry is not None:
+            if entry.should_refresh(early_refresh_beta):
+                self._refresh_in_background(
+                    key, result_type, compute, ttl, stale_ttl, lock_ttl
+                )
+            status = CacheStatus.STALE if entry.is_stale() else CacheStatus.FRESH
+            return entry.value, status
+
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(
+                self._compute_with_lock(
+                    key, result_type, compute, ttl, stale_ttl, lock_ttl, lock_wait
+                )
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: _forget_task(self._inflight, key, t))
+
+        # Shield so a cancelled caller doesn't cancel the computation for the others
+        return await asyncio.shield(task), CacheStatus.MISS
+
+    async def _compute_with_lock(
+        self,
+        key: str,
+        result_type: type[RT],
+        compute: Callable[[], Awaitable[RT]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int],
+        lock_ttl: float,
+        lock_wait: float,
+    ) -> RT:
+        lock_key = f"lock:{key}"
+        token = uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lock_wait
+
+        acquired = False
+        while not acquired:
+            acquired = await self._acquire_lock(lock_key, token, lock_ttl)
+            if acquired:
+                break
+
+            cached = await self._wait_for_value(key, result_type, lock_key, deadline)
+            if cached is not None:
+                return cached
+
+            if loop.time() >= deadline:
+                logger.warning(f"Timed out waiting for lock {lock_key}, computing anyway")
+                break
+
+        try:
+            return await self._compute_and_set(
+                key, result_type, compute, ttl, stale_ttl
+            )
+        finally:
+            if acquired:
+                await self._release_lock(lock_key, token)
+
+    async def _wait_for_value(
+        self,
+        key: str,
+        result_type: type[RT],
+        lock_key: str,
+        deadline: float,
+    ) -> Optional[RT]:
+        """Poll until the lock holder has cached the value, released the lock or the deadline passed."""
+        loop = asyncio.get_running_loop()
+        delay = 0.05
+        while loop.time() < deadline:
+            await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+            delay = min(delay * 2, 0.5)
+
+            cached = await self.get(key, result_type)
+            if cached is not None:
+                return cached
+            if not await self.redis.exists(lock_key):
+                return None
+        return None
+
+    def refresh(
+        self,
+        key: str,
+        result_type: type[RT],
+        compute: Callable[[], Awaitable[RT]],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        lock_ttl: float = 30,
+    ) -> None:
+        """Recompute a value in background, unless this or another process is already doing it."""
+        self._refresh_in_background(key, result_type, compute, ttl, stale_ttl, lock_ttl)
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        result_type: Any,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int],
+        lock_ttl: float,
+    ) -> None:
+        task = self._refreshing.get(key)
+        if (
+            task is not None
+            and not task.done()
+            and task.get_loop() is asyncio.get_running_loop()
+        ):
+            return
+
+        task = asyncio.create_task(
+            self._refresh(key, result_type, compute, ttl, stale_ttl, lock_ttl)
+        )
+        self._refreshing[key] = task
+        task.add_done_callback(lambda t: _forget_task(self._refreshing, key, t))
+
+    async def _refresh(
+        self,
+        key: str,
+        result_type: Any,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int],
+        lock_ttl: float,
+    ) -> None:
+        lock_key = f"lock:{key}"
+        token = uuid4().hex
+        # Another process is already refreshing it
+        if not await self._acquire_lock(lock_key, token, lock_ttl):
+            return
+
+        try:
+            logger.info(f"Refreshing cache entry {key} in background")
+            await self._compute_and_set(key, result_type, compute, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Failed to refresh cache entry {key}: {e}")
+        finally:
+            await self._release_lock(lock_key, token)
+
+    async def _compute_and_set(
+        self,
+        key: str,
+        result_type: type[RT],
+        compute: Callable[[], Awaitable[RT]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int],
+    ) -> RT:
+        started = time.monotonic()
+        result = await compute()
+        await self.set(
+            key,
+            result,
+            ttl,
+            stale_ttl=stale_ttl,
+            delta=time.monotonic() - started,
+            value_type=result_type,
+        )
+        return result
+
+    async def _acquire_lock(self, lock_key: str, token: str, lock_ttl: float) -> bool:
+        return bool(
+            await self.redis.set(lock_key, token, nx=True, px=int(lock_ttl * 1000))
+        )
+
+    async def _release_lock(self, lock_key: str, token: str) -> None:
+        await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _publish_invalidation(self, keys: list[str]) -> None:
+        message = CacheInvalidation(origin=self.instance_id, keys=keys)
+        await self.redis.publish(self.invalidation_channel, message.model_dump_json())
+
+    def add_invalidation_callback(
+        self, callback: Callable[[list[str] | None], None]
+    ) -> None:
+        """
+        Call `callback` with the keys written or deleted by other processes.
+
+        The keys are None when invalidations may have been missed, so anything derived from
+        the cache should be dropped. Invalidations are received once `ensure_listener` was called.
+        """
+        self._invalidation_callbacks.append(callback)
+
+    def remove_invalidation_callback(
+        self, callback: Callable[[list[str] | None], None]
+    ) -> None:
+        """Stop calling a callback added with `add_invalidation_callback`."""
+        if callback in self._invalidation_callbacks:
+            self._invalidation_callbacks.remove(callback)
+
+    def ensure_listener(self) -> None:
+        """Start listening for invalidations from other processes, if not already."""
+        if (
+            self._listener is not None
+            and not self._listener.done()
+            and self._listener.get_loop() is asyncio.get_running_loop()
         ):
-            data = json.dumps({k: v.model_dump() for k, v in value.items()})
-        else:
-            data = json.dumps(value)
+            return
+        self._listener = asyncio.create_task(self._listen_invalidations())
 
-        await self.redis.set(key, data, ex=ttl or self.default_ttl)
+    async def _listen_invalidations(self) -> None:
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(self.invalidation_channel)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                invalidation = CacheInvalidation.model_validate_json(message["data"])
+                if invalidation.origin == self.instance_id:
+                    continue
+                self._invalidate_local(invalidation.keys)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Without invalidations the local entries can't be trusted anymore.
+            # The listener is restarted by the next `get`.
+            logger.error(f"Cache invalidation listener failed: {e}")
+            self._invalidate_local(None)
+        finally:
+            await pubsub.aclose()
+
+    def _invalidate_local(self, keys: list[str] | None) -> None:
+        if self.local_cache is not None:
+            if keys is None:
+                self.local_cache.clear()
+            else:
+                for key in keys:
+                    self.local_cache.delete(key)
+
+        for callback in self._invalidation_callbacks:
+            try:
+                callback(keys)
+            except Exception as e:
+                logger.error(f"Cache invalidation callback failed: {e}")
+
+
+def _forget_task(tasks: dict[str, asyncio.Task], key: str, task: asyncio.Task) -> None:
+    if tasks.get(key) is task:
+        del tasks[key]
+    # Mark the exception as retrieved, callers that are still waiting get it anyway
+    if not task.cancelled():
+        task.exception()
 
 
 def redis_cache(
@@ -83,9 +542,16 @@ def redis_cache(
     prefix: str = "cache",
     ttl: Optional[int] = None,
     key_builder: Optional[Callable[..., str]] = None,
+    single_flight: bool = True,
+    stale_ttl: Optional[int] = None,
+    early_refresh_beta: float = 0,
+    lock_ttl: float = 30,
+    lock_wait: float = 10,
 ):
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         return_type = inspect.signature(func).return_annotation
+        # Compile the entry validator once at decoration time
+        cache_entry_type(return_type)
 
         @wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> Any:
@@ -97,6 +563,19 @@ def redis_cache(
                 key_builder=key_builder,
             )
 
+            if single_flight:
+                result, _ = await redis_cache.get_or_compute(
+                    cache_key,
+                    return_type,
+                    lambda: func(*args, **kwargs),
+                    ttl=ttl,
+                    stale_ttl=stale_ttl,
+                    early_refresh_beta=early_refresh_beta,
+                    lock_ttl=lock_ttl,
+                    lock_wait=lock_wait,
+                )
+                return result
+
             cached = await redis_cache.get(cache_key, return_type)
             if cached is not None:
                 return cached
@@ -107,6 +586,8 @@ def redis_cache(
                 key=cache_key,
                 value=result,
                 ttl=ttl,
+                stale_ttl=stale_ttl,
+                value_type=return_type,
             )
 
             return result
@@ -116,6 +597,63 @@ def redis_cache(
     return decorator
 
 
+def redis_cache_batch(
+    redis_cache: RedisCache,
+    prefix: str = "cache",
+    ttl: Optional[int] = None,
+    key_builder: Optional[Callable[..., str]] = None,
+    stale_ttl: Optional[int] = None,
+):
+    """
+    Batch variant of `redis_cache` for functions like `async def f(items: list[K]) -> dict[K, V]`.
+
+    All items are looked up in one round trip, the function is only called with the items
+    that missed, and their results are cached in one pipelined round trip. Items the function
+    leaves out of its result are not cached. `key_builder` gets a single item.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        return_type = inspect.signature(func).return_annotation
+        _, value_type = get_args(return_type) or (Any, Any)
+        # Compile the entry validator once at decoration time
+        cache_entry_type(value_type)
+
+        @wraps(func)
+        async def wrapper(items: list[Any], *args: Any, **kwargs: Any) -> dict[Any, Any]:
+            keys = {
+                item: _build_cache_key(
+                    prefix=prefix,
+                    func=func,
+                    args=(item, *args),
+                    kwargs=kwargs,
+                    key_builder=key_builder,
+                )
+                for item in items
+            }
+
+            cached = await redis_cache.get_many(list(keys.values()), value_type)
+            results = {item: cached[key] for item, key in keys.items() if key in cached}
+
+            missing = [item for item in keys if item not in results]
+            if not missing:
+                return results
+
+            computed = await func(missing, *args, **kwargs)
+            await redis_cache.set_many(
+                {keys[item]: value for item, value in computed.items() if item in keys},
+                ttl=ttl,
+                stale_ttl=stale_ttl,
+                value_type=value_type,
+            )
+
+            results.update(computed)
+            return results
+
+        return wrapper
+
+    return decorator
+
+
 def _build_cache_key(
     prefix: str,
     func: Callable[..., Any],
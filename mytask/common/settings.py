@@ -2,9 +2,18 @@ from functools import lru_cache
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from mytask.common.cache_codec import CodecName, CompressionName
+
 
 class MyTaskSettings(BaseSettings):
     postgres_dsn: str
+    # Connections kept open per process, plus up to `max_overflow` more under load. Waiting
+    # for a connection times out after `pool_timeout` seconds, connections are replaced
+    # after `pool_recycle` seconds.
+    postgres_pool_size: int = 5
+    postgres_max_overflow: int = 10
+    postgres_pool_timeout: float = 30
+    postgres_pool_recycle: int = 30 * 60
     redis_host: str
     redis_port: int
     redis_password: str
@@ -14,6 +23,54 @@ class MyTaskSettings(BaseSettings):
 
     auth_token: str
 
+    # In-process cache tier in front of Redis, 0 disables it
+    cache_local_maxsize: int = 256
+    cache_local_ttl: float = 60
+
+    # Serialization of cache entries in Redis, see `mytask.common.cache_codec`
+    cache_codec: CodecName = "json"
+    cache_compression: CompressionName = "none"
+    cache_compression_threshold: int = 64 * 1024
+
+    # Celery beat refreshes all dividends ahead of their 1 hour TTL. Subnet queries are
+    # started `stagger` seconds apart plus up to `jitter` random seconds.
+    dividends_refresh_interval: int = 50 * 60
+    dividends_refresh_stagger: float = 0.5
+    dividends_refresh_jitter: float = 1.0
+
+    # Chain queries are spread over `substrate_pool_size` connections to each endpoint.
+    # Staking goes through the subtensor of `subtensor_network`.
+    substrate_endpoints: list[str] = ["wss://test.finney.opentensor.ai:443"]
+    substrate_pool_size: int = 4
+    substrate_health_check_interval: float = 30
+    subtensor_network: str = "test"
+    # Runtime metadata is kept here per runtime version so connecting skips downloading it,
+    # empty to always download
+    substrate_metadata_cache_dir: str = ".cache/runtime-metadata"
+
+    # Concurrent subnet queries adapt between 1 and `substrate_concurrency_max` to the node's
+    # latency. Every query has a timeout and is retried with a random backoff.
+    substrate_concurrency_initial: int = 16
+    substrate_concurrency_max: int = 128
+    substrate_query_timeout: float = 60
+    substrate_query_retries: int = 2
+
+    # `tao_dividends` is partitioned by day on PostgreSQL. Celery beat creates partitions
+    # `premake_days` ahead and drops the ones older than `retention_days`.
+    dividends_history_retention_days: int = 90
+    dividends_partition_premake_days: int = 7
+
+    # Refreshed dividends waiting to be written to `tao_dividends` in the background. When
+    # it's full, refreshes wait a few seconds for the writes before dropping theirs.
+    dividends_write_queue_size: int = 64
+
+    # Cache misses are answered from `tao_dividends` while the chain is queried in the
+    # background, if the persisted dividends are at most this many seconds old. 0 disables it.
+    dividends_fallback_max_age: int = 2 * 60 * 60
+
+    # Follow new blocks and refresh every subnet as soon as its epoch has passed
+    dividends_block_aware: bool = True
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
@@ -1,9 +1,16 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
+from contextlib import asynccontextmanager
+from functools import cache
+from typing import (Any, AsyncIterator, Dict, Generic, List, Optional, Sequence,
+                    Type, TypeVar)
 
+from psycopg import sql
+from pydantic import TypeAdapter
+from sqlalchemy import Row, Select
 from sqlalchemy import delete as sa_delete
-from sqlalchemy import select
+from sqlalchemy import insert, select, tuple_
 from sqlalchemy import update as sa_update
-from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import (AsyncConnection, AsyncEngine, AsyncSession,
                                     async_sessionmaker, create_async_engine)
 
 from mytask.common.base import MyTaskBaseDAO, MyTaskBaseModel
@@ -17,7 +24,8 @@ S = TypeVar("S", bound=MyTaskBaseModel)
 @singleton
 def get_async_engine() -> AsyncEngine:
     # Convert the standard PostgreSQL URL to use the async driver
-    dsn = get_settings().postgres_dsn
+    settings = get_settings()
+    dsn = settings.postgres_dsn
     # If URL starts with postgresql://, change to postgresql+psycopg://
     if dsn.startswith("postgresql://"):
         dsn = dsn.replace("postgresql://", "postgresql+psycopg://", 1)
@@ -25,15 +33,57 @@ def get_async_engine() -> AsyncEngine:
         dsn,
         future=True,
         pool_pre_ping=True,
+        pool_size=settings.postgres_pool_size,
+        max_overflow=settings.postgres_max_overflow,
+        pool_recycle=settings.postgres_pool_recycle,
+        pool_timeout=settings.postgres_pool_timeout,
     )
 
 
 @singleton
 def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
-    return async_sessionmaker(get_async_engine())
+    # Rows stay readable after the commit, DAOs are built from them afterwards
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False)
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Group table operations into one session and transaction.
+
+    Tables created with the session don't commit themselves, everything is committed when the
+    context exits and rolled back if it raises. The session holds one pooled connection from
+    its first statement until then.
+
+        async with unit_of_work() as session:
+            await TaoDividendTable(session).upsert_many(...)
+            await OtherTable(session).create(...)
+    """
+    async with get_async_session_factory()() as session:
+        async with session.begin():
+            yield session
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency of a `unit_of_work` session for the request."""
+    async with unit_of_work() as session:
+        yield session
+
+
+@cache
+def _list_adapter(model: Type[T]) -> TypeAdapter[List[T]]:
+    return TypeAdapter(List[model])  # type: ignore
 
 
 class BaseTable(Generic[T, S]):
+    """
+    Operations on one table, returning DAOs.
+
+    Given a session, e.g. of a `unit_of_work`, operations run in it and are left to its owner
+    to commit. Without one the table manages its sessions: every operation runs in a new
+    session and transaction, committed when it completes.
+    """
+
     def __init__(
         self,
         model: Type[T],
@@ -42,66 +92,248 @@ class BaseTable(Generic[T, S]):
     ):
         self.model = model
         self.table_model = table_model
-        self.session = session or get_async_session_factory()()
+        self.session = session
         self.is_session_managed = session is None
+        # Reads select these columns as tuples, skipping the ORM's objects and identity map
+        # but still flushing pending changes first, and validate all rows with one call of
+        # a validator compiled once per DAO type
+        self._columns = [
+            getattr(table_model, column.name)
+            for column in table_model.__table__.columns
+            if column.name in model.model_fields
+        ]
+        self._adapter = _list_adapter(model)
+
+    @asynccontextmanager
+    async def _session(self, commit: bool = False) -> AsyncIterator[AsyncSession]:
+        if self.session is not None:
+            yield self.session
+            return
+
+        async with get_async_session_factory()() as session:
+            yield session
+            if commit:
+                await session.commit()
 
     async def create(self, data: T) -> T:
         sa_obj = self.table_model(**data.model_dump())
-        self.session.add(sa_obj)
-        if self.is_session_managed:
-            await self.session.commit()
-            await self.session.close()
+        async with self._session(commit=True) as session:
+            session.add(sa_obj)
+        return data
+
+    async def create_many(self, data: Sequence[T]) -> Sequence[T]:
+        """
+        Create many rows in one transaction.
+
+        On PostgreSQL the rows are streamed with COPY, on other databases they are sent as one
+        executemany INSERT, instead of a round trip and a commit per row like `create`.
+        """
+        if not data:
+            return data
+
+        rows = [item.model_dump() for item in data]
+        async with self._session(commit=True) as session:
+            connection = await session.connection()
+            dialect = connection.dialect
+            if dialect.name == "postgresql" and dialect.driver == "psycopg":
+                await self._copy(connection, rows)
+            else:
+                await session.execute(insert(self.table_model), rows)
+        return data
+
+    async def upsert_many(
+        self,
+        data: Sequence[T],
+        conflict_columns: Sequence[str],
+        batch_size: int = 1000,
+    ) -> Sequence[T]:
+        """
+        Insert rows, updating the existing rows with the same values in `conflict_columns`.
+
+        Rows are sent as `INSERT ... ON CONFLICT DO UPDATE` statements of `batch_size` rows, in
+        one transaction. Existing rows keep their id and created_at.
+
+        Args:
+            data (Sequence[T]): The rows to write, the last one wins among rows with equal keys.
+            conflict_columns (Sequence[str]): The columns of a unique constraint.
+            batch_size (int): Rows per statement, statements have a parameter limit.
+
+        Returns:
+            Sequence[T]: The written rows.
+        """
+        if not data:
+            return data
+
+        # A statement can't update the same row twice
+        rows = list(
+            {
+                tuple(row[column] for column in conflict_columns): row
+                for row in (item.model_dump() for item in data)
+            }.values()
+        )
+        async with self._session(commit=True) as session:
+            connection = await session.connection()
+            if connection.dialect.name == "postgresql":
+                dialect_insert = postgresql.insert
+            elif connection.dialect.name == "sqlite":
+                dialect_insert = sqlite.insert
+            else:
+                raise ValueError(f"Upserts aren't supported on {connection.dialect.name}")
+
+            for start in range(0, len(rows), batch_size):
+                statement = dialect_insert(self.table_model).values(
+                    rows[start : start + batch_size]
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=list(conflict_columns),
+                    set_={
+                        column: statement.excluded[column]
+                        for column in rows[0]
+                        if column not in (*conflict_columns, "id", "created_at")
+                    },
+                )
+                await session.execute(statement)
         return data
 
+    async def _copy(self, connection: AsyncConnection, rows: List[Dict[str, Any]]) -> None:
+        table = self.table_model.__table__
+        columns = [column.name for column in table.columns if column.name in rows[0]]
+        statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+            sql.Identifier(*filter(None, [table.schema, table.name])),
+            sql.SQL(", ").join(map(sql.Identifier, columns)),
+        )
+
+        # COPY isn't exposed by SQLAlchemy, it runs on the psycopg connection in the
+        # session's transaction
+        raw_connection = await connection.get_raw_connection()
+        async with raw_connection.driver_connection.cursor() as cursor:  # type: ignore
+            async with cursor.copy(statement) as copy:
+                for row in rows:
+                    await copy.write_row([row[column] for column in columns])
+
     async def get(self, id: int) -> Optional[T]:
-        stmt = select(self.table_model).where(self.table_model.id == id)
-        result = await self.session.execute(stmt)
-        db_obj = result.scalars().first()
-        if self.is_session_managed:
-            await self.session.close()
-        if db_obj is None:
-            return None
-        return self.model.model_validate(db_obj)
-
-    async def get_all(self) -> List[T]:
-        stmt = select(self.table_model)
-        result = await self.session.execute(stmt)
-        db_objects = result.scalars().all()
-        if self.is_session_managed:
-            await self.session.close()
-        return [self.model.model_validate(obj) for obj in db_objects]
+        stmt = self._select({"id": id}, None, None, None).limit(1)
+        async with self._session() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return next(iter(self._to_models(rows)), None)
+
+    async def get_all(
+        self,
+        after: Sequence[Any] | None = None,
+        limit: int | None = None,
+        order_by: Sequence[str] | None = None,
+    ) -> List[T]:
+        """
+        Get all rows, or a page of them with `limit`.
+
+        Pages are keyset paginated: rows are ordered by `order_by`, the primary key by
+        default, and `after` is the values of those columns of the previous page's last row,
+        see `page_key`. Unlike an OFFSET, a page costs the same however deep it is.
+        """
+        stmt = self._select({}, after, limit, order_by)
+        async with self._session() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return self._to_models(rows)
 
     async def update(self, id: int, data: Dict[str, Any]) -> Optional[T]:
         stmt = (
             sa_update(self.table_model)
             .where(self.table_model.id == id)
             .values(**data)
-            .returning(self.table_model)
+            .returning(*self._columns)
         )
-        result = await self.session.execute(stmt)
-        db_obj = result.scalars().first()
-        if self.is_session_managed:
-            await self.session.commit()
-            await self.session.close()
-        if db_obj is None:
-            return None
-        return self.model.model_validate(db_obj)
+        async with self._session(commit=True) as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return next(iter(self._to_models(rows)), None)
 
     async def delete(self, id: int) -> bool:
         stmt = sa_delete(self.table_model).where(self.table_model.id == id)
-        result = await self.session.execute(stmt)
-        if self.is_session_managed:
-            await self.session.commit()
-            await self.session.close()
+        async with self._session(commit=True) as session:
+            result = await session.execute(stmt)
         return result.rowcount > 0
 
-    async def filter(self, **kwargs) -> List[T]:
-        stmt = select(self.table_model)
-        for key, value in kwargs.items():
+    async def filter(
+        self,
+        after: Sequence[Any] | None = None,
+        limit: int | None = None,
+        order_by: Sequence[str] | None = None,
+        **kwargs,
+    ) -> List[T]:
+        """Get the rows with the given column values, paginated like `get_all`."""
+        stmt = self._select(kwargs, after, limit, order_by)
+        async with self._session() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return self._to_models(rows)
+
+    async def iterate(
+        self,
+        batch_size: int = 1000,
+        order_by: Sequence[str] | None = None,
+        **kwargs,
+    ) -> AsyncIterator[T]:
+        """
+        Iterate over the rows with the given column values, in constant memory.
+
+        Rows are read through a server-side cursor, `batch_size` at a time, instead of being
+        loaded into one list like `filter` does. A session given to the table is busy until
+        the iteration ends.
+
+        Args:
+            batch_size (int): Rows fetched from the cursor at a time.
+            order_by (Sequence[str] | None): Columns to order the rows by, unordered if None.
+            **kwargs: Column values the rows must have.
+
+        Yields:
+            T: The rows.
+        """
+        stmt = self._select(kwargs, None, None, order_by).execution_options(
+            yield_per=batch_size
+        )
+        async with self._session() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                for item in self._to_models(rows):
+                    yield item
+
+    def _to_models(self, rows: Sequence[Row]) -> List[T]:
+        names = [column.key for column in self._columns]
+        return self._adapter.validate_python([dict(zip(names, row)) for row in rows])
+
+    def page_key(self, item: T, order_by: Sequence[str] | None = None) -> tuple:
+        """Get the `after` for the page following `item`."""
+        return tuple(getattr(item, column) for column in self._order_by(order_by))
+
+    def _order_by(self, order_by: Sequence[str] | None) -> Sequence[str]:
+        if order_by is not None:
+            return order_by
+        return [column.name for column in self.table_model.__table__.primary_key.columns]
+
+    def _select(
+        self,
+        filters: Dict[str, Any],
+        after: Sequence[Any] | None,
+        limit: int | None,
+        order_by: Sequence[str] | None,
+    ) -> Select:
+        stmt = select(*self._columns)
+        for key, value in filters.items():
             if hasattr(self.table_model, key):
                 stmt = stmt.where(getattr(self.table_model, key) == value)
-        result = await self.session.execute(stmt)
-        db_objects = result.scalars().all()
-        if self.is_session_managed:
-            await self.session.close()
-        return [self.model.model_validate(obj) for obj in db_objects]
+
+        # Pages need a stable order, without pagination rows come in any order
+        if order_by is None and after is None and limit is None:
+            return stmt
+        columns = [getattr(self.table_model, column) for column in self._order_by(order_by)]
+        if after is not None:
+            if len(after) != len(columns):
+                raise ValueError(f"after needs a value for each of {len(columns)} columns")
+            # A row value comparison, which an index on the columns answers directly
+            stmt = stmt.where(tuple_(*columns) > tuple_(*after))
+        stmt = stmt.order_by(*columns)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
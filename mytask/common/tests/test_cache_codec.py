@@ -0,0 +1,59 @@
+import pytest
+from pydantic import BaseModel
+
+from mytask.common.cache_codec import CompressedCodec, JsonCodec, MsgpackCodec
+from mytask.common.redis_cache import cache_entry_type
+
+
+class Item(BaseModel):
+    name: str
+    value: int
+
+
+def make_entry(items: list[Item]):
+    return cache_entry_type(list[Item]).model_construct(
+        value=items, fresh_until=1.0, expires_at=2.0, delta=0.5
+    )
+
+
+@pytest.mark.parametrize("codec", [JsonCodec(), MsgpackCodec()])
+def test_round_trip(codec):
+    entry = make_entry([Item(name="a", value=1), Item(name="b", value=2**40)])
+
+    loaded = codec.loads(cache_entry_type(list[Item]), codec.dumps(entry))
+
+    assert loaded.value == entry.value
+    assert all(isinstance(item, Item) for item in loaded.value)
+    assert loaded.fresh_until == 1.0
+    assert loaded.expires_at == 2.0
+
+
+def test_compresses_above_threshold():
+    codec = CompressedCodec(JsonCodec(), threshold=100)
+    small = make_entry([Item(name="a", value=1)])
+    large = make_entry([Item(name="a" * 10, value=i) for i in range(100)])
+
+    small_data = codec.dumps(small)
+    large_data = codec.dumps(large)
+
+    assert small_data[:1] == b"\x00"
+    assert large_data[:1] == b"\x01"
+    assert len(large_data) < len(JsonCodec().dumps(large))
+    assert codec.loads(cache_entry_type(list[Item]), large_data).value == large.value
+
+
+def test_rejects_unknown_header():
+    codec = CompressedCodec(JsonCodec())
+
+    with pytest.raises(ValueError):
+        codec.loads(cache_entry_type(list[Item]), b'{"value": []}')
+
+
+def test_rejects_corrupt_payload():
+    codec = CompressedCodec(JsonCodec(), threshold=0)
+    data = codec.dumps(make_entry([Item(name="a", value=1)]))
+
+    with pytest.raises(ValueError):
+        codec.loads(cache_entry_type(list[Item]), data[:1] + b"corrupt" + data[8:])
+    with pytest.raises(ValueError):
+        codec.loads(cache_entry_type(list[Item]), data[:-4])
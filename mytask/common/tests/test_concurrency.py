@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from mytask.common.concurrency import AdaptiveLimiter
+
+
+async def test_limits_concurrency():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+    running = 0
+    peak = 0
+
+    async def call():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(limiter.run(call) for _ in range(10)))
+
+    assert peak == 2
+    assert limiter.stats().in_flight == 0
+    assert limiter.stats().queued == 0
+
+
+async def test_grows_while_latency_is_flat():
+    limiter = AdaptiveLimiter(initial_limit=2)
+
+    for _ in range(10):
+        await asyncio.gather(*(limiter.run(lambda: asyncio.sleep(0.01)) for _ in range(4)))
+
+    assert limiter.limit > 2
+
+
+async def test_backs_off_on_errors():
+    limiter = AdaptiveLimiter(initial_limit=16)
+
+    async def fail():
+        raise ConnectionError("node down")
+
+    with pytest.raises(ConnectionError):
+        await limiter.run(fail, retries=2, retry_delay=0)
+
+    assert limiter.limit < 16
+    assert limiter.stats().errors == 3
+
+
+async def test_timeout_is_retried():
+    limiter = AdaptiveLimiter()
+    calls = 0
+
+    async def slow_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)
+        return calls
+
+    assert await limiter.run(slow_once, timeout=0.05, retries=1, retry_delay=0) == 2
+
+
+async def test_latency_is_per_request():
+    limiter = AdaptiveLimiter(initial_limit=4)
+    await limiter.run(lambda: asyncio.sleep(0.01))
+    limit = limiter.limit
+
+    # Ten requests in one call aren't a slow request
+    await limiter.run(lambda: asyncio.sleep(0.1, result=10), requests=lambda pages: pages)
+
+    assert limiter.limit == limit
+    assert limiter.stats().min_latency is not None
+    assert limiter.stats().min_latency < 0.02
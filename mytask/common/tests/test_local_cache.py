@@ -0,0 +1,54 @@
+import time
+
+from mytask.common.local_cache import LocalCache
+
+
+def test_get_and_set():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set("a", [1, 2])
+
+    assert cache.get("a") == [1, 2]
+    assert cache.get("b") is None
+
+
+def test_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Touch "a" so "b" becomes the eviction candidate
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_expires_entries():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_is_capped_by_local_ttl():
+    cache = LocalCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1, ttl=3600)
+
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+
+
+def test_delete():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.delete("a")
+    cache.delete("missing")
+
+    assert cache.get("a") is None
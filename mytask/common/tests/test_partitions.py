@@ -0,0 +1,38 @@
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+
+from mytask.common.partitions import DailyPartitions
+
+
+async def test_ensure_creates_partitions_ahead():
+    connection = AsyncMock()
+    partitions = DailyPartitions("tao_dividends", retention_days=30, premake_days=2)
+
+    names = await partitions.ensure(connection, today=date(2025, 1, 1))
+
+    assert names == [
+        "tao_dividends_20241231",
+        "tao_dividends_20250101",
+        "tao_dividends_20250102",
+        "tao_dividends_20250103",
+    ]
+    statement = str(connection.execute.await_args_list[1].args[0])
+    assert 'PARTITION OF "tao_dividends"' in statement
+    assert "FROM ('2025-01-01 00:00+00') TO ('2025-01-02 00:00+00')" in statement
+
+
+async def test_drop_expired_keeps_retention_and_foreign_partitions():
+    result = MagicMock()
+    result.scalars.return_value = [
+        "tao_dividends_20241230",
+        "tao_dividends_20241231",
+        "tao_dividends_20250101",
+        "tao_dividends_default",
+    ]
+    connection = AsyncMock()
+    connection.execute.return_value = result
+    partitions = DailyPartitions("tao_dividends", retention_days=2)
+
+    dropped = await partitions.drop_expired(connection, today=date(2025, 1, 1))
+
+    assert dropped == ["tao_dividends_20241230"]
@@ -0,0 +1,290 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from pydantic import BaseModel
+
+from mytask.common.cache_status import CacheStatus
+from mytask.common.local_cache import LocalCache
+from mytask.common.redis_cache import CacheEntry, RedisCache, redis_cache, redis_cache_batch
+
+
+class Item(BaseModel):
+    name: str
+    value: int
+
+
+class Counter:
+    """A compute function counting its calls, slow enough for callers to overlap."""
+
+    def __init__(self, value: int = 1, delay: float = 0.1):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> Item:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return Item(name="item", value=self.value)
+
+
+@pytest.fixture
+def server() -> FakeServer:
+    return FakeServer()
+
+
+@pytest.fixture
+async def cache(server: FakeServer):
+    cache = RedisCache(FakeAsyncRedis(server=server))
+    yield cache
+    await cache.close()
+    await cache.redis.aclose()
+
+
+def make_process_cache(server: FakeServer, **kwargs) -> RedisCache:
+    """Another process' cache on the same Redis."""
+    return RedisCache(FakeAsyncRedis(server=server), **kwargs)
+
+
+async def test_set_and_get(cache: RedisCache):
+    await cache.set("key", Item(name="a", value=1), ttl=60, value_type=Item)
+
+    assert await cache.get("key", Item) == Item(name="a", value=1)
+    assert await cache.get("missing", Item) is None
+    assert 59 < await cache.redis.ttl("key") <= 60
+
+
+async def test_get_set_and_delete_many(cache: RedisCache):
+    await cache.set_many(
+        {"a": Item(name="a", value=1), "b": Item(name="b", value=2)},
+        ttl=60,
+        value_type=Item,
+    )
+
+    assert await cache.get_many(["a", "b", "c"], Item) == {
+        "a": Item(name="a", value=1),
+        "b": Item(name="b", value=2),
+    }
+
+    await cache.delete_many(["a", "c"])
+    assert await cache.get_many(["a", "b"], Item) == {"b": Item(name="b", value=2)}
+
+
+async def test_corrupt_entries_are_misses(cache: RedisCache):
+    await cache.redis.set("key", b"\x01corrupt")
+
+    assert await cache.get("key", Item) is None
+
+
+async def test_concurrent_misses_compute_once(cache: RedisCache):
+    compute = Counter()
+
+    results = await asyncio.gather(
+        *(cache.get_or_compute("key", Item, compute, ttl=60) for _ in range(10))
+    )
+
+    assert compute.calls == 1
+    assert results == [(Item(name="item", value=1), CacheStatus.MISS)] * 10
+    assert await cache.get_or_compute("key", Item, compute, ttl=60) == (
+        Item(name="item", value=1),
+        CacheStatus.FRESH,
+    )
+    assert compute.calls == 1
+
+
+async def test_processes_share_one_computation(server: FakeServer):
+    caches = [make_process_cache(server) for _ in range(3)]
+    compute = Counter(delay=0.2)
+
+    results = await asyncio.gather(
+        *(cache.get_or_compute("key", Item, compute, ttl=60) for cache in caches)
+    )
+
+    assert compute.calls == 1
+    assert [result for result, _ in results] == [Item(name="item", value=1)] * 3
+    # The holder released its lock
+    assert not await caches[0].redis.exists("lock:key")
+
+
+async def test_lock_is_only_released_by_its_holder(cache: RedisCache):
+    assert await cache._acquire_lock("lock:key", "holder", lock_ttl=30)
+    assert not await cache._acquire_lock("lock:key", "other", lock_ttl=30)
+    assert 0 < await cache.redis.pttl("lock:key") <= 30_000
+
+    await cache._release_lock("lock:key", "other")
+    assert await cache.redis.get("lock:key") == b"holder"
+
+    await cache._release_lock("lock:key", "holder")
+    assert not await cache.redis.exists("lock:key")
+
+
+async def test_computes_anyway_after_lock_wait(cache: RedisCache):
+    # A holder that died without releasing its lock
+    await cache.redis.set("lock:key", "dead", px=30_000)
+    compute = Counter()
+
+    result = await cache.get_or_compute("key", Item, compute, ttl=60, lock_wait=0.2)
+
+    assert result == (Item(name="item", value=1), CacheStatus.MISS)
+    assert compute.calls == 1
+    # Not ours to release
+    assert await cache.redis.get("lock:key") == b"dead"
+
+
+async def test_serves_stale_while_refreshing(cache: RedisCache):
+    now = time.time()
+    await cache.set(
+        "key",
+        Item(name="item", value=1),
+        value_type=Item,
+        fresh_until=now - 1,
+        expires_at=now + 60,
+    )
+    compute = Counter(value=2)
+
+    results = await asyncio.gather(
+        *(cache.get_or_compute("key", Item, compute, ttl=60, stale_ttl=60) for _ in range(5))
+    )
+    assert results == [(Item(name="item", value=1), CacheStatus.STALE)] * 5
+
+    await asyncio.gather(*cache._refreshing.values())
+    assert compute.calls == 1
+    entry = await cache.get_entry("key", Item)
+    assert entry is not None
+    assert entry.value == Item(name="item", value=2)
+    assert not entry.is_stale()
+    assert entry.expires_at - entry.fresh_until == pytest.approx(60)
+
+
+async def test_fallback_answers_misses_and_stale_entries(cache: RedisCache):
+    compute = Counter(value=2)
+    seen = []
+
+    async def fallback(entry):
+        seen.append(entry if entry is None else entry.value)
+        return Item(name="fallback", value=0), CacheStatus.DATABASE
+
+    assert await cache.get_or_compute("key", Item, compute, fallback=fallback) == (
+        Item(name="fallback", value=0),
+        CacheStatus.DATABASE,
+    )
+    now = time.time()
+    await cache.set(
+        "key", Item(name="item", value=1), value_type=Item, fresh_until=now - 1, expires_at=now + 60
+    )
+    assert (await cache.get_or_compute("key", Item, compute, fallback=fallback))[1] == (
+        CacheStatus.DATABASE
+    )
+    assert seen == [None, Item(name="item", value=1)]
+    # Nothing was computed, refreshing is up to the fallback
+    assert compute.calls == 0
+
+    async def no_answer(entry):
+        return None
+
+    assert await cache.get_or_compute("key", Item, compute, fallback=no_answer) == (
+        Item(name="item", value=1),
+        CacheStatus.STALE,
+    )
+
+
+def test_should_refresh_early():
+    now = time.time()
+    entry = CacheEntry[int](value=1, fresh_until=now + 10, expires_at=now + 20, delta=5)
+
+    assert not entry.should_refresh()
+    # -log(1 - u) * delta * beta, about 23s early for u = 0.99
+    with patch("mytask.common.redis_cache.random.random", return_value=0.99):
+        assert entry.should_refresh(beta=1.0)
+    # About 0.05s early for u = 0.01
+    with patch("mytask.common.redis_cache.random.random", return_value=0.01):
+        assert not entry.should_refresh(beta=1.0)
+    # Entries without a compute time are never refreshed early
+    assert not entry.model_copy(update={"delta": 0}).should_refresh(beta=1.0)
+
+
+async def test_decorator_caches_results(cache: RedisCache):
+    calls = []
+
+    @redis_cache(redis_cache=cache, ttl=60)
+    async def double(value: int) -> Item:
+        calls.append(value)
+        return Item(name="double", value=value * 2)
+
+    assert await double(2) == Item(name="double", value=4)
+    assert await double(2) == Item(name="double", value=4)
+    assert await double(3) == Item(name="double", value=6)
+    assert calls == [2, 3]
+
+
+async def test_batch_decorator_computes_only_misses(cache: RedisCache):
+    calls = []
+
+    @redis_cache_batch(redis_cache=cache, ttl=60, key_builder=lambda value: f"item:{value}")
+    async def double(values: list[int]) -> dict[int, Item]:
+        calls.append(values)
+        # Odd values are left out of the result and not cached
+        return {value: Item(name="double", value=value * 2) for value in values if value % 2 == 0}
+
+    assert await double([2, 4]) == {2: Item(name="double", value=4), 4: Item(name="double", value=8)}
+    assert await double([2, 3, 6]) == {
+        2: Item(name="double", value=4),
+        6: Item(name="double", value=12),
+    }
+    assert calls == [[2, 4], [3, 6]]
+    assert await cache.get_many(["item:2", "item:3", "item:6"], Item) == {
+        "item:2": Item(name="double", value=4),
+        "item:6": Item(name="double", value=12),
+    }
+
+
+async def test_writes_invalidate_other_processes(server: FakeServer):
+    writer = make_process_cache(server)
+    reader = make_process_cache(server, local_cache=LocalCache())
+    invalidated = []
+    reader.add_invalidation_callback(invalidated.append)
+
+    await writer.set("key", Item(name="item", value=1), ttl=60, value_type=Item)
+    # Reading starts the listener and keeps the entry locally
+    assert await reader.get("key", Item) == Item(name="item", value=1)
+    for _ in range(100):
+        if (await writer.redis.pubsub_numsub(writer.invalidation_channel))[0][1]:
+            break
+        await asyncio.sleep(0.01)
+
+    await writer.set("key", Item(name="item", value=2), ttl=60, value_type=Item)
+    for _ in range(100):
+        if invalidated:
+            break
+        await asyncio.sleep(0.01)
+
+    assert invalidated == [["key"]]
+    assert reader.local_cache is not None
+    assert reader.local_cache.get("key") is None
+    assert await reader.get("key", Item) == Item(name="item", value=2)
+
+    # A process ignores its own invalidations
+    await reader.set("key", Item(name="item", value=3), ttl=60, value_type=Item)
+    await asyncio.sleep(0.05)
+    assert invalidated == [["key"]]
+    await reader.close()
+
+
+async def test_failed_listener_drops_everything(cache: RedisCache):
+    cache.local_cache = LocalCache()
+    cache.local_cache.set("key", "value")
+    invalidated = []
+    cache.add_invalidation_callback(invalidated.append)
+
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock(side_effect=ConnectionError("connection lost"))
+    pubsub.aclose = AsyncMock()
+    with patch.object(cache.redis, "pubsub", return_value=pubsub):
+        cache.ensure_listener()
+        assert cache._listener is not None
+        await cache._listener
+
+    assert invalidated == [None]
+    assert cache.local_cache.get("key") is None
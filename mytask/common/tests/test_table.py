@@ -0,0 +1,221 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from mytask.common.base import MyTaskBaseModel
+from mytask.common.table import get_session, unit_of_work
+from mytask.models.tao import TaoDividendDAO
+from mytask.tables.tao import TaoDividendTable
+
+BLOCK_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_dividend(netuid: int, hotkey: str, dividend: int = 1, block: int = 100):
+    return TaoDividendDAO(
+        netuid=netuid,
+        hotkey=hotkey,
+        dividend=dividend,
+        block=block,
+        created_at=BLOCK_TIME + timedelta(seconds=12 * (block - 100)),
+    )
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(MyTaskBaseModel.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    # Tables without a session and `unit_of_work` open their sessions on SQLite
+    with patch("mytask.common.table.get_async_session_factory", return_value=session_factory):
+        yield engine
+    await engine.dispose()
+
+
+async def test_create_many(engine):
+    dividends = [make_dividend(1, f"hotkey{i}", dividend=i) for i in range(5)]
+
+    assert await TaoDividendTable().create_many(dividends) == dividends
+    assert await TaoDividendTable().create_many([]) == []
+
+    rows = await TaoDividendTable().get_all(order_by=["hotkey"])
+    assert [(row.hotkey, row.dividend) for row in rows] == [(f"hotkey{i}", i) for i in range(5)]
+    assert all(row.created_at == BLOCK_TIME for row in rows)
+
+
+async def test_create_many_copies_on_psycopg(engine):
+    dividends = [make_dividend(1, "a"), make_dividend(1, "b")]
+
+    with (
+        patch.object(engine.dialect, "name", "postgresql"),
+        patch.object(engine.dialect, "driver", "psycopg"),
+        patch.object(TaoDividendTable, "_copy", AsyncMock()) as copy,
+    ):
+        await TaoDividendTable().create_many(dividends)
+
+    rows = copy.await_args.args[1]
+    assert [row["hotkey"] for row in rows] == ["a", "b"]
+    # The rows went through COPY, not an INSERT
+    assert await TaoDividendTable().get_all() == []
+
+
+async def test_upsert_many_updates_existing_rows(engine):
+    conflict_columns = ["netuid", "hotkey", "block", "created_at"]
+    written = await TaoDividendTable().upsert_many(
+        [make_dividend(1, "a", 10), make_dividend(1, "b", 20)], conflict_columns
+    )
+
+    await TaoDividendTable().upsert_many(
+        [
+            make_dividend(1, "a", 11),
+            # The last of the rows with equal keys wins
+            make_dividend(1, "c", 30),
+            make_dividend(1, "c", 31),
+            make_dividend(1, "a", 12, block=101),
+        ],
+        conflict_columns,
+        batch_size=2,
+    )
+
+    rows = await TaoDividendTable().get_all(order_by=["hotkey", "block"])
+    assert [(row.hotkey, row.dividend, row.block) for row in rows] == [
+        ("a", 11, 100),
+        ("a", 12, 101),
+        ("b", 20, 100),
+        ("c", 31, 100),
+    ]
+    # Updated rows keep their id
+    assert rows[0].id == written[0].id
+
+
+async def test_pages(engine):
+    dividends = [make_dividend(netuid, f"hotkey{i}") for netuid in (2, 1) for i in range(3)]
+    await TaoDividendTable().create_many(dividends)
+
+    table = TaoDividendTable()
+    order_by = ["netuid", "hotkey"]
+    pages = []
+    after = None
+    while page := await table.get_all(after=after, limit=4, order_by=order_by):
+        pages.append([(row.netuid, row.hotkey) for row in page])
+        after = table.page_key(page[-1], order_by)
+
+    assert pages == [
+        [(1, "hotkey0"), (1, "hotkey1"), (1, "hotkey2"), (2, "hotkey0")],
+        [(2, "hotkey1"), (2, "hotkey2")],
+    ]
+
+
+async def test_pages_by_primary_key(engine):
+    dividends = [make_dividend(1, f"hotkey{i}") for i in range(5)]
+    await TaoDividendTable().create_many(dividends)
+
+    table = TaoDividendTable()
+    first = await table.filter(limit=2, netuid=1)
+    rest = await table.filter(after=table.page_key(first[-1]), netuid=1)
+
+    assert table.page_key(first[-1]) == (first[-1].id, BLOCK_TIME)
+    assert [row.id for row in first + rest] == sorted(dividend.id for dividend in dividends)
+    with pytest.raises(ValueError):
+        await table.filter(after=(first[-1].id,), netuid=1)
+
+
+async def test_filter_and_iterate(engine):
+    dividends = [make_dividend(netuid, f"hotkey{i}") for netuid in (1, 2) for i in range(5)]
+    await TaoDividendTable().create_many(dividends)
+
+    table = TaoDividendTable()
+    filtered = await table.filter(order_by=["hotkey"], netuid=2)
+    iterated = [
+        row async for row in table.iterate(batch_size=2, order_by=["hotkey"], netuid=2)
+    ]
+
+    assert [row.hotkey for row in filtered] == [f"hotkey{i}" for i in range(5)]
+    assert iterated == filtered
+
+
+async def test_to_models(engine):
+    table = TaoDividendTable()
+    dividend = make_dividend(1, "a")
+    await table.create_many([dividend])
+
+    async with unit_of_work() as session:
+        rows = (await session.execute(select(*table._columns))).all()
+
+    # Naive SQLite datetimes come back as UTC
+    assert table._to_models(rows) == [dividend]
+
+
+async def test_unit_of_work_commits(engine):
+    async with unit_of_work() as session:
+        await TaoDividendTable(session).create_many([make_dividend(1, "a")])
+        await TaoDividendTable(session).create_many([make_dividend(1, "b")])
+        # Visible in the transaction before the commit
+        assert len(await TaoDividendTable(session).get_all()) == 2
+
+    assert len(await TaoDividendTable().get_all()) == 2
+
+
+async def test_unit_of_work_rolls_back(engine):
+    with pytest.raises(RuntimeError):
+        async with unit_of_work() as session:
+            await TaoDividendTable(session).create_many([make_dividend(1, "a")])
+            raise RuntimeError("request failed")
+
+    assert await TaoDividendTable().get_all() == []
+
+
+async def test_get_session(engine):
+    sessions = get_session()
+    session = await anext(sessions)
+    await TaoDividendTable(session).create_many([make_dividend(1, "a")])
+    with pytest.raises(StopAsyncIteration):
+        await anext(sessions)
+
+    assert len(await TaoDividendTable().get_all()) == 1
+
+
+async def test_get_update_and_delete(engine):
+    table = TaoDividendTable()
+    dividend = make_dividend(1, "a", 10)
+    await table.create_many([dividend])
+
+    assert await table.get(dividend.id) == dividend
+    assert await table.get("missing") is None
+
+    updated = await table.update(dividend.id, {"dividend": 11})
+    assert updated is not None
+    assert updated.updated_at > dividend.updated_at
+    assert updated == dividend.model_copy(
+        update={"dividend": 11, "updated_at": updated.updated_at}
+    )
+    assert await table.get(dividend.id) == updated
+    assert await table.update("missing", {"dividend": 12}) is None
+
+    assert await table.delete(dividend.id)
+    assert not await table.delete(dividend.id)
+    assert await table.get(dividend.id) is None
+
+
+async def test_get_latest(engine):
+    await TaoDividendTable().create_many(
+        [
+            make_dividend(1, "a", 10),
+            make_dividend(1, "a", 0, block=101),
+            make_dividend(1, "b", 20),
+            make_dividend(1, "b", 0, block=101).model_copy(update={"removed": True}),
+            make_dividend(2, "a", 30, block=101),
+        ]
+    )
+
+    latest = await TaoDividendTable().get_latest(BLOCK_TIME)
+    assert [(row.netuid, row.hotkey, row.dividend, row.block, row.removed) for row in latest] == [
+        (1, "a", 0, 101, False),
+        (1, "b", 0, 101, True),
+        (2, "a", 30, 101, False),
+    ]
+    assert len(await TaoDividendTable().get_latest(BLOCK_TIME, netuid=2)) == 1
+    assert await TaoDividendTable().get_latest(BLOCK_TIME + timedelta(days=1)) == []
@@ -0,0 +1,69 @@
+import asyncio
+
+from mytask.common.write_behind import WriteBehindQueue
+
+
+async def test_writes_queued_items_in_batches():
+    batches = []
+
+    async def write(items):
+        batches.append(items)
+
+    queue = WriteBehindQueue(write, batch_size=3)
+    for item in range(5):
+        await queue.put(item)
+    await queue.flush(timeout=1)
+
+    assert [item for batch in batches for item in batch] == [0, 1, 2, 3, 4]
+    assert max(len(batch) for batch in batches) <= 3
+    stats = queue.stats()
+    assert stats.written == 5
+    assert stats.queued == 0
+    assert stats.lag == 0
+    await queue.close()
+
+
+async def test_retries_failed_writes_then_drops():
+    calls = 0
+
+    async def write(items):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise ConnectionError("database down")
+
+    queue = WriteBehindQueue(write, batch_size=1, retries=1, retry_delay=0)
+    await queue.put("a")
+    await queue.put("b")
+    await queue.flush(timeout=1)
+
+    # "a" fails twice and is dropped, "b" is written on the third call
+    stats = queue.stats()
+    assert stats.retries == 1
+    assert stats.dropped == 1
+    assert stats.written == 1
+    await queue.close()
+
+
+async def test_full_queue_applies_backpressure_and_reports_lag():
+    release = asyncio.Event()
+
+    async def write(items):
+        await release.wait()
+
+    queue = WriteBehindQueue(write, maxsize=1, batch_size=1, put_timeout=0.01)
+    assert await queue.put("a")
+    await asyncio.sleep(0)
+    # "a" is being written, "b" fills the queue and "c" can't wait for a place
+    assert await queue.put("b")
+    assert not await queue.put("c")
+
+    stats = queue.stats()
+    assert stats.in_flight == 1
+    assert stats.queued == 1
+    assert stats.dropped == 1
+    assert stats.lag > 0
+
+    release.set()
+    await queue.close(timeout=1)
+    assert queue.stats().written == 2
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from mytask.common.logger import get_logger
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+
+class WriteBehindStats(BaseModel):
+    # Items waiting to be written, and items being written right now
+    queued: int
+    in_flight: int
+    # Seconds the oldest unwritten item has waited, 0 when everything is written
+    lag: float
+    written: int
+    retries: int
+    # Items given up on, after their retries or because the queue stayed full
+    dropped: int
+
+
+class WriteBehindQueue(Generic[T]):
+    """
+    Bounded in-process queue that writes items in the background, in batches.
+
+    Producers only wait for a free place in the queue. A consumer task takes up to
+    `batch_size` queued items at a time and writes them with one call of `write`, retried with
+    a jittered exponential backoff. When writes fall behind the queue fills up and producers
+    wait, up to `put_timeout` seconds before the item is dropped, so a slow database slows
+    them down without stalling them.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[T]], Awaitable[None]],
+        maxsize: int = 64,
+        batch_size: int = 16,
+        retries: int = 3,
+        retry_delay: float = 1.0,
+        put_timeout: float = 5.0,
+    ):
+        """
+        Initialize the WriteBehindQueue.
+
+        Args:
+            write (Callable[[list[T]], Awaitable[None]]): Writes a batch of items.
+            maxsize (int): Items queued at most.
+            batch_size (int): Items written with one call of `write` at most.
+            retries (int): How often a failed write is retried before the batch is dropped.
+            retry_delay (float): The base of the exponential retry delay.
+            put_timeout (float): Seconds `put` waits for a free place in a full queue.
+        """
+        self.write = write
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.put_timeout = put_timeout
+        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=maxsize)
+        # Enqueue times of the unwritten items, oldest first
+        self._enqueued: deque[float] = deque()
+        self._in_flight = 0
+        self._written = 0
+        self._retries = 0
+        self._dropped = 0
+        self._task: asyncio.Task | None = None
+
+    def stats(self) -> WriteBehindStats:
+        return WriteBehindStats(
+            queued=self._queue.qsize(),
+            in_flight=self._in_flight,
+            lag=time.time() - self._enqueued[0] if self._enqueued else 0.0,
+            written=self._written,
+            retries=self._retries,
+            dropped=self._dropped,
+        )
+
+    def ensure_started(self) -> None:
+        if (
+            self._task is not None
+            and not self._task.done()
+            and self._task.get_loop() is asyncio.get_running_loop()
+        ):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, item: T) -> bool:
+        """
+        Queue an item to be written, waiting while the queue is full.
+
+        Returns:
+            bool: Whether the item was queued, False if it was dropped.
+        """
+        self.ensure_started()
+        try:
+            await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+        except TimeoutError:
+            self._dropped += 1
+            logger.warning(f"Write queue full for {self.put_timeout}s, dropped an item")
+            return False
+        self._enqueued.append(time.time())
+        return True
+
+    async def flush(self, timeout: float | None = None) -> None:
+        """Wait until every queued item is written or dropped."""
+        if self._queue.empty() and not self._in_flight:
+            return
+        self.ensure_started()
+        await asyncio.wait_for(self._queue.join(), timeout)
+
+    async def close(self, timeout: float | None = 30) -> None:
+        """Flush the queue, then stop the consumer."""
+        try:
+            await self.flush(timeout)
+        except TimeoutError:
+            logger.error(
+                f"Write queue not flushed after {timeout}s, "
+                f"{self._queue.qsize() + self._in_flight} items are lost"
+            )
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            items = [await self._queue.get()]
+            while len(items) < self.batch_size and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            self._in_flight = len(items)
+            try:
+                await self._write(items)
+            finally:
+                self._in_flight = 0
+                for _ in items:
+                    if self._enqueued:
+                        self._enqueued.popleft()
+                    self._queue.task_done()
+
+    async def _write(self, items: list[T]) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                await self.write(items)
+                self._written += len(items)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self._dropped += len(items)
+                    logger.error(f"Dropped {len(items)} items after failed writes: {e!r}")
+                    return
+                self._retries += 1
+                delay = random.uniform(0, self.retry_delay * 2**attempt)
+                logger.warning(f"Write failed, retrying in {delay:.1f}s: {e!r}")
+                await asyncio.sleep(delay)
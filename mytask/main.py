@@ -1,10 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from mytask.common.logger import get_logger
 from mytask.middlewares.auth import AuthMiddleware
 from mytask.middlewares.logging import LoggingMiddleware
 from mytask.routers import routers
+from mytask.services.tao_service import TaoService, get_tao_service
+
+logger = get_logger()
+
+# Seconds between attempts to warm up the TaoService
+WARM_UP_RETRY_DELAY = 5
+
+
+async def warm_up(app: FastAPI) -> TaoService:
+    """Initialize the TaoService until it succeeds, then report the app ready."""
+    while True:
+        try:
+            tao_service = await get_tao_service()
+        except Exception as e:
+            logger.error(f"Warming up the TaoService failed, retrying: {e}")
+            await asyncio.sleep(WARM_UP_RETRY_DELAY)
+            continue
+
+        app.state.tao_service_ready = True
+        return tao_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warmed up in the background, so the app is live but only ready once connected
+    app.state.tao_service_ready = False
+    warm_up_task = asyncio.create_task(warm_up(app))
+    yield
+
+    app.state.tao_service_ready = False
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+        return
+    await warm_up_task.result().close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add logging middleware (should be added first to log all requests)
 app.add_middleware(LoggingMiddleware)
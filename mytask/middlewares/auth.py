@@ -7,8 +7,8 @@ from mytask.common.settings import get_settings
 
 class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        # Skip auth for specific paths if needed
-        if request.url.path in ["/docs", "/redoc", "/openapi.json"]:
+        # Skip auth for specific paths if needed, readiness probes don't authenticate
+        if request.url.path in ["/docs", "/redoc", "/openapi.json", "/api/v1/ready"]:
             return await call_next(request)
 
         # Get auth token from settings
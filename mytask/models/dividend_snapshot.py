@@ -0,0 +1,374 @@
+from typing import Any, Iterable, Iterator, Literal, NamedTuple
+
+import numpy as np
+from pydantic import Base64Bytes, BaseModel, GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+from mytask.models.tao import Dividend
+
+# Fixed little-endian dtypes, the raw buffers are what gets cached
+NETUID_DTYPE = np.dtype("<u2")
+HOTKEY_ID_DTYPE = np.dtype("<u4")
+DIVIDEND_DTYPE = np.dtype("<u8")
+BLOCK_DTYPE = np.dtype("<i8")
+# Blocks of dividends read before blocks were tracked
+NO_BLOCK = -1
+
+
+class SnapshotColumns(BaseModel):
+    """Serialized form of `DividendSnapshot`, numeric columns are raw little-endian buffers."""
+
+    netuids: Base64Bytes
+    hotkey_ids: Base64Bytes
+    hotkeys: list[str]
+    dividends: Base64Bytes
+    blocks: Base64Bytes
+
+
+class SnapshotDiff(NamedTuple):
+    # Rows that are new or whose dividend changed, as in the newer snapshot
+    changed: "DividendSnapshot"
+    # Rows of the older snapshot that are gone, at the block of the newer snapshot
+    removed: "DividendSnapshot"
+
+    def __len__(self) -> int:
+        return len(self.changed) + len(self.removed)
+
+    def netuids(self) -> set[int]:
+        return {*self.changed.unique_netuids(), *self.removed.unique_netuids()}
+
+    def to_snapshot(self) -> "DividendSnapshot":
+        """The changed rows plus the removed rows with a dividend of 0, sorted by subnet."""
+        removed = self.removed
+        return DividendSnapshot.concat(
+            [
+                self.changed,
+                DividendSnapshot(
+                    netuids=removed.netuids,
+                    hotkey_ids=removed.hotkey_ids,
+                    hotkeys=removed.hotkeys,
+                    dividends=np.zeros(len(removed), dtype=DIVIDEND_DTYPE),
+                    blocks=removed.blocks,
+                ),
+            ]
+        ).sort()
+
+
+class DividendSnapshot:
+    """
+    Dividends stored column-wise.
+
+    Every row has a netuid, a hotkey id, a dividend and the block it was read at, each in a
+    NumPy array. Hotkeys are interned, `hotkeys[hotkey_id]` is the SS58 address, so every
+    address is stored once however many subnets it's on. Filters, sorts and aggregates run
+    on whole columns, `Dividend` models are only built at the API edge.
+    """
+
+    def __init__(
+        self,
+        netuids: np.ndarray,
+        hotkey_ids: np.ndarray,
+        hotkeys: list[str],
+        dividends: np.ndarray,
+        blocks: np.ndarray,
+    ):
+        self.netuids = netuids
+        self.hotkey_ids = hotkey_ids
+        self.hotkeys = hotkeys
+        self.dividends = dividends
+        self.blocks = blocks
+        self._hotkey_lookup: dict[str, int] | None = None
+
+    @classmethod
+    def empty(cls) -> "DividendSnapshot":
+        return cls.from_subnet(0, [], [], None)
+
+    @classmethod
+    def from_subnet(
+        cls,
+        netuid: int,
+        hotkeys: list[str],
+        dividends: list[int],
+        block: int | None,
+    ) -> "DividendSnapshot":
+        """Build the snapshot of one subnet, which has every hotkey at most once."""
+        count = len(hotkeys)
+        return cls(
+            netuids=np.full(count, netuid, dtype=NETUID_DTYPE),
+            hotkey_ids=np.arange(count, dtype=HOTKEY_ID_DTYPE),
+            hotkeys=list(hotkeys),
+            dividends=np.array(dividends, dtype=DIVIDEND_DTYPE),
+            blocks=np.full(count, NO_BLOCK if block is None else block, dtype=BLOCK_DTYPE),
+        )
+
+    @classmethod
+    def from_dividends(cls, dividends: Iterable[Dividend]) -> "DividendSnapshot":
+        return cls.from_rows(
+            (dividend.netuid, dividend.hotkey, dividend.dividends, dividend.block)
+            for dividend in dividends
+        )
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[tuple[int, str, int, int | None]]
+    ) -> "DividendSnapshot":
+        """Build a snapshot from `(netuid, hotkey, dividend, block)` rows, like `rows` yields."""
+        hotkey_lookup: dict[str, int] = {}
+        netuids, hotkey_ids, values, blocks = [], [], [], []
+        for netuid, hotkey, dividend, block in rows:
+            netuids.append(netuid)
+            hotkey_ids.append(hotkey_lookup.setdefault(hotkey, len(hotkey_lookup)))
+            values.append(dividend)
+            blocks.append(NO_BLOCK if block is None else block)
+
+        return cls(
+            netuids=np.array(netuids, dtype=NETUID_DTYPE),
+            hotkey_ids=np.array(hotkey_ids, dtype=HOTKEY_ID_DTYPE),
+            hotkeys=list(hotkey_lookup),
+            dividends=np.array(values, dtype=DIVIDEND_DTYPE),
+            blocks=np.array(blocks, dtype=BLOCK_DTYPE),
+        )
+
+    @classmethod
+    def concat(cls, snapshots: Iterable["DividendSnapshot"]) -> "DividendSnapshot":
+        """Join snapshots, merging their hotkey dictionaries."""
+        snapshots = list(snapshots)
+        if not snapshots:
+            return cls.empty()
+
+        hotkey_lookup: dict[str, int] = {}
+        hotkey_ids = []
+        for snapshot in snapshots:
+            # Map the snapshot's hotkey ids to ids in the merged dictionary
+            remap = np.array(
+                [hotkey_lookup.setdefault(h, len(hotkey_lookup)) for h in snapshot.hotkeys],
+                dtype=HOTKEY_ID_DTYPE,
+            )
+            hotkey_ids.append(remap[snapshot.hotkey_ids])
+
+        return cls(
+            netuids=np.concatenate([s.netuids for s in snapshots]),
+            hotkey_ids=np.concatenate(hotkey_ids).astype(HOTKEY_ID_DTYPE, copy=False),
+            hotkeys=list(hotkey_lookup),
+            dividends=np.concatenate([s.dividends for s in snapshots]),
+            blocks=np.concatenate([s.blocks for s in snapshots]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.netuids)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DividendSnapshot):
+            return NotImplemented
+        return self.to_dividends() == other.to_dividends()
+
+    def rows(self) -> Iterator[tuple[int, str, int, int | None]]:
+        """Iterate `(netuid, hotkey, dividend, block)` rows as plain Python values."""
+        hotkeys = self.hotkeys
+        for netuid, hotkey_id, dividend, block in zip(
+            self.netuids.tolist(),
+            self.hotkey_ids.tolist(),
+            self.dividends.tolist(),
+            self.blocks.tolist(),
+        ):
+            yield netuid, hotkeys[hotkey_id], dividend, None if block == NO_BLOCK else block
+
+    def to_dividends(self) -> list[Dividend]:
+        return [
+            Dividend(netuid=netuid, hotkey=hotkey, dividends=dividend, block=block)
+            for netuid, hotkey, dividend, block in self.rows()
+        ]
+
+    def unique_netuids(self) -> list[int]:
+        return np.unique(self.netuids).tolist()
+
+    def latest_block(self) -> int | None:
+        """The newest block any row was read at, None without blocks."""
+        if not len(self) or self.blocks.max() == NO_BLOCK:
+            return None
+        return int(self.blocks.max())
+
+    def filter(
+        self,
+        netuid: int | None = None,
+        hotkey: str | None = None,
+        min_dividends: int | None = None,
+    ) -> "DividendSnapshot":
+        """Select the rows matching all given conditions."""
+        mask = np.ones(len(self), dtype=bool)
+        if netuid is not None:
+            mask &= self.netuids == netuid
+        if hotkey is not None:
+            hotkey_id = self._get_hotkey_lookup().get(hotkey)
+            if hotkey_id is None:
+                return self.take(np.zeros(0, dtype=np.intp))
+            mask &= self.hotkey_ids == hotkey_id
+        if min_dividends is not None:
+            mask &= self.dividends >= min_dividends
+        return self.take(mask)
+
+    def exclude_netuids(self, netuids: Iterable[int]) -> "DividendSnapshot":
+        return self.take(~np.isin(self.netuids, list(netuids)))
+
+    def sort(
+        self,
+        by: Literal["netuid", "hotkey", "dividends"] = "netuid",
+        descending: bool = False,
+    ) -> "DividendSnapshot":
+        """Sort the rows, stable so rows with equal keys keep their order."""
+        if by == "hotkey":
+            keys = np.array(self.hotkeys, dtype=object)[self.hotkey_ids]
+        elif by == "dividends":
+            keys = self.dividends
+        else:
+            keys = self.netuids
+
+        if descending:
+            # Sorting the reversed rows and reversing again keeps equal keys in their order
+            order = len(self) - 1 - np.argsort(keys[::-1], kind="stable")[::-1]
+        else:
+            order = np.argsort(keys, kind="stable")
+        return self.take(order)
+
+    def total_by_netuid(self) -> dict[int, int]:
+        """Sum the dividends of every subnet, exact in uint64."""
+        netuids, inverse = np.unique(self.netuids, return_inverse=True)
+        totals = np.zeros(len(netuids), dtype=DIVIDEND_DTYPE)
+        np.add.at(totals, inverse, self.dividends)
+        return dict(zip(netuids.tolist(), totals.tolist()))
+
+    def split_by_netuid(
+        self, netuids: Iterable[int] | None = None
+    ) -> dict[int, "DividendSnapshot"]:
+        """
+        Split into one snapshot per subnet, with a compact hotkey dictionary each.
+
+        Args:
+            netuids (Iterable[int] | None): Subnets to include even if they have no rows, the
+                subnets of the rows if not set.
+        """
+        order = np.argsort(self.netuids, kind="stable")
+        sorted_netuids = self.netuids[order]
+        present, starts = np.unique(sorted_netuids, return_index=True)
+        ends = [*starts[1:].tolist(), len(order)]
+
+        subnets = {
+            netuid: self.take(order[start:end]).compact()
+            for netuid, start, end in zip(present.tolist(), starts.tolist(), ends)
+        }
+        if netuids is None:
+            return subnets
+        return {
+            netuid: subnets[netuid] if netuid in subnets else self.empty()
+            for netuid in netuids
+        }
+
+    def diff(self, previous: "DividendSnapshot") -> SnapshotDiff:
+        """
+        Compare with an older snapshot, rows are matched by netuid and hotkey.
+
+        Args:
+            previous (DividendSnapshot): The older snapshot.
+
+        Returns:
+            SnapshotDiff: The rows that are new or changed, and the rows that are gone.
+        """
+        # Give the hotkeys of both snapshots ids in one dictionary
+        hotkey_lookup = dict(self._get_hotkey_lookup())
+        previous_ids = np.array(
+            [hotkey_lookup.setdefault(h, len(hotkey_lookup)) for h in previous.hotkeys],
+            dtype=HOTKEY_ID_DTYPE,
+        )
+        keys = _row_keys(self.netuids, self.hotkey_ids)
+        previous_keys = _row_keys(previous.netuids, previous_ids[previous.hotkey_ids])
+
+        order = np.argsort(previous_keys)
+        sorted_keys = previous_keys[order]
+        positions = np.searchsorted(sorted_keys, keys)
+        # Positions past the end don't match, clipped so they can still be indexed
+        clipped = np.minimum(positions, max(len(sorted_keys) - 1, 0))
+        if len(sorted_keys):
+            found = sorted_keys[clipped] == keys
+            changed = ~found | (previous.dividends[order][clipped] != self.dividends)
+        else:
+            changed = np.ones(len(self), dtype=bool)
+
+        removed = previous.take(~np.isin(previous_keys, keys)).compact()
+        # Rows are gone as of the newer snapshot
+        latest_block = self.latest_block()
+        removed.blocks = np.full(
+            len(removed), NO_BLOCK if latest_block is None else latest_block, dtype=BLOCK_DTYPE
+        )
+        return SnapshotDiff(changed=self.take(changed).compact(), removed=removed)
+
+    def take(self, selection: np.ndarray) -> "DividendSnapshot":
+        """Select rows by a boolean mask or indices, the hotkey dictionary is shared."""
+        return DividendSnapshot(
+            netuids=self.netuids[selection],
+            hotkey_ids=self.hotkey_ids[selection],
+            hotkeys=self.hotkeys,
+            dividends=self.dividends[selection],
+            blocks=self.blocks[selection],
+        )
+
+    def compact(self) -> "DividendSnapshot":
+        """Drop hotkeys no row refers to from the dictionary."""
+        used, hotkey_ids = np.unique(self.hotkey_ids, return_inverse=True)
+        if len(used) == len(self.hotkeys):
+            return self
+        return DividendSnapshot(
+            netuids=self.netuids,
+            hotkey_ids=hotkey_ids.astype(HOTKEY_ID_DTYPE),
+            hotkeys=[self.hotkeys[hotkey_id] for hotkey_id in used.tolist()],
+            dividends=self.dividends,
+            blocks=self.blocks,
+        )
+
+    def to_columns(self) -> SnapshotColumns:
+        snapshot = self.compact()
+        # Validating would base64 decode the raw buffers
+        return SnapshotColumns.model_construct(
+            netuids=snapshot.netuids.astype(NETUID_DTYPE, copy=False).tobytes(),
+            hotkey_ids=snapshot.hotkey_ids.astype(HOTKEY_ID_DTYPE, copy=False).tobytes(),
+            hotkeys=snapshot.hotkeys,
+            dividends=snapshot.dividends.astype(DIVIDEND_DTYPE, copy=False).tobytes(),
+            blocks=snapshot.blocks.astype(BLOCK_DTYPE, copy=False).tobytes(),
+        )
+
+    @classmethod
+    def from_columns(cls, columns: SnapshotColumns) -> "DividendSnapshot":
+        return cls(
+            netuids=np.frombuffer(columns.netuids, dtype=NETUID_DTYPE),
+            hotkey_ids=np.frombuffer(columns.hotkey_ids, dtype=HOTKEY_ID_DTYPE),
+            hotkeys=columns.hotkeys,
+            dividends=np.frombuffer(columns.dividends, dtype=DIVIDEND_DTYPE),
+            blocks=np.frombuffer(columns.blocks, dtype=BLOCK_DTYPE),
+        )
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source_type: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        # Lets snapshots be cached like any pydantic value, as `SnapshotColumns`
+        columns_schema = handler.generate_schema(SnapshotColumns)
+        return core_schema.union_schema(
+            [
+                core_schema.is_instance_schema(cls),
+                core_schema.no_info_after_validator_function(
+                    cls.from_columns, columns_schema
+                ),
+            ],
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda snapshot: snapshot.to_columns(), return_schema=columns_schema
+            ),
+        )
+
+    def _get_hotkey_lookup(self) -> dict[str, int]:
+        if self._hotkey_lookup is None:
+            self._hotkey_lookup = {hotkey: i for i, hotkey in enumerate(self.hotkeys)}
+        return self._hotkey_lookup
+
+
+def _row_keys(netuids: np.ndarray, hotkey_ids: np.ndarray) -> np.ndarray:
+    # One integer per (netuid, hotkey), so rows can be matched with sorted searches
+    return (netuids.astype(np.uint64) << np.uint64(32)) | hotkey_ids.astype(np.uint64)
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+from mytask.common.concurrency import LimiterStats
+from mytask.common.write_behind import WriteBehindStats
+
+
+class ReadinessResponse(BaseModel):
+    # Whether the substrate connections are up and their runtime loaded
+    ready: bool
+
+
+class StatusResponse(BaseModel):
+    # Concurrency of the subnet queries against the substrate nodes
+    substrate_limiter: LimiterStats
+    # Background writes of refreshed dividends to `tao_dividends`
+    dividend_writer: WriteBehindStats
@@ -8,18 +8,74 @@
 #   "task_id": "abc-123"
 # }
 
+from datetime import datetime, timezone
+
 from pydantic import BaseModel
-from sqlalchemy import Boolean, Column, Float, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Float,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    false,
+)
 
-from mytask.common.base import MyTaskBaseDAO, MyTaskBaseModel
+from mytask.common.base import (
+    MyTaskBaseDAO,
+    MyTaskBaseModel,
+    MyTaskDatetime,
+    UTCDateTime,
+)
+from mytask.common.cache_status import CacheStatus
 
 
 class TaoDividendModel(MyTaskBaseModel):
+    """
+    History of the dividends read from the chain.
+
+    On PostgreSQL the table is range partitioned by `created_at`, one partition per day,
+    see `mytask.common.partitions`. Keys of a partitioned table have to include the partition
+    column, so `created_at` is the time of the block the dividend was read at, which is the
+    same for every read of that block.
+    """
+
     __tablename__ = "tao_dividends"
+    __table_args__ = (
+        # One row per dividend read, writing a read again updates it
+        UniqueConstraint(
+            "netuid", "hotkey", "block", "created_at", name="uq_tao_dividends_read"
+        ),
+        Index("ix_tao_dividends_netuid_created_at", "netuid", "created_at"),
+        Index("ix_tao_dividends_hotkey_created_at", "hotkey", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
+    id = Column(String, primary_key=True)
+    # With a timezone, so days of the partitions are UTC days whatever the session's timezone
+    created_at = Column(
+        UTCDateTime,
+        primary_key=True,
+        default=lambda: datetime.now(timezone.utc),
+    )
     netuid = Column(Integer)
     hotkey = Column(String)
-    dividend = Column(Integer)
+    # Dividends are u64 on chain
+    dividend = Column(BigInteger)
+    # The block the dividend was read at
+    block = Column(BigInteger)
+    # The hotkey has no dividend on the subnet anymore as of `block`, `dividend` is 0
+    removed = Column(Boolean, nullable=False, default=False, server_default=false())
+
+
+class Dividend(BaseModel):
+    netuid: int
+    hotkey: str
+    dividends: int
+    # The block the dividends were read at
+    block: int | None = None
 
 
 class TaoDividendBase(BaseModel):
@@ -29,13 +85,47 @@ class TaoDividendBase(BaseModel):
 
 
 class TaoDividendDAO(TaoDividendBase, MyTaskBaseDAO):
-    pass
+    block: int | None = None
+    removed: bool = False
 
 
 class TaoDividendResponseItem(TaoDividendBase):
     cached: bool
+    # Whether the cached data was fresh or stale, "database" if it wasn't cached and came
+    # from the last persisted dividends, "miss" if it was just queried from the chain
+    cache_status: CacheStatus
+    # The block the dividends were read at
+    block: int | None = None
     stake_tx_triggered: bool
 
 
 class GetTaoDividendsResponse(BaseModel):
     dividends: list[TaoDividendResponseItem]
+
+
+class TaoDividendChange(TaoDividendBase):
+    # The block the dividend was read at
+    block: int | None = None
+    # The hotkey has no dividend on the subnet anymore, `dividend` is 0
+    removed: bool = False
+
+
+class TaoDividendHistoryItem(TaoDividendBase):
+    block: int | None
+    # The time of the block the dividend was read at
+    created_at: MyTaskDatetime
+    # The hotkey has no dividend on the subnet anymore, `dividend` is 0
+    removed: bool = False
+
+
+class GetTaoDividendHistoryResponse(BaseModel):
+    dividends: list[TaoDividendHistoryItem]
+
+
+class GetTaoDividendChangesResponse(BaseModel):
+    changes: list[TaoDividendChange]
+    # Cursors to pass as `since_block` or `since` to get the next changes
+    block: int | None
+    timestamp: float
+    # No cursor was given or the change log doesn't reach back to it, `changes` is everything
+    full: bool
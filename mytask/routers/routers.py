@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
-from mytask.routers.v1 import tao
+from mytask.routers.v1 import status, tao
 
 router = APIRouter()
 router.include_router(tao.router, prefix="/v1")
+router.include_router(status.router, prefix="/v1")
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Request, Response
+
+from mytask.models.status import ReadinessResponse, StatusResponse
+from mytask.services.tao_service import TaoService, get_tao_service
+
+router = APIRouter()
+
+
+@router.get("/status")
+async def get_status(
+    tao_service: TaoService = Depends(get_tao_service),
+) -> StatusResponse:
+    return StatusResponse(
+        substrate_limiter=tao_service.limiter.stats(),
+        dividend_writer=tao_service.writer.stats(),
+    )
+
+
+@router.get("/ready")
+async def get_ready(request: Request, response: Response) -> ReadinessResponse:
+    """Readiness probe, 503 until the `TaoService` is warmed up by the app's lifespan."""
+    ready = getattr(request.app.state, "tao_service_ready", False)
+    if not ready:
+        response.status_code = 503
+    return ReadinessResponse(ready=ready)
@@ -1,8 +1,23 @@
 
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
 
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mytask.common.cache_status import CacheStatus
 from mytask.common.logger import get_logger
-from mytask.models.tao import GetTaoDividendsResponse, TaoDividendResponseItem
+from mytask.common.table import get_session
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import (
+    GetTaoDividendChangesResponse,
+    GetTaoDividendHistoryResponse,
+    GetTaoDividendsResponse,
+    TaoDividendChange,
+    TaoDividendHistoryItem,
+    TaoDividendResponseItem,
+)
 from mytask.services.tao_service import TaoService, get_tao_service
 from mytask.workers.tasks import analyze_sentiment_and_stake
 
@@ -14,17 +29,28 @@ def run_sentiment_task(netuid: int, hotkey: str):
     analyze_sentiment_and_stake.delay(netuid, hotkey)  # type: ignore
 
 
-@router.get("/tao_dividends")
+@router.get("/tao_dividends", response_model=GetTaoDividendsResponse)
 async def get_tao_dividends(
     netuid: int | None = None,
     hotkey: str | None = None,
     trade: bool = False,
+    stream: bool = False,
     tao_service: TaoService = Depends(get_tao_service),
-) -> GetTaoDividendsResponse:
+) -> GetTaoDividendsResponse | StreamingResponse:
+    """
+    Get TAO dividends, optionally filtered by subnet and hotkey.
+
+    With `stream`, the dividends are sent as NDJSON, one `TaoDividendResponseItem` per line and
+    one subnet per chunk. They are still read in full first, from the cache or the single-flight
+    fill, only the response is split up.
+    """
     logger.info(f"Getting TAO dividends for {netuid} and {hotkey}")
 
     # Get dividends data
-    dividends, is_cached = await tao_service.get_cached_dividends(netuid, hotkey)
+    if stream:
+        batches, cache_status = await tao_service.stream_cached_dividends(netuid, hotkey)
+    else:
+        dividends, cache_status = await tao_service.get_cached_dividends(netuid, hotkey)
 
     # Set default values if they're None
     default_netuid = 18
@@ -39,16 +65,118 @@ async def get_tao_dividends(
         # This will run the function after the response is sent
         # background_tasks.add_task(run_sentiment_task, netuid_to_use, hotkey_to_use)
         run_sentiment_task(netuid_to_use, hotkey_to_use)
+
+    if stream:
+        return StreamingResponse(
+            _stream_items(batches, cache_status, trade),
+            media_type="application/x-ndjson",
+        )
+
     # Create response objects
-    dividend_base_list = [
+    dividend_base_list = _make_items(dividends, cache_status, trade)
+
+    return GetTaoDividendsResponse(dividends=dividend_base_list)
+
+
+@router.get("/tao_dividends/changes")
+async def get_tao_dividend_changes(
+    since_block: int | None = None,
+    since: float | None = None,
+    tao_service: TaoService = Depends(get_tao_service),
+) -> GetTaoDividendChangesResponse:
+    """
+    Get the TAO dividends that changed after a block or a Unix timestamp.
+
+    Pollers pass the `block` or `timestamp` of the previous response to get only what changed
+    since. Without a cursor, or with one older than the change log, all dividends are returned
+    with `full` set.
+    """
+    logger.info(f"Getting TAO dividend changes since block {since_block}, time {since}")
+
+    changes, full = await tao_service.get_dividend_changes(since_block, since)
+    items = [
+        TaoDividendChange(netuid=netuid, hotkey=hotkey, dividend=dividend, block=block)
+        for netuid, hotkey, dividend, block in changes.changed.rows()
+    ]
+    items += [
+        TaoDividendChange(netuid=netuid, hotkey=hotkey, dividend=0, block=block, removed=True)
+        for netuid, hotkey, _, block in changes.removed.rows()
+    ]
+
+    return GetTaoDividendChangesResponse(
+        changes=items, block=changes.block, timestamp=changes.timestamp, full=full
+    )
+
+
+@router.get("/tao_dividends/history")
+async def get_tao_dividend_history(
+    netuid: int | None = None,
+    hotkey: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    tao_service: TaoService = Depends(get_tao_service),
+    session: AsyncSession = Depends(get_session),
+) -> GetTaoDividendHistoryResponse:
+    """
+    Get the TAO dividends read between `start` and `end`, oldest first.
+
+    Times are block times, `end` defaults to now and `start` to a day before `end`. History is
+    kept for `dividends_history_retention_days`.
+    """
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=1)
+    logger.info(f"Getting TAO dividend history for {netuid} and {hotkey}, {start} to {end}")
+
+    dividends = await tao_service.get_dividend_history(
+        start, end, netuid=netuid, hotkey=hotkey, limit=limit, session=session
+    )
+    return GetTaoDividendHistoryResponse(
+        dividends=[
+            TaoDividendHistoryItem(
+                netuid=dividend.netuid,
+                hotkey=dividend.hotkey,
+                dividend=dividend.dividend,
+                block=dividend.block,
+                created_at=dividend.created_at,
+                removed=dividend.removed,
+            )
+            for dividend in dividends
+        ]
+    )
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # Times without a timezone are taken as UTC
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _make_items(
+    dividends: DividendSnapshot, cache_status: CacheStatus, trade: bool
+) -> list[TaoDividendResponseItem]:
+    # The snapshot only becomes pydantic models here, at the edge
+    return [
         TaoDividendResponseItem(
-            netuid=dividend.netuid,
-            hotkey=dividend.hotkey,
-            dividend=dividend.dividends,
-            cached=is_cached,
+            netuid=netuid,
+            hotkey=hotkey,
+            dividend=dividend,
+            cached=cache_status != CacheStatus.MISS,
+            cache_status=cache_status,
+            block=block,
             stake_tx_triggered=trade,
         )
-        for dividend in dividends
+        for netuid, hotkey, dividend, block in dividends.rows()
     ]
 
-    return GetTaoDividendsResponse(dividends=dividend_base_list)
+
+async def _stream_items(
+    batches: AsyncIterator[DividendSnapshot], cache_status: CacheStatus, trade: bool
+) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        # One chunk per subnet
+        yield b"".join(
+            item.model_dump_json().encode() + b"\n"
+            for item in _make_items(batch, cache_status, trade)
+        )
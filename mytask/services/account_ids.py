@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+from bittensor.core.settings import SS58_FORMAT
+from scalecodec.utils.ss58 import ss58_encode
+
+
+class AccountIdDecoder:
+    """
+    Memoized SS58 encoding of raw account ids, as returned in `query_map` keys.
+
+    Encoding hashes and base58 encodes every id, while the same hotkeys come back for every
+    subnet and every refresh. Encoded addresses are kept in a bounded LRU keyed by the raw
+    id, so a snapshot only pays for hotkeys it hasn't seen recently. Like `LocalCache` it's
+    not thread-safe and meant to be used from a single event loop.
+    """
+
+    def __init__(self, maxsize: int = 65536, ss58_format: int = SS58_FORMAT):
+        """
+        Initialize the AccountIdDecoder.
+
+        Args:
+            maxsize (int): The number of addresses to keep.
+            ss58_format (int): The SS58 format of the chain.
+        """
+        self.maxsize = maxsize
+        self.ss58_format = ss58_format
+        self.hits = 0
+        self.misses = 0
+        self._addresses: OrderedDict[Hashable, str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def decode(self, account_id: Any) -> str:
+        return self.decode_many([account_id])[0]
+
+    def decode_many(self, account_ids: Iterable[Any]) -> list[str]:
+        """
+        Decode a page of account ids, encoding every id missing from the cache once.
+
+        Args:
+            account_ids (Iterable[Any]): Raw account ids, as bytes or tuples of byte values,
+                optionally wrapped in a 1-tuple like `query_map` keys are.
+
+        Returns:
+            list[str]: The SS58 addresses, in the order of `account_ids`.
+        """
+        addresses = self._addresses
+        keys = [_cache_key(account_id) for account_id in account_ids]
+
+        missing = {key for key in keys if key not in addresses}
+        for key in missing:
+            addresses[key] = ss58_encode(bytes(key), self.ss58_format)
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        result = []
+        for key in keys:
+            addresses.move_to_end(key)
+            result.append(addresses[key])
+
+        # Evicted only after the page is decoded, so a page larger than the cache still works
+        while len(addresses) > self.maxsize:
+            addresses.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        self._addresses.clear()
+
+
+def _cache_key(account_id: Any) -> Hashable:
+    if (
+        isinstance(account_id, tuple)
+        and len(account_id) == 1
+        and isinstance(account_id[0], (tuple, list, bytes))
+    ):
+        account_id = account_id[0]
+    if isinstance(account_id, (bytes, tuple)):
+        return account_id
+    return bytes(account_id)
@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from bittensor.core.async_subtensor import AsyncSubstrateInterface
+
+from mytask.common.logger import get_logger
+from mytask.services.substrate_pool import SubstratePool
+
+logger = get_logger()
+
+# Seconds per block on Bittensor
+BLOCK_TIME = 12
+
+
+class BlockTracker:
+    """
+    Follows new block headers and reports subnets whose epoch has just passed.
+
+    Dividends of a subnet only change when its epoch runs, which happens at the blocks where
+    `(block + netuid + 1) % (tempo + 1) == tempo`, same as subtensor's `blocks_until_next_epoch`.
+    """
+
+    def __init__(
+        self,
+        pool: SubstratePool,
+        on_epoch: Callable[[list[int], int], Awaitable[None]],
+        tempo_refresh_blocks: int = 300,
+    ):
+        """
+        Initialize the BlockTracker.
+
+        Args:
+            pool (SubstratePool): The connections to subscribe and query on.
+            on_epoch (Callable[[list[int], int], Awaitable[None]]): Called with the subnets whose
+                epoch has passed and the current block.
+            tempo_refresh_blocks (int): Blocks between reloads of the subnet tempos.
+        """
+        self.pool = pool
+        self.on_epoch = on_epoch
+        self.tempo_refresh_blocks = tempo_refresh_blocks
+        self.block: int | None = None
+        self.tempos: dict[int, int] = {}
+        self._tempos_block: int | None = None
+        self._task: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+
+    def ensure_started(self) -> None:
+        if (
+            self._task is not None
+            and not self._task.done()
+            and self._task.get_loop() is asyncio.get_running_loop()
+        ):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def blocks_until_next_epoch(self, netuid: int, block: int | None = None) -> int | None:
+        block = self.block if block is None else block
+        tempo = self.tempos.get(netuid)
+        if block is None or not tempo:
+            return None
+        return tempo - (block + netuid + 1) % (tempo + 1)
+
+    def seconds_until_next_epoch(self, netuid: int) -> int | None:
+        blocks = self.blocks_until_next_epoch(netuid)
+        if blocks is None:
+            return None
+        return blocks * BLOCK_TIME
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                await self._load_tempos()
+                # Holds on to one connection, which other requests then avoid as busy
+                async with self.pool.connection() as substrate:
+                    await substrate.subscribe_block_headers(self._on_header)
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Block header subscription failed: {e}")
+
+            # The subscription only ends on errors, resubscribe with a backoff
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def _load_tempos(self) -> None:
+        async def query(substrate: AsyncSubstrateInterface) -> dict[int, int]:
+            result = await substrate.query_map("SubtensorModule", "Tempo")
+            return {
+                int(getattr(netuid, "value", netuid)): int(tempo.value)
+                async for netuid, tempo in result  # type: ignore
+            }
+
+        tempos = await self.pool.run(query)
+        self.tempos = tempos
+        self._tempos_block = self.block
+        logger.info(f"Loaded tempos of {len(tempos)} subnets")
+
+    async def _on_header(self, block_data: dict[str, Any]) -> None:
+        number = int(block_data["header"]["number"])
+        previous, self.block = self.block, number
+        if previous is None or number <= previous:
+            return None
+
+        if (
+            self._tempos_block is None
+            or number - self._tempos_block >= self.tempo_refresh_blocks
+        ):
+            self._tempos_block = number
+            self._spawn(self._load_tempos())
+
+        netuids = [
+            netuid
+            for netuid in self.tempos
+            # Epochs in (previous, number], blocks may be skipped when the node lags behind
+            if (blocks := self.blocks_until_next_epoch(netuid, previous)) is not None
+            and 0 < blocks <= number - previous
+        ]
+        if netuids:
+            logger.info(f"Epoch passed at block {number} for netuids {netuids}")
+            self._spawn(self.on_epoch(netuids, number))
+
+        # Returning None keeps the subscription going
+        return None
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        # Don't block the subscription, keep a reference so the task isn't garbage collected
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Block tracker task failed: {task.exception()}")
@@ -0,0 +1,162 @@
+import time
+from typing import NamedTuple
+
+from redis.asyncio import Redis
+
+from mytask.common.logger import get_logger
+from mytask.models.dividend_snapshot import (
+    DividendSnapshot,
+    SnapshotColumns,
+    SnapshotDiff,
+)
+
+logger = get_logger()
+
+
+class DividendChanges(NamedTuple):
+    changed: DividendSnapshot
+    removed: DividendSnapshot
+    # The latest refresh the changes include, the cursor for the next poll
+    block: int | None
+    timestamp: float
+
+
+class DividendChangeLog:
+    """
+    Log of the changes between consecutive dividend snapshots, in a Redis stream.
+
+    Every refresh appends the rows that changed since the previous snapshot, so pollers only
+    fetch what changed since their last poll. The log is complete from a start block and
+    timestamp on: when a refresh had no previous snapshot to compare with, the log restarts
+    there, and entries older than `retention` are trimmed. Cursors before the start can't be
+    answered, those clients need the full snapshot.
+    """
+
+    def __init__(self, redis: Redis, retention: int, prefix: str = "dividends"):
+        self.redis = redis
+        self.retention = retention
+        self.prefix = prefix
+
+    @property
+    def _stream_key(self) -> str:
+        return f"{self.prefix}:changes"
+
+    @property
+    def _start_key(self) -> str:
+        return f"{self.prefix}:changes:start"
+
+    async def reset(self, block: int | None) -> None:
+        """Drop the log, it's complete from `block` and now on."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._stream_key)
+            pipe.hset(self._start_key, mapping=_cursor_fields(block, time.time()))
+            await pipe.execute()
+        logger.info(f"Restarted the dividend change log at block {block}")
+
+    async def append(self, diff: SnapshotDiff, block: int | None) -> None:
+        """
+        Log the changes of a refresh, and trim entries older than the retention.
+
+        Args:
+            diff (SnapshotDiff): The changes against the previous snapshot.
+            block (int | None): The block the refresh read the dividends at.
+        """
+        if not await self.redis.exists(self._start_key):
+            # Without a start, the changes before this refresh are unknown
+            await self.reset(block)
+            return
+
+        fields = {
+            "changed": diff.changed.to_columns().model_dump_json(),
+            "removed": diff.removed.to_columns().model_dump_json(),
+            **_cursor_fields(block, None),
+        }
+        await self.redis.xadd(self._stream_key, fields)  # type: ignore
+
+        min_id = int((time.time() - self.retention) * 1000)
+        trimmed = await self.redis.xrevrange(
+            self._stream_key, max=str(min_id - 1), min="-", count=1
+        )
+        if trimmed:
+            # The log is complete after the newest trimmed entry
+            entry_id, entry = trimmed[0]
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    self._start_key,
+                    mapping=_cursor_fields(_entry_block(entry), _entry_time(entry_id)),
+                )
+                pipe.xtrim(self._stream_key, minid=min_id)
+                await pipe.execute()
+
+    async def since(
+        self, block: int | None = None, timestamp: float | None = None
+    ) -> DividendChanges | None:
+        """
+        Get the changes after a block or a timestamp, the latest change of every row.
+
+        Args:
+            block (int | None): Only changes read after this block.
+            timestamp (float | None): Only changes logged after this Unix timestamp.
+
+        Returns:
+            DividendChanges | None: The changes, None if the log doesn't reach back that far.
+        """
+        start = await self.redis.hgetall(self._start_key)
+        if not start:
+            return None
+        start_block = _entry_block(start)
+        start_time = float(start[b"timestamp"])
+
+        if block is not None and (start_block is None or block < start_block):
+            return None
+        if timestamp is not None and timestamp < start_time:
+            return None
+
+        min_id = "-" if timestamp is None else str(round(timestamp * 1000) + 1)
+        entries = await self.redis.xrange(self._stream_key, min=min_id, max="+")
+
+        latest: dict[tuple[int, str], tuple[int, int | None, bool]] = {}
+        cursor_block, cursor_time = start_block, start_time
+        for entry_id, entry in entries:
+            entry_block = _entry_block(entry)
+            cursor_time = _entry_time(entry_id)
+            if entry_block is not None:
+                cursor_block = entry_block
+            if block is not None and (entry_block is None or entry_block <= block):
+                continue
+
+            for field, is_removed in ((b"changed", False), (b"removed", True)):
+                columns = SnapshotColumns.model_validate_json(entry[field])
+                for netuid, hotkey, dividend, row_block in DividendSnapshot.from_columns(
+                    columns
+                ).rows():
+                    latest[netuid, hotkey] = (dividend, row_block, is_removed)
+
+        changed, removed = [], []
+        for (netuid, hotkey), (dividend, row_block, is_removed) in sorted(latest.items()):
+            rows = removed if is_removed else changed
+            rows.append((netuid, hotkey, dividend, row_block))
+
+        return DividendChanges(
+            changed=DividendSnapshot.from_rows(changed),
+            removed=DividendSnapshot.from_rows(removed),
+            block=cursor_block,
+            timestamp=cursor_time,
+        )
+
+
+def _cursor_fields(block: int | None, timestamp: float | None) -> dict[str, str]:
+    fields = {"block": "" if block is None else str(block)}
+    if timestamp is not None:
+        fields["timestamp"] = repr(timestamp)
+    return fields
+
+
+def _entry_block(entry: dict[bytes, bytes]) -> int | None:
+    value = entry.get(b"block")
+    return int(value) if value else None
+
+
+def _entry_time(entry_id: bytes) -> float:
+    # Stream ids start with the time they were added at, in milliseconds
+    return int(entry_id.split(b"-")[0]) / 1000
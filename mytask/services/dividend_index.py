@@ -0,0 +1,127 @@
+import time
+from typing import NamedTuple
+
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import Dividend
+
+
+class SubnetDividends(NamedTuple):
+    snapshot: DividendSnapshot
+    block: int | None
+    expires_at: float
+
+
+class DividendIndex:
+    """
+    In-process index of dividend snapshots.
+
+    Every subnet is kept as its columnar snapshot, and every hotkey maps to the
+    `(netuid, dividend)` pairs of the subnets it has dividends on, so a hotkey lookup costs the
+    number of its subnets instead of a scan over all dividends. Like `DividendStore`, hotkey
+    lookups are only answered once all subnets were indexed together.
+    """
+
+    def __init__(self):
+        self._subnets: dict[int, SubnetDividends] = {}
+        self._by_hotkey: dict[str, list[tuple[int, int]]] = {}
+        self._complete_until = 0.0
+
+    def __len__(self) -> int:
+        return len(self._subnets)
+
+    def get(self, netuid: int, hotkey: str) -> list[Dividend] | None:
+        """Get the dividend of a hotkey on a subnet, None if the subnet isn't indexed."""
+        subnet = self._get_subnet(netuid)
+        if subnet is None:
+            return None
+        return [
+            Dividend(netuid=netuid, hotkey=hotkey, dividends=dividends, block=subnet.block)
+            for indexed_netuid, dividends in self._by_hotkey.get(hotkey, [])
+            if indexed_netuid == netuid
+        ]
+
+    def get_subnet(self, netuid: int) -> DividendSnapshot | None:
+        """Get the dividends of a subnet, None if the subnet isn't indexed."""
+        subnet = self._get_subnet(netuid)
+        if subnet is None:
+            return None
+        return subnet.snapshot
+
+    def get_by_hotkey(self, hotkey: str) -> list[Dividend] | None:
+        """Get the dividends of a hotkey on all subnets, None if not all subnets are indexed."""
+        if time.time() >= self._complete_until:
+            return None
+
+        dividends = []
+        for netuid, value in self._by_hotkey.get(hotkey, []):
+            subnet = self._get_subnet(netuid)
+            if subnet is None:
+                return None
+            dividends.append(
+                Dividend(netuid=netuid, hotkey=hotkey, dividends=value, block=subnet.block)
+            )
+        return dividends
+
+    def replace_subnets(
+        self,
+        dividends_by_netuid: dict[int, DividendSnapshot],
+        ttl: float,
+        complete: bool = False,
+    ) -> None:
+        """
+        Replace the indexed dividends of some subnets.
+
+        Args:
+            dividends_by_netuid (dict[int, DividendSnapshot]): The new dividends per subnet.
+            ttl (float): Seconds the dividends are served for.
+            complete (bool): Whether these are all subnets, which enables hotkey lookups.
+        """
+        if complete:
+            # Rebuilding is cheaper than unlinking every subnet from the hotkeys
+            self.clear()
+        else:
+            for netuid in dividends_by_netuid:
+                self._remove_subnet(netuid)
+
+        expires_at = time.time() + ttl
+        for netuid, snapshot in dividends_by_netuid.items():
+            rows = list(snapshot.rows())
+            self._subnets[netuid] = SubnetDividends(
+                snapshot=snapshot,
+                block=rows[0][3] if rows else None,
+                expires_at=expires_at,
+            )
+            for _, hotkey, dividend, _ in rows:
+                self._by_hotkey.setdefault(hotkey, []).append((netuid, dividend))
+
+        if complete:
+            self._complete_until = expires_at
+
+    def invalidate(self, netuids: list[int]) -> None:
+        """Drop some subnets, which disables hotkey lookups until all subnets are indexed again."""
+        for netuid in netuids:
+            self._remove_subnet(netuid)
+        self._complete_until = 0.0
+
+    def clear(self) -> None:
+        self._subnets.clear()
+        self._by_hotkey.clear()
+        self._complete_until = 0.0
+
+    def _get_subnet(self, netuid: int) -> SubnetDividends | None:
+        subnet = self._subnets.get(netuid)
+        if subnet is None or time.time() >= subnet.expires_at:
+            return None
+        return subnet
+
+    def _remove_subnet(self, netuid: int) -> None:
+        subnet = self._subnets.pop(netuid, None)
+        if subnet is None:
+            return
+
+        for _, hotkey, _, _ in subnet.snapshot.rows():
+            remaining = [entry for entry in self._by_hotkey[hotkey] if entry[0] != netuid]
+            if remaining:
+                self._by_hotkey[hotkey] = remaining
+            else:
+                del self._by_hotkey[hotkey]
@@ -0,0 +1,220 @@
+from uuid import uuid4
+
+from redis.asyncio import Redis
+
+from mytask.common.logger import get_logger
+from mytask.models.dividend_snapshot import DividendSnapshot, SnapshotDiff
+from mytask.models.tao import Dividend
+
+logger = get_logger()
+
+# Hash field with the block a subnet was read at, hotkeys are SS58 addresses so can't collide
+BLOCK_FIELD = "_block"
+
+
+class DividendStore:
+    """
+    Dividends stored as Redis hashes for point lookups.
+
+    Every subnet is a hash `dividends:netuid:X` of hotkey -> dividend, and every hotkey has a
+    set `dividends:hotkey:Y` of the subnets it has dividends on. Anything in the store is
+    fresh, it expires after `ttl`. Hotkey lookups are only answered once all subnets were
+    stored together, otherwise subnets missing from the store would be silently left out.
+    The block a subnet was read at is kept in the `_block` field of its hash.
+    """
+
+    def __init__(self, redis: Redis, ttl: int, prefix: str = "dividends"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _subnet_key(self, netuid: int) -> str:
+        return f"{self.prefix}:netuid:{netuid}"
+
+    def _hotkey_key(self, hotkey: str) -> str:
+        return f"{self.prefix}:hotkey:{hotkey}"
+
+    @property
+    def _complete_key(self) -> str:
+        return f"{self.prefix}:complete"
+
+    async def get(self, netuid: int, hotkey: str) -> list[Dividend] | None:
+        """Get the dividend of a hotkey on a subnet, None if the subnet isn't stored."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self._subnet_key(netuid))
+            pipe.hmget(self._subnet_key(netuid), [hotkey, BLOCK_FIELD])
+            exists, (value, block) = await pipe.execute()
+
+        if not exists:
+            return None
+        if value is None:
+            return []
+        return [
+            Dividend(
+                netuid=netuid, hotkey=hotkey, dividends=int(value), block=_block(block)
+            )
+        ]
+
+    async def get_subnet(self, netuid: int) -> list[Dividend] | None:
+        """Get the dividends of a subnet, None if the subnet isn't stored."""
+        values = await self.redis.hgetall(self._subnet_key(netuid))
+        if not values:
+            return None
+        block = _block(values.pop(BLOCK_FIELD.encode(), None))
+        return [
+            Dividend(
+                netuid=netuid, hotkey=hotkey.decode(), dividends=int(value), block=block
+            )
+            for hotkey, value in values.items()
+        ]
+
+    async def get_by_hotkey(self, hotkey: str) -> list[Dividend] | None:
+        """Get the dividends of a hotkey on all subnets, None if not all subnets are stored."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self._complete_key)
+            pipe.smembers(self._hotkey_key(hotkey))
+            complete, netuids = await pipe.execute()
+
+        if not complete:
+            return None
+
+        netuids = sorted(int(netuid) for netuid in netuids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for netuid in netuids:
+                pipe.hmget(self._subnet_key(netuid), [hotkey, BLOCK_FIELD])
+            values = await pipe.execute()
+
+        return [
+            Dividend(
+                netuid=netuid, hotkey=hotkey, dividends=int(value), block=_block(block)
+            )
+            for netuid, (value, block) in zip(netuids, values)
+            # The subnet has expired or dropped the hotkey since the index was read
+            if value is not None
+        ]
+
+    async def replace_subnets(
+        self,
+        dividends_by_netuid: dict[int, DividendSnapshot],
+        complete: bool = False,
+    ) -> None:
+        """
+        Replace the stored dividends of some subnets.
+
+        Every subnet is written to a temporary hash and swapped in with RENAME, so readers
+        never see a partially written subnet.
+
+        Args:
+            dividends_by_netuid (dict[int, DividendSnapshot]): The new dividends per subnet.
+            complete (bool): Whether these are all subnets, which enables hotkey lookups.
+        """
+        netuids = list(dividends_by_netuid)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for netuid in netuids:
+                pipe.hkeys(self._subnet_key(netuid))
+            previous_hotkeys = await pipe.execute()
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for netuid, previous in zip(netuids, previous_hotkeys):
+                rows = list(dividends_by_netuid[netuid].rows())
+                subnet_key = self._subnet_key(netuid)
+
+                if rows:
+                    tmp_key = f"{subnet_key}:tmp:{uuid4().hex}"
+                    mapping: dict[str, int] = {
+                        hotkey: dividend for _, hotkey, dividend, _ in rows
+                    }
+                    block = rows[0][3]
+                    if block is not None:
+                        mapping[BLOCK_FIELD] = block
+                    pipe.hset(tmp_key, mapping=mapping)
+                    pipe.expire(tmp_key, self.ttl)
+                    pipe.rename(tmp_key, subnet_key)
+                else:
+                    pipe.delete(subnet_key)
+
+                hotkeys = {hotkey for _, hotkey, _, _ in rows}
+                for hotkey in {h.decode() for h in previous} - hotkeys - {BLOCK_FIELD}:
+                    pipe.srem(self._hotkey_key(hotkey), netuid)
+                for hotkey in hotkeys:
+                    pipe.sadd(self._hotkey_key(hotkey), netuid)
+                    pipe.expire(self._hotkey_key(hotkey), self.ttl)
+
+            if complete:
+                pipe.set(self._complete_key, 1, ex=self.ttl)
+            await pipe.execute()
+
+        logger.info(f"Stored dividends of {len(netuids)} subnets in hashes")
+
+    async def apply_changes(
+        self,
+        dividends_by_netuid: dict[int, DividendSnapshot],
+        diff: SnapshotDiff,
+        complete: bool = False,
+    ) -> None:
+        """
+        Update the stored dividends of some subnets, writing only the rows that changed.
+
+        Unchanged rows only get their expiry extended. Subnets that aren't stored are written
+        in full, like `replace_subnets` does.
+
+        Args:
+            dividends_by_netuid (dict[int, DividendSnapshot]): The new dividends per subnet.
+            diff (SnapshotDiff): The changes of these subnets since they were stored.
+            complete (bool): Whether these are all subnets, which enables hotkey lookups.
+        """
+        netuids = list(dividends_by_netuid)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for netuid in netuids:
+                pipe.exists(self._subnet_key(netuid))
+            exists = await pipe.execute()
+
+        missing = {
+            netuid: dividends_by_netuid[netuid]
+            for netuid, stored in zip(netuids, exists)
+            if not stored
+        }
+        if missing:
+            await self.replace_subnets(missing)
+
+        changed = diff.changed.split_by_netuid()
+        removed = diff.removed.split_by_netuid()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for netuid in netuids:
+                if netuid in missing:
+                    continue
+                subnet_key = self._subnet_key(netuid)
+
+                if netuid in changed:
+                    rows = list(changed[netuid].rows())
+                    pipe.hset(
+                        subnet_key,
+                        mapping={hotkey: dividend for _, hotkey, dividend, _ in rows},
+                    )
+                    for _, hotkey, _, _ in rows:
+                        pipe.sadd(self._hotkey_key(hotkey), netuid)
+                if netuid in removed:
+                    hotkeys = removed[netuid].hotkeys
+                    pipe.hdel(subnet_key, *hotkeys)
+                    for hotkey in hotkeys:
+                        pipe.srem(self._hotkey_key(hotkey), netuid)
+
+                block = next(dividends_by_netuid[netuid].rows(), (None,) * 4)[3]
+                if block is not None:
+                    pipe.hset(subnet_key, BLOCK_FIELD, block)
+                pipe.expire(subnet_key, self.ttl)
+                for hotkey in dividends_by_netuid[netuid].hotkeys:
+                    pipe.expire(self._hotkey_key(hotkey), self.ttl)
+
+            if complete:
+                pipe.set(self._complete_key, 1, ex=self.ttl)
+            await pipe.execute()
+
+        logger.info(
+            f"Stored {len(diff)} changed dividends of {len(netuids) - len(missing)} subnets"
+            f" and {len(missing)} subnets in full in hashes"
+        )
+
+
+def _block(value: bytes | None) -> int | None:
+    return None if value is None else int(value)
@@ -1,5 +1,7 @@
 from redis.asyncio import Redis
 
+from mytask.common.cache_codec import make_codec
+from mytask.common.local_cache import LocalCache
 from mytask.common.redis_cache import RedisCache
 from mytask.common.settings import get_settings
 from mytask.common.singleton import singleton
@@ -14,4 +16,17 @@ def get_redis_cache() -> RedisCache:
         port=settings.redis_port,
         password=settings.redis_password,
     )
-    return RedisCache(redis)
+
+    local_cache = None
+    if settings.cache_local_maxsize > 0:
+        local_cache = LocalCache(
+            maxsize=settings.cache_local_maxsize,
+            ttl=settings.cache_local_ttl,
+        )
+
+    codec = make_codec(
+        settings.cache_codec,
+        compression=settings.cache_compression,
+        compression_threshold=settings.cache_compression_threshold,
+    )
+    return RedisCache(redis, local_cache=local_cache, codec=codec)
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from async_substrate_interface import AsyncSubstrateInterface
+from async_substrate_interface.errors import SubstrateRequestException
+from async_substrate_interface.types import Runtime
+from bt_decode import MetadataV15, PortableRegistry
+from scalecodec.base import ScaleBytes
+
+from mytask.common.logger import get_logger
+
+logger = get_logger()
+
+# The metadata version `AsyncSubstrateInterface` builds its type registry from
+METADATA_V15 = "0x0f000000"
+
+
+class RuntimeMetadataCache:
+    """
+    On-disk cache of the raw runtime metadata, one file per chain and runtime version.
+
+    A runtime only changes with a runtime upgrade, while downloading its metadata and type
+    registry takes seconds on every connect. Connections of one process loading the same
+    runtime at once download it once.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self._entries: dict[str, dict] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Get the raw metadata of a runtime, fetching and storing it if it isn't cached.
+
+        Args:
+            key (str): Identifies the chain and runtime version.
+            fetch (Callable[[], Awaitable[dict]]): Downloads the raw metadata.
+
+        Returns:
+            dict: The runtime info and the hex encoded metadata.
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = await asyncio.to_thread(self._read, key)
+            if entry is None:
+                entry = await fetch()
+                await asyncio.to_thread(self._write, key, entry)
+            self._entries[key] = entry
+            return entry
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> dict | None:
+        try:
+            with self._path(key).open() as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable runtime metadata {key}: {e}")
+            return None
+
+    def _write(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed so other processes never read half a file
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp.open("w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not store runtime metadata {key}: {e}")
+
+
+class CachedRuntimeSubstrate(AsyncSubstrateInterface):
+    """`AsyncSubstrateInterface` loading runtime metadata through a `RuntimeMetadataCache`."""
+
+    def __init__(
+        self,
+        url: str,
+        metadata_cache: RuntimeMetadataCache | None = None,
+        **kwargs,
+    ):
+        super().__init__(url, **kwargs)
+        self.metadata_cache = metadata_cache
+
+    async def init_runtime(
+        self, block_hash: Optional[str] = None, block_id: Optional[int] = None
+    ) -> Runtime:
+        if self.metadata_cache is None:
+            return await super().init_runtime(block_hash=block_hash, block_id=block_id)
+
+        if block_id is not None:
+            block_hash = await self.get_block_hash(block_id)
+        if not block_hash:
+            block_hash = await self.get_chain_head()
+
+        # Both are cached by the interface, `super().init_runtime` doesn't request them again
+        runtime_version = await self.get_block_runtime_version_for(block_hash)
+        if runtime_version is not None and not self.runtime_cache.retrieve(
+            runtime_version=runtime_version
+        ):
+            genesis_hash = await self.get_block_hash(0)
+            entry = await self.metadata_cache.get(
+                f"{genesis_hash}-{runtime_version}",
+                lambda: self._fetch_runtime_metadata(block_hash),
+            )
+            self.runtime_cache.add_item(
+                runtime_version=runtime_version, runtime=self._build_runtime(entry)
+            )
+
+        return await super().init_runtime(block_hash=block_hash)
+
+    async def _fetch_runtime_metadata(self, block_hash: str) -> dict:
+        logger.info(f"Downloading runtime metadata from {self.url}")
+        runtime_block_hash = await self.get_parent_block_hash(block_hash)
+        runtime_info, metadata, metadata_v15 = await asyncio.gather(
+            self.get_block_runtime_info(runtime_block_hash),
+            self.get_block_metadata(block_hash=runtime_block_hash, decode=False),
+            self.rpc_request(
+                "state_call",
+                ["Metadata_metadata_at_version", METADATA_V15],
+                block_hash=runtime_block_hash,
+            ),
+        )
+        if metadata is None:
+            raise SubstrateRequestException(f"No metadata for block '{runtime_block_hash}'")
+        return {
+            "runtime_info": runtime_info,
+            "metadata": metadata,
+            "metadata_v15": metadata_v15["result"],
+        }
+
+    def _build_runtime(self, entry: dict) -> Runtime:
+        # Decoded like `AsyncSubstrateInterface.init_runtime` does after downloading, with its
+        # internals, check this against new versions of async-substrate-interface
+        metadata = self.runtime_config.create_scale_object(
+            "MetadataVersioned", data=ScaleBytes(entry["metadata"])
+        )
+        metadata.decode()
+        metadata_v15 = MetadataV15.decode_from_metadata_option(
+            bytes.fromhex(entry["metadata_v15"][2:])
+        )
+        registry = PortableRegistry.from_metadata_v15(metadata_v15)
+        self._load_registry_type_map(registry)
+
+        return Runtime(
+            chain=self.chain,
+            runtime_config=self.runtime_config,
+            metadata=metadata,
+            type_registry=self.type_registry,
+            metadata_v15=metadata_v15,
+            runtime_info=entry["runtime_info"],
+            registry=registry,
+        )
@@ -0,0 +1,245 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from async_substrate_interface import AsyncSubstrateInterface
+from async_substrate_interface.errors import ConnectionClosed, SubstrateRequestException
+from bittensor.core.settings import SS58_FORMAT
+
+from mytask.common.logger import get_logger
+from mytask.services.runtime_metadata import CachedRuntimeSubstrate, RuntimeMetadataCache
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+# Errors after which a connection is replaced, request errors keep it in the pool
+CONNECTION_ERRORS = (ConnectionClosed, OSError, EOFError, asyncio.TimeoutError)
+
+
+class PooledConnection:
+    def __init__(
+        self,
+        endpoint: str,
+        ss58_format: int,
+        metadata_cache: RuntimeMetadataCache | None = None,
+    ):
+        self.endpoint = endpoint
+        self.ss58_format = ss58_format
+        self.metadata_cache = metadata_cache
+        self.substrate = self.new_substrate()
+        self.healthy = False
+        # Requests currently running on the connection, and all requests for tie breaks
+        self.in_flight = 0
+        self.requests = 0
+        self.reconnecting: asyncio.Task | None = None
+
+    def new_substrate(self) -> AsyncSubstrateInterface:
+        return CachedRuntimeSubstrate(
+            self.endpoint,
+            metadata_cache=self.metadata_cache,
+            ss58_format=self.ss58_format,
+        )
+
+
+class SubstratePool:
+    """
+    Pool of substrate connections, possibly to several endpoints.
+
+    Requests go to the healthy connection with the fewest requests in flight. Connections
+    failing with connection errors or health checks are taken out of the pool and reconnected
+    in the background, `run` fails over to another connection meanwhile.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[str],
+        size: int = 1,
+        ss58_format: int = SS58_FORMAT,
+        health_check_interval: float = 30,
+        health_check_timeout: float = 10,
+        connect_timeout: float = 60,
+        retries: int = 2,
+        metadata_cache: RuntimeMetadataCache | None = None,
+    ):
+        """
+        Initialize the SubstratePool.
+
+        Args:
+            endpoints (list[str]): The websocket URLs of the substrate nodes.
+            size (int): The number of connections per endpoint.
+            ss58_format (int): The SS58 format of the chain.
+            health_check_interval (float): Seconds between health checks of every connection.
+            health_check_timeout (float): Seconds a health check may take.
+            connect_timeout (float): Seconds connecting and loading the runtime may take.
+            retries (int): How often `run` retries on another connection.
+            metadata_cache (RuntimeMetadataCache | None): Where connections load the runtime
+                metadata from, downloaded by every connection if not set.
+        """
+        if not endpoints:
+            raise ValueError("At least one substrate endpoint is required")
+
+        # Interleaved so ties are spread over the endpoints
+        self.connections = [
+            PooledConnection(endpoint, ss58_format, metadata_cache)
+            for _ in range(size)
+            for endpoint in endpoints
+        ]
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self._health_check: asyncio.Task | None = None
+
+    async def initialize(self) -> None:
+        """Connect all connections, fails if no endpoint can be reached."""
+        await asyncio.gather(
+            *(self._connect(connection) for connection in self.connections)
+        )
+        healthy = sum(connection.healthy for connection in self.connections)
+        if not healthy:
+            raise ConnectionError("None of the substrate endpoints could be reached")
+        logger.info(f"Connected {healthy} of {len(self.connections)} substrate connections")
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncSubstrateInterface]:
+        """Borrow the least loaded healthy connection."""
+        async with self._borrow() as connection:
+            yield connection.substrate
+
+    async def run(
+        self,
+        func: Callable[[AsyncSubstrateInterface], Awaitable[T]],
+        retries: int | None = None,
+    ) -> T:
+        """
+        Run `func` on the least loaded healthy connection, failing over to other connections.
+
+        Args:
+            func (Callable[[AsyncSubstrateInterface], Awaitable[T]]): The requests to run, it's
+                called again with another connection when it fails.
+            retries (int | None): How often to retry on another connection, the pool's
+                `retries` if not set. Callers retrying themselves pass 0.
+
+        Returns:
+            T: The result of `func`.
+        """
+        tried: set[PooledConnection] = set()
+        for _ in range(self.retries if retries is None else retries):
+            try:
+                return await self._run_once(func, tried)
+            except (*CONNECTION_ERRORS, SubstrateRequestException) as e:
+                logger.warning(f"Substrate request failed, retrying on another connection: {e}")
+        return await self._run_once(func, tried)
+
+    async def close(self) -> None:
+        if self._health_check is not None:
+            self._health_check.cancel()
+            self._health_check = None
+
+        for connection in self.connections:
+            if connection.reconnecting is not None:
+                connection.reconnecting.cancel()
+            connection.healthy = False
+            await _close(connection.substrate)
+
+    async def _run_once(
+        self,
+        func: Callable[[AsyncSubstrateInterface], Awaitable[T]],
+        tried: set[PooledConnection],
+    ) -> T:
+        async with self._borrow(exclude=tried) as connection:
+            tried.add(connection)
+            return await func(connection.substrate)
+
+    @asynccontextmanager
+    async def _borrow(
+        self, exclude: set[PooledConnection] | None = None
+    ) -> AsyncIterator[PooledConnection]:
+        self._ensure_health_check()
+
+        healthy = [connection for connection in self.connections if connection.healthy]
+        if not healthy:
+            raise ConnectionError("No healthy substrate connection")
+        # Prefer connections not tried yet, but rather retry one than fail
+        candidates = [c for c in healthy if c not in (exclude or ())] or healthy
+        connection = min(candidates, key=lambda c: (c.in_flight, c.requests))
+
+        substrate = connection.substrate
+        connection.in_flight += 1
+        connection.requests += 1
+        try:
+            yield connection
+        except CONNECTION_ERRORS as e:
+            # Unless the connection was already replaced while the request was failing
+            if connection.substrate is substrate:
+                self._mark_unhealthy(connection, e)
+            raise
+        finally:
+            connection.in_flight -= 1
+
+    def _ensure_health_check(self) -> None:
+        if (
+            self._health_check is not None
+            and not self._health_check.done()
+            and self._health_check.get_loop() is asyncio.get_running_loop()
+        ):
+            return
+        self._health_check = asyncio.create_task(self._check_health())
+
+    async def _check_health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(
+                *(self._check_connection(connection) for connection in self.connections)
+            )
+
+    async def _check_connection(self, connection: PooledConnection) -> None:
+        if not connection.healthy:
+            # Failed reconnects are retried here, at most once per interval
+            self._reconnect(connection)
+            return
+
+        try:
+            await asyncio.wait_for(
+                connection.substrate.get_chain_head(), self.health_check_timeout
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._mark_unhealthy(connection, e)
+
+    def _mark_unhealthy(self, connection: PooledConnection, error: BaseException) -> None:
+        if connection.healthy:
+            logger.error(f"Substrate connection to {connection.endpoint} failed: {error}")
+            connection.healthy = False
+        self._reconnect(connection)
+
+    def _reconnect(self, connection: PooledConnection) -> None:
+        if connection.reconnecting is not None and not connection.reconnecting.done():
+            return
+        connection.reconnecting = asyncio.create_task(self._replace(connection))
+
+    async def _replace(self, connection: PooledConnection) -> None:
+        await _close(connection.substrate)
+        connection.substrate = connection.new_substrate()
+        await self._connect(connection)
+
+    async def _connect(self, connection: PooledConnection) -> None:
+        try:
+            await asyncio.wait_for(connection.substrate.initialize(), self.connect_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Connecting to substrate at {connection.endpoint} failed: {e}")
+            return
+
+        connection.healthy = True
+        logger.info(f"Connected to substrate at {connection.endpoint}")
+
+
+async def _close(substrate: AsyncSubstrateInterface) -> None:
+    try:
+        await substrate.close()
+    except Exception as e:
+        logger.warning(f"Closing substrate connection failed: {e}")
@@ -1,54 +1,159 @@
 import asyncio
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple
 
+import numpy as np
 from bittensor import AsyncSubtensor, Balance
 from bittensor.core.async_subtensor import AsyncSubstrateInterface
-from bittensor.core.chain_data import decode_account_id
-from bittensor.core.settings import SS58_FORMAT
 from bittensor_wallet import Wallet
-from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from mytask.common.cache_status import CacheStatus
+from mytask.common.concurrency import AdaptiveLimiter
 from mytask.common.logger import get_logger
-from mytask.common.redis_cache import RedisCache, redis_cache
+from mytask.common.redis_cache import CacheEntry, RedisCache, redis_cache
+from mytask.common.settings import get_settings
 from mytask.common.singleton import async_singleton
-from mytask.models.tao import TaoDividendDAO
+from mytask.common.write_behind import WriteBehindQueue
+from mytask.models.dividend_snapshot import DividendSnapshot, SnapshotDiff
+from mytask.models.tao import Dividend, TaoDividendDAO
+from mytask.services.account_ids import AccountIdDecoder
+from mytask.services.block_tracker import BlockTracker
+from mytask.services.dividend_changes import DividendChangeLog, DividendChanges
+from mytask.services.dividend_index import DividendIndex
+from mytask.services.dividend_store import DividendStore
 from mytask.services.redis_cache import get_redis_cache
+from mytask.services.runtime_metadata import RuntimeMetadataCache
+from mytask.services.substrate_pool import SubstratePool
 from mytask.tables.tao import TaoDividendTable
 
 logger = get_logger()
 
-
-class Dividend(BaseModel):
-    netuid: int
-    hotkey: str
-    dividends: int
+ALL_DIVIDENDS_KEY = "all"
+# Due to the slow network, we cache for 1 hour instead of 2 minutes.
+# Stale dividends are served for another hour while they are refreshed in background.
+DIVIDENDS_TTL = 60 * 60
+DIVIDENDS_STALE_TTL = 60 * 60
+# When following blocks, subnets are refreshed when their epoch passes and the TTL is only a
+# safety net for missed block headers
+BLOCK_AWARE_DIVIDENDS_TTL = 6 * 60 * 60
+# Blocks whose on-chain time is remembered for persisting dividends read at them
+BLOCK_TIMES_MAXSIZE = 256
+# Pollers asking for changes further back get the full snapshot
+DIVIDEND_CHANGES_RETENTION = 24 * 60 * 60
+# Records per request of a subnet query, larger subnets take several requests
+QUERY_MAP_PAGE_SIZE = 100
+
+DEFAULT_SUBSTRATE_ENDPOINT = "wss://test.finney.opentensor.ai:443"
+
+
+class DividendWrite(NamedTuple):
+    """Rows of a refresh queued to be written to `tao_dividends`."""
+
+    dividends: DividendSnapshot
+    # Hotkeys gone from their subnet, written with `removed` set and a dividend of 0
+    removed: DividendSnapshot
+    # On-chain time of the blocks the rows were read at, their `created_at`
+    block_times: dict[int, datetime]
+    # Subnets written in full, checkpointed at `queued_at` once the rows are committed
+    full_netuids: list[int]
+    queued_at: float
 
 
 class TaoService:
-    def __init__(self, cache: RedisCache, wallet: Wallet | None = None):
+    def __init__(
+        self,
+        cache: RedisCache,
+        wallet: Wallet | None = None,
+        block_aware: bool = False,
+        pool: SubstratePool | None = None,
+        network: str = "test",
+        limiter: AdaptiveLimiter | None = None,
+        query_timeout: float = 60,
+        query_retries: int = 2,
+        write_queue_size: int = 64,
+        fallback_max_age: float = 0,
+    ):
         """
         Initialize the TaoService.
 
         Args:
             cache (RedisCache): The cache to use for caching.
             wallet (Wallet): The wallet to use for staking. The wallet must have a hotkey and registered on the network.
+            block_aware (bool): Follow new blocks and refresh cached subnets when their epoch passes.
+            pool (SubstratePool | None): The substrate connections for chain queries, one
+                connection to the test network if not set.
+            network (str): The network or endpoint of the subtensor used for staking.
+            limiter (AdaptiveLimiter | None): Limits the concurrent subnet queries.
+            query_timeout (float): Seconds a subnet query may take.
+            query_retries (int): How often a failed or timed out subnet query is retried.
+            write_queue_size (int): Refreshes waiting to be written to `tao_dividends`.
+            fallback_max_age (float): Seconds old the dividends in `tao_dividends` may be to
+                answer cache misses while the chain is queried in the background, 0 to always
+                wait for the chain.
         """
         self.cache = cache
+        self.dividends_ttl = BLOCK_AWARE_DIVIDENDS_TTL if block_aware else DIVIDENDS_TTL
+        self.store = DividendStore(cache.redis, ttl=self.dividends_ttl)
+        self.index = DividendIndex()
+        self.changes = DividendChangeLog(cache.redis, retention=DIVIDEND_CHANGES_RETENTION)
         self.wallet = wallet or Wallet()
 
-        # TODO: make this configurable
-        self.subtensor = AsyncSubtensor(network="test")
-        self.substrate = AsyncSubstrateInterface(
-            "wss://test.finney.opentensor.ai:443", ss58_format=SS58_FORMAT
+        self.subtensor = AsyncSubtensor(network=network)
+        self.pool = pool or SubstratePool([DEFAULT_SUBSTRATE_ENDPOINT])
+        self.limiter = limiter or AdaptiveLimiter()
+        self.query_timeout = query_timeout
+        self.query_retries = query_retries
+        # The same hotkeys come back for every subnet and refresh
+        self.account_ids = AccountIdDecoder()
+        self.block_times: OrderedDict[int, datetime] = OrderedDict()
+        # Refreshes are written to `tao_dividends` in the background, not while serving them
+        self.writer: WriteBehindQueue[DividendWrite] = WriteBehindQueue(
+            self._persist_dividends, maxsize=write_queue_size
         )
+        self.fallback_max_age = fallback_max_age
+        # When each subnet was last written in full rather than only its changes
+        self._checkpoints: dict[int, float] = {}
+
+        self.block_tracker: BlockTracker | None = None
+        if block_aware:
+            self.block_tracker = BlockTracker(self.pool, self._on_epoch)
 
     async def initialize(self):
-        await self.subtensor.initialize()
-        await self.substrate.initialize()
+        try:
+            await self.subtensor.initialize()
+            await self.pool.initialize()
+        except BaseException:
+            # Failed services are dropped and a new one is made, which doesn't reuse these
+            # connections
+            await self.pool.close()
+            await self._close_subtensor()
+            raise
+
+        # Dividends refreshed by other processes make the index outdated
+        self.cache.add_invalidation_callback(self._on_cache_invalidation)
+
+    async def close(self):
+        self.cache.remove_invalidation_callback(self._on_cache_invalidation)
+        await self.writer.close()
+        if self.block_tracker is not None:
+            await self.block_tracker.stop()
+        await self.pool.close()
+        await self._close_subtensor()
+
+    async def _close_subtensor(self) -> None:
+        try:
+            await self.subtensor.close()
+        except Exception as e:
+            logger.warning(f"Closing subtensor failed: {e}")
 
     def _make_cache_key(self, netuid: int | None, hotkey: str | None) -> str:
         # both none
         if netuid is None and hotkey is None:
-            return "all"
+            return ALL_DIVIDENDS_KEY
         # netuids none
         if netuid is None:
             return f"hotkey:{hotkey}"
@@ -75,87 +180,619 @@ class TaoService:
 
     async def get_cached_dividends(
         self, netuid: int | None, hotkey: str | None
-    ) -> tuple[list[Dividend], bool]:
+    ) -> tuple[DividendSnapshot, CacheStatus]:
+        """
+        Get dividends from the cache, querying the chain on a miss.
+
+        Only the full snapshot (`all`) and per-subnet entries (`netuid:X`) are cached, hotkey
+        queries are answered by filtering them. A fresh full snapshot answers per-subnet queries
+        too, and refreshing a subnet also updates the full snapshot. Hotkey queries are looked
+        up in the in-process `DividendIndex` first, then in the hashes of `DividendStore`.
+        """
         logger.info(f"Getting cached dividends for {netuid} and {hotkey}")
 
-        cache_key = self._make_cache_key(netuid, hotkey)
-        is_cached = True
+        if self.block_tracker is not None:
+            self.block_tracker.ensure_started()
 
-        logger.info(f"Cache key: {cache_key}")
+        if hotkey is not None:
+            self.cache.ensure_listener()
+            if netuid is None:
+                indexed = self.index.get_by_hotkey(hotkey)
+                if indexed is None and await self._index_snapshot():
+                    indexed = self.index.get_by_hotkey(hotkey)
+            else:
+                indexed = self.index.get(netuid, hotkey)
+            if indexed is not None:
+                return DividendSnapshot.from_dividends(indexed), CacheStatus.FRESH
+
+            if netuid is None:
+                stored = await self.store.get_by_hotkey(hotkey)
+            else:
+                stored = await self.store.get(netuid, hotkey)
+            if stored is not None:
+                return DividendSnapshot.from_dividends(stored), CacheStatus.FRESH
 
-        # Due to the slow network, we cache for 1 hour instead of 2 minutes
-        @redis_cache(
-            redis_cache=self.cache,
-            ttl=60 * 60,
-            key_builder=lambda *args, **kwargs: cache_key,
+        if netuid is None:
+            dividends, cache_status = await self._get_cached_snapshot()
+        else:
+            dividends, cache_status = await self._get_cached_subnet(netuid)
+
+        if hotkey is not None:
+            dividends = dividends.filter(hotkey=hotkey)
+
+        return dividends, cache_status
+
+    async def _index_snapshot(self) -> bool:
+        """Index the cached full snapshot if it's fresh, returns whether it was indexed."""
+        snapshot = await self.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+        if snapshot is None or snapshot.is_stale():
+            return False
+
+        dividends_by_netuid = snapshot.value.split_by_netuid()
+        self.index.replace_subnets(
+            dividends_by_netuid,
+            ttl=snapshot.fresh_until - time.time(),
+            complete=True,
         )
-        async def _inner() -> list[Dividend]:
-            # TODO: refresh all available cache keys
-            nonlocal is_cached
-            is_cached = False
+        logger.info(f"Indexed the cached snapshot of {len(dividends_by_netuid)} subnets")
+        return True
 
-            logger.info("Cache miss, getting dividends")
-            dividends = await self.get_dividends(netuid, hotkey)
-            logger.info(f"Got {len(dividends)} dividends for {netuid} and {hotkey}")
+    def _on_cache_invalidation(self, keys: list[str] | None) -> None:
+        if keys is None or any(
+            key == ALL_DIVIDENDS_KEY or key.startswith("netuid:") for key in keys
+        ):
+            self.index.clear()
 
-            tao_table = TaoDividendTable()
-            logger.info(f"Creating {len(dividends)} dividends in table")
-            try:
-                for dividend in dividends:
-                    await tao_table.create(
+    async def stream_cached_dividends(
+        self, netuid: int | None, hotkey: str | None
+    ) -> tuple[AsyncIterator[DividendSnapshot], CacheStatus]:
+        """
+        Like `get_cached_dividends`, but yielding the dividends in per-subnet batches.
+
+        A cold cache is filled like for `get_cached_dividends`: concurrent requests of all
+        processes share one chain query, through the same lock, and its result is cached.
+        Streaming straight from the chain would query the whole network once per client.
+        The dividends are held in memory in full, only the batches are yielded one by one.
+        """
+        dividends, cache_status = await self.get_cached_dividends(netuid, hotkey)
+        return _iter_subnets(dividends), cache_status
+
+    async def _get_cached_snapshot(self) -> tuple[DividendSnapshot, CacheStatus]:
+        async def fallback(
+            entry: CacheEntry | None,
+        ) -> tuple[DividendSnapshot, CacheStatus] | None:
+            if entry is not None:
+                return None
+            persisted = await self._serve_persisted(
+                ALL_DIVIDENDS_KEY, None, self._refresh_snapshot
+            )
+            return None if persisted is None else (persisted, CacheStatus.DATABASE)
+
+        return await self.cache.get_or_compute(
+            ALL_DIVIDENDS_KEY,
+            DividendSnapshot,
+            self._refresh_snapshot,
+            ttl=self.dividends_ttl,
+            stale_ttl=DIVIDENDS_STALE_TTL,
+            early_refresh_beta=1.0,
+            lock_ttl=120,
+            lock_wait=60,
+            fallback=fallback,
+        )
+
+    async def _get_cached_subnet(self, netuid: int) -> tuple[DividendSnapshot, CacheStatus]:
+        cache_key = self._make_cache_key(netuid, None)
+
+        async def fallback(
+            entry: CacheEntry | None,
+        ) -> tuple[DividendSnapshot, CacheStatus] | None:
+            snapshot = await self.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+            if snapshot is not None and not snapshot.is_stale():
+                logger.info(f"Serving netuid {netuid} from the full snapshot")
+                return snapshot.value.filter(netuid=netuid), CacheStatus.FRESH
+
+            if entry is not None:
+                return None
+            persisted = await self._serve_persisted(
+                cache_key, netuid, lambda: self._refresh_subnet(netuid)
+            )
+            return None if persisted is None else (persisted, CacheStatus.DATABASE)
+
+        return await self.cache.get_or_compute(
+            cache_key,
+            DividendSnapshot,
+            lambda: self._refresh_subnet(netuid),
+            ttl=self.dividends_ttl,
+            stale_ttl=DIVIDENDS_STALE_TTL,
+            early_refresh_beta=1.0,
+            lock_ttl=120,
+            lock_wait=60,
+            fallback=fallback,
+        )
+
+    async def _serve_persisted(
+        self,
+        cache_key: str,
+        netuid: int | None,
+        compute: Callable[[], Awaitable[DividendSnapshot]],
+    ) -> DividendSnapshot | None:
+        """
+        Answer a cache miss from `tao_dividends`, refreshing the cache in the background.
+
+        Returns:
+            DividendSnapshot | None: The persisted dividends, None if they are older than
+                `fallback_max_age` and the caller has to wait for the chain.
+        """
+        if not self.fallback_max_age:
+            return None
+
+        dividends = await self._get_persisted_dividends(netuid)
+        if dividends is None:
+            return None
+
+        logger.info(f"Cache miss for {cache_key}, serving the persisted dividends")
+        # Requests don't wait for the chain, the next ones are served from the cache
+        self.cache.refresh(
+            cache_key,
+            DividendSnapshot,
+            compute,
+            ttl=self.dividends_ttl,
+            stale_ttl=DIVIDENDS_STALE_TTL,
+            lock_ttl=120,
+        )
+        return dividends
+
+    async def _get_persisted_dividends(self, netuid: int | None) -> DividendSnapshot | None:
+        """
+        Get the latest persisted dividends, None if they are older than `fallback_max_age`.
+
+        Every subnet is written in full at least every `fallback_max_age` seconds, see
+        `_rows_to_persist`, so the latest rows of twice that period have every hotkey. Removed
+        hotkeys are written with `removed` set, if that's their latest row they're left out.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            rows = await TaoDividendTable().get_latest(
+                now - timedelta(seconds=2 * self.fallback_max_age), netuid=netuid
+            )
+        except Exception as e:
+            logger.warning(f"Reading persisted dividends failed: {e!r}")
+            return None
+
+        if not rows or max(row.created_at for row in rows) < now - timedelta(
+            seconds=self.fallback_max_age
+        ):
+            return None
+        return DividendSnapshot.from_rows(
+            (row.netuid, row.hotkey, row.dividend, row.block) for row in rows if not row.removed
+        )
+
+    async def get_dividend_changes(
+        self, since_block: int | None = None, since: float | None = None
+    ) -> tuple[DividendChanges, bool]:
+        """
+        Get the dividends that changed after a block or a timestamp.
+
+        Args:
+            since_block (int | None): Only changes read after this block.
+            since (float | None): Only changes made after this Unix timestamp.
+
+        Returns:
+            tuple[DividendChanges, bool]: The changes, and whether they are the full snapshot
+                because the change log doesn't reach back that far or no cursor was given.
+        """
+        if since_block is not None or since is not None:
+            changes = await self.changes.since(block=since_block, timestamp=since)
+            if changes is not None:
+                return changes, False
+
+        dividends, _ = await self._get_cached_snapshot()
+        changes = DividendChanges(
+            changed=dividends,
+            removed=DividendSnapshot.empty(),
+            block=dividends.latest_block(),
+            timestamp=time.time(),
+        )
+        return changes, True
+
+    async def get_dividend_history(
+        self,
+        start: datetime,
+        end: datetime,
+        netuid: int | None = None,
+        hotkey: str | None = None,
+        limit: int = 1000,
+        session: AsyncSession | None = None,
+    ) -> list[TaoDividendDAO]:
+        """
+        Get the dividends persisted between two block times, oldest first.
+
+        Args:
+            start (datetime): The earliest block time, inclusive.
+            end (datetime): The latest block time, exclusive.
+            netuid (int | None): Only dividends on this subnet.
+            hotkey (str | None): Only dividends of this hotkey.
+            limit (int): The maximum number of dividends.
+            session (AsyncSession | None): The session of the request, a new one if None.
+
+        Returns:
+            list[TaoDividendDAO]: The dividends.
+        """
+        return await TaoDividendTable(session).get_history(
+            start, end, netuid=netuid, hotkey=hotkey, limit=limit
+        )
+
+    async def refresh_dividends(self, stagger: float = 0, jitter: float = 0) -> int:
+        """
+        Query all subnets and cache them ahead of expiry, so requests don't hit a miss.
+
+        Args:
+            stagger (float): Seconds between the start of consecutive subnet queries.
+            jitter (float): Max random seconds added to the start of each subnet query.
+
+        Returns:
+            int: The number of dividends refreshed.
+        """
+        dividends = await self._refresh_snapshot(stagger=stagger, jitter=jitter)
+        await self.cache.set(
+            ALL_DIVIDENDS_KEY,
+            dividends,
+            ttl=self.dividends_ttl,
+            stale_ttl=DIVIDENDS_STALE_TTL,
+            value_type=DividendSnapshot,
+        )
+        return len(dividends)
+
+    async def _refresh_snapshot(
+        self, stagger: float = 0, jitter: float = 0
+    ) -> DividendSnapshot:
+        """
+        Query all subnets and store what changed, the caller caches the full snapshot.
+
+        Only the subnets that changed since the cached snapshot are cached again per subnet,
+        the others are served from the full snapshot once their own entries get stale.
+        """
+        logger.info("Getting dividends of all subnets")
+        previous = await self.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+        netuids = await self._get_cached_all_netuids()
+        dividends = await self._query_dividends(netuids, stagger=stagger, jitter=jitter)
+        logger.info(f"Got {len(dividends)} dividends of {len(netuids)} subnets")
+
+        dividends_by_netuid = dividends.split_by_netuid(netuids)
+        diff = None if previous is None else dividends.diff(previous.value)
+        changed_netuids = netuids if diff is None else diff.netuids()
+        await self.cache.set_many(
+            {
+                self._make_cache_key(netuid, None): dividends_by_netuid[netuid]
+                for netuid in changed_netuids
+                if netuid in dividends_by_netuid
+            },
+            ttl=self.dividends_ttl,
+            stale_ttl=DIVIDENDS_STALE_TTL,
+            value_type=DividendSnapshot,
+        )
+        await self._store_changes(dividends_by_netuid, diff, complete=True)
+        self.index.replace_subnets(
+            dividends_by_netuid, ttl=self.dividends_ttl, complete=True
+        )
+
+        return dividends
+
+    async def _on_epoch(self, netuids: list[int], block: int) -> None:
+        """Refresh the cached subnets whose dividends changed with the epoch at `block`."""
+        for netuid in netuids:
+            self.cache.refresh(
+                self._make_cache_key(netuid, None),
+                DividendSnapshot,
+                lambda netuid=netuid: self._refresh_subnet(netuid),
+                ttl=self.dividends_ttl,
+                stale_ttl=DIVIDENDS_STALE_TTL,
+                lock_ttl=120,
+            )
+
+    async def _refresh_subnet(self, netuid: int) -> DividendSnapshot:
+        dividends_by_netuid = await self._refresh_subnets([netuid])
+        return dividends_by_netuid[netuid]
+
+    async def _refresh_subnets(self, netuids: list[int]) -> dict[int, DividendSnapshot]:
+        """Query some subnets and patch them into the full snapshot, the caller caches them per subnet."""
+        logger.info(f"Cache miss, getting dividends for netuids {netuids}")
+        previous = await self._get_previous_subnets(netuids)
+        dividends = await self._query_dividends(netuids)
+        logger.info(f"Got {len(dividends)} dividends for netuids {netuids}")
+
+        dividends_by_netuid = dividends.split_by_netuid(netuids)
+        diff = None if previous is None else dividends.diff(previous)
+        if diff is None or len(diff):
+            await self._update_snapshot(dividends_by_netuid)
+        await self._store_changes(dividends_by_netuid, diff)
+        self.index.replace_subnets(dividends_by_netuid, ttl=self.dividends_ttl)
+
+        return dividends_by_netuid
+
+    async def _get_previous_subnets(self, netuids: list[int]) -> DividendSnapshot | None:
+        """The cached dividends of some subnets, None if any of them isn't cached."""
+        entries = await self.cache.get_many_entries(
+            [self._make_cache_key(netuid, None) for netuid in netuids], DividendSnapshot
+        )
+        snapshot = None
+        subnets = []
+        for netuid in netuids:
+            entry = entries.get(self._make_cache_key(netuid, None))
+            if entry is not None:
+                subnets.append(entry.value)
+                continue
+
+            # Subnets that didn't change aren't cached again, they're in the full snapshot
+            if snapshot is None:
+                snapshot = await self.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+                if snapshot is None:
+                    return None
+            subnets.append(snapshot.value.filter(netuid=netuid))
+        return DividendSnapshot.concat(subnets)
+
+    async def _store_changes(
+        self,
+        dividends_by_netuid: dict[int, DividendSnapshot],
+        diff: SnapshotDiff | None,
+        complete: bool = False,
+    ) -> None:
+        """
+        Write refreshed subnets to the hashes, the change log and `tao_dividends`.
+
+        Only the changes are written when the previous dividends are known, otherwise the
+        subnets are written in full and the change log restarts.
+        """
+        dividends = DividendSnapshot.concat(dividends_by_netuid.values())
+        if diff is None:
+            await self.store.replace_subnets(dividends_by_netuid, complete=complete)
+            await self.changes.reset(dividends.latest_block())
+            await self.writer.put(self._rows_to_persist(dividends_by_netuid, None))
+            return
+
+        logger.info(f"{len(diff)} of {len(dividends)} dividends changed")
+        await self.store.apply_changes(dividends_by_netuid, diff, complete=complete)
+        await self.changes.append(diff, dividends.latest_block())
+        await self.writer.put(self._rows_to_persist(dividends_by_netuid, diff))
+
+    def _rows_to_persist(
+        self, dividends_by_netuid: dict[int, DividendSnapshot], diff: SnapshotDiff | None
+    ) -> DividendWrite:
+        """
+        Pick the rows of a refresh to write to `tao_dividends`.
+
+        That's the changes, plus the subnets that weren't written in full for
+        `fallback_max_age`, which `_get_persisted_dividends` relies on. The rows are queued
+        with the times of their blocks, `block_times` only remembers the latest blocks.
+        Checkpoints only advance once `_persist_dividends` committed the subnets, until then
+        they're written in full again.
+        """
+        now = time.time()
+        if diff is None:
+            due = list(dividends_by_netuid)
+        elif self.fallback_max_age:
+            due = [
+                netuid
+                for netuid in dividends_by_netuid
+                if now - self._checkpoints.get(netuid, 0) >= self.fallback_max_age
+            ]
+        else:
+            due = []
+
+        if diff is None:
+            dividends = DividendSnapshot.concat(dividends_by_netuid.values())
+            removed = DividendSnapshot.empty()
+        else:
+            # Changed rows written twice are deduplicated by the upsert
+            dividends = DividendSnapshot.concat(
+                [diff.changed, *(dividends_by_netuid[netuid] for netuid in due)]
+            )
+            removed = diff.removed
+        block_times = {
+            block: self.block_times[block]
+            for block in np.unique(np.concatenate([dividends.blocks, removed.blocks])).tolist()
+            if block in self.block_times
+        }
+        return DividendWrite(dividends, removed, block_times, due, now)
+
+    async def _update_snapshot(
+        self, dividends_by_netuid: dict[int, DividendSnapshot]
+    ) -> None:
+        snapshot = await self.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+        now = time.time()
+        if snapshot is None or snapshot.expires_at <= now:
+            return
+
+        dividends = DividendSnapshot.concat(
+            [
+                snapshot.value.exclude_netuids(dividends_by_netuid),
+                *dividends_by_netuid.values(),
+            ]
+        ).sort()
+
+        # Keep the snapshot's expiry, the other subnets in it didn't get any fresher
+        await self.cache.set(
+            ALL_DIVIDENDS_KEY,
+            dividends,
+            delta=snapshot.delta,
+            value_type=DividendSnapshot,
+            fresh_until=snapshot.fresh_until,
+            expires_at=snapshot.expires_at,
+        )
+
+    async def _persist_dividends(self, batch: list[DividendWrite]) -> None:
+        """Write refreshes queued in `writer` to `tao_dividends`, in one transaction."""
+        # Idempotent, refreshes reading the same block write the same rows with the same
+        # `created_at`, so retrying a batch is safe
+        rows = []
+        checkpoints: dict[int, float] = {}
+        for write in batch:
+            skipped = 0
+            for dividends, removed in ((write.dividends, False), (write.removed, True)):
+                for netuid, hotkey, dividend, block in dividends.rows():
+                    created_at = write.block_times.get(block)  # type: ignore[arg-type]
+                    # The wall-clock time would neither deduplicate nor match the block's
+                    # partition
+                    if created_at is None:
+                        skipped += 1
+                        continue
+                    rows.append(
                         TaoDividendDAO(
-                            netuid=dividend.netuid,
-                            hotkey=dividend.hotkey,
-                            dividend=dividend.dividends,
+                            netuid=netuid,
+                            hotkey=hotkey,
+                            dividend=0 if removed else dividend,
+                            block=block,
+                            created_at=created_at,
+                            removed=removed,
                         )
                     )
-            except Exception as e:
-                logger.error(f"Error creating dividends: {e}")
-
-            return dividends
-
-        dividends = await _inner()
-        return dividends, is_cached
+            if skipped:
+                logger.warning(f"Not writing {skipped} dividends read at blocks of unknown time")
+                continue
+            for netuid in write.full_netuids:
+                checkpoints[netuid] = max(checkpoints.get(netuid, 0), write.queued_at)
+
+        logger.info(f"Writing {len(rows)} dividends to table")
+        await TaoDividendTable().upsert_many(
+            rows, conflict_columns=["netuid", "hotkey", "block", "created_at"]
+        )
+        for netuid, queued_at in checkpoints.items():
+            self._checkpoints[netuid] = max(self._checkpoints.get(netuid, 0), queued_at)
 
     async def get_dividends(
         self, netuid: int | None, hotkey: str | None
-    ) -> list[Dividend]:
+    ) -> DividendSnapshot:
         if netuid is None:
             logger.info("Getting all netuids")
             netuids = await self._get_cached_all_netuids()
         else:
             netuids = [netuid]
 
-        semaphore = asyncio.Semaphore(100)  # Limit concurrent tasks to 4
+        dividends = await self._query_dividends(netuids)
 
-        async def query_dividends(netuid: int):
-            params: list = [netuid]
-
-            async with semaphore:
-                return await self.substrate.query_map(
-                    "SubtensorModule",
-                    "TaoDividendsPerSubnet",
-                    params,
-                )
-
-        logger.info(f"Querying dividends for {netuids}")
-        tasks = [query_dividends(netuid) for netuid in netuids]
-        results = await asyncio.gather(*tasks)
-
-        dividends = []
-        for netuid, result in zip(netuids, results):
-            async for k, v in result:  # type: ignore
-                dividends.append(
-                    Dividend(
-                        netuid=netuid, hotkey=decode_account_id(k), dividends=v.value
-                    )
-                )
+        # The dividends are fresh from the chain, keep them for later hotkey lookups
+        self.index.replace_subnets(
+            dividends.split_by_netuid(netuids),
+            ttl=self.dividends_ttl,
+            complete=netuid is None,
+        )
 
         if hotkey is not None:
-            dividends = [dividend for dividend in dividends if dividend.hotkey == hotkey]
+            dividends = dividends.filter(hotkey=hotkey)
 
         return dividends
 
+    async def _query_dividends(
+        self, netuids: list[int], stagger: float = 0, jitter: float = 0
+    ) -> DividendSnapshot:
+        """
+        Query the dividends of subnets from the chain.
+
+        Args:
+            netuids (list[int]): The subnets to query.
+            stagger (float): Seconds between the start of consecutive subnet queries.
+            jitter (float): Max random seconds added to the start of each subnet query.
+        """
+        batches = [
+            batch
+            async for batch in self.stream_dividends(netuids, stagger=stagger, jitter=jitter)
+        ]
+        # Subnets arrive in completion order, the sort is stable within a subnet
+        return DividendSnapshot.concat(batches).sort()
+
+    async def stream_dividends(
+        self,
+        netuids: list[int],
+        stagger: float = 0,
+        jitter: float = 0,
+        buffer: int = 32,
+    ) -> AsyncIterator[DividendSnapshot]:
+        """
+        Query the dividends of subnets from the chain, yielding each subnet once it's complete.
+
+        Subnets are queried concurrently and yielded in the order they complete. At most
+        `buffer` subnets are queried or waiting to be consumed at once, so memory is bounded
+        by a few subnets instead of the whole network.
+
+        Args:
+            netuids (list[int]): The subnets to query.
+            stagger (float): Seconds between the start of consecutive subnet queries.
+            jitter (float): Max random seconds added to the start of each subnet query.
+            buffer (int): Max subnets being queried or waiting to be consumed.
+        """
+        # Read every subnet at the same block so the snapshot is consistent
+        block_hash, block, block_time = await self.pool.run(_get_chain_head)
+        self.block_times[block] = block_time
+        while len(self.block_times) > BLOCK_TIMES_MAXSIZE:
+            self.block_times.popitem(last=False)
+
+        pending = asyncio.Semaphore(buffer)
+        queue: asyncio.Queue[DividendSnapshot | Exception] = asyncio.Queue()
+
+        async def produce(index: int, netuid: int):
+            delay = index * stagger + random.uniform(0, jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await pending.acquire()
+            try:
+                batch = await self._query_subnet(netuid, block_hash, block)
+            except Exception as e:
+                pending.release()
+                queue.put_nowait(e)
+                return
+            queue.put_nowait(batch)
+
+        logger.info(f"Querying dividends for {netuids}")
+        tasks = [
+            asyncio.create_task(produce(index, netuid))
+            for index, netuid in enumerate(netuids)
+        ]
+        try:
+            for _ in tasks:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                pending.release()
+                yield item
+        finally:
+            # The consumer may stop early, e.g. when a streaming client disconnects
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _query_subnet(
+        self, netuid: int, block_hash: str, block: int
+    ) -> DividendSnapshot:
+        params: list = [netuid]
+
+        async def query(substrate: AsyncSubstrateInterface) -> list:
+            result = await substrate.query_map(
+                "SubtensorModule",
+                "TaoDividendsPerSubnet",
+                params,
+                block_hash=block_hash,
+                page_size=QUERY_MAP_PAGE_SIZE,
+            )
+            # Further pages are fetched while iterating, on the same connection
+            return [item async for item in result]  # type: ignore
+
+        # The limiter retries with backoff, the pool doesn't retry on its own too. Failed
+        # connections are out of the pool, so retries still go to another connection.
+        result = await self.limiter.run(
+            lambda: self.pool.run(query, retries=0),
+            timeout=self.query_timeout,
+            retries=self.query_retries,
+            # The latency is compared per page, large subnets take more pages than small ones
+            requests=lambda result: len(result) // QUERY_MAP_PAGE_SIZE + 1,
+        )
+        return DividendSnapshot.from_subnet(
+            netuid,
+            hotkeys=self.account_ids.decode_many(k for k, _ in result),
+            dividends=[v.value for _, v in result],
+            block=block,
+        )
+
     async def stake(self, netuid: int, amount: Balance) -> bool:
         """
         Stake TAO on a subnet.
@@ -195,10 +832,55 @@ class TaoService:
         )
 
 
+async def _iter_subnets(dividends: DividendSnapshot) -> AsyncIterator[DividendSnapshot]:
+    for subnet_dividends in dividends.split_by_netuid().values():
+        yield subnet_dividends
+
+
+async def _get_chain_head(
+    substrate: AsyncSubstrateInterface,
+) -> tuple[str, int, datetime]:
+    block_hash = await substrate.get_chain_head()
+    block, timestamp = await asyncio.gather(
+        substrate.get_block_number(block_hash),
+        substrate.query("Timestamp", "Now", block_hash=block_hash),
+    )
+    # The block's time on chain, in milliseconds
+    block_time = datetime.fromtimestamp(
+        timestamp.value / 1000, tz=timezone.utc  # type: ignore
+    )
+    return block_hash, block, block_time
+
+
 @async_singleton
 async def get_tao_service() -> TaoService:
+    settings = get_settings()
     cache = get_redis_cache()
-    tao_service = TaoService(cache)
+    pool = SubstratePool(
+        settings.substrate_endpoints,
+        size=settings.substrate_pool_size,
+        health_check_interval=settings.substrate_health_check_interval,
+        metadata_cache=(
+            RuntimeMetadataCache(settings.substrate_metadata_cache_dir)
+            if settings.substrate_metadata_cache_dir
+            else None
+        ),
+    )
+    limiter = AdaptiveLimiter(
+        initial_limit=settings.substrate_concurrency_initial,
+        max_limit=settings.substrate_concurrency_max,
+    )
+    tao_service = TaoService(
+        cache,
+        block_aware=settings.dividends_block_aware,
+        pool=pool,
+        network=settings.subtensor_network,
+        limiter=limiter,
+        query_timeout=settings.substrate_query_timeout,
+        query_retries=settings.substrate_query_retries,
+        write_queue_size=settings.dividends_write_queue_size,
+        fallback_max_age=settings.dividends_fallback_max_age,
+    )
     logger.info("Initializing TaoService")
     await tao_service.initialize()
     logger.info("TaoService initialized")
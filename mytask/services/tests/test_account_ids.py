@@ -0,0 +1,38 @@
+from bittensor.core.chain_data import decode_account_id
+
+from mytask.services.account_ids import AccountIdDecoder
+
+
+def _account_id(i: int) -> tuple[int, ...]:
+    return tuple((i + j) % 256 for j in range(32))
+
+
+def test_decode_many_matches_decode_account_id():
+    decoder = AccountIdDecoder()
+    keys = [(_account_id(i),) for i in range(3)] + [bytes(_account_id(0))]
+
+    assert decoder.decode_many(keys) == [decode_account_id(k) for k in keys]
+    assert decoder.decode(keys[1]) == decode_account_id(keys[1])
+
+
+def test_decode_many_encodes_each_id_once():
+    decoder = AccountIdDecoder()
+
+    decoder.decode_many([(_account_id(1),), (_account_id(2),), (_account_id(1),)])
+    decoder.decode_many([(_account_id(2),)])
+
+    assert (decoder.hits, decoder.misses) == (2, 2)
+
+
+def test_least_recently_used_ids_are_evicted():
+    decoder = AccountIdDecoder(maxsize=2)
+
+    decoder.decode_many([_account_id(1), _account_id(2)])
+    decoder.decode(_account_id(1))
+    decoder.decode(_account_id(3))
+
+    assert len(decoder) == 2
+    decoder.decode(_account_id(1))
+    assert decoder.misses == 3
+    decoder.decode(_account_id(2))
+    assert decoder.misses == 4
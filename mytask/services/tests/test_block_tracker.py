@@ -0,0 +1,32 @@
+import asyncio
+
+from mytask.services.block_tracker import BlockTracker
+
+
+def test_blocks_until_next_epoch():
+    tracker = BlockTracker(pool=None, on_epoch=None)  # type: ignore
+    tracker.tempos = {1: 360}
+
+    # Epoch of subnet 1 runs when (block + 2) % 361 == 360
+    assert tracker.blocks_until_next_epoch(1, block=358) == 0
+    assert tracker.blocks_until_next_epoch(1, block=359) == 360
+    assert tracker.blocks_until_next_epoch(2, block=359) is None
+
+
+async def test_on_header_reports_passed_epochs():
+    epochs = []
+
+    async def on_epoch(netuids: list[int], block: int):
+        epochs.append((netuids, block))
+
+    tracker = BlockTracker(pool=None, on_epoch=on_epoch)  # type: ignore
+    tracker.tempos = {1: 360, 2: 360}
+    tracker._tempos_block = 0
+
+    await tracker._on_header({"header": {"number": 356}})
+    await tracker._on_header({"header": {"number": 357}})
+    # Skipped a block, the epoch of subnet 1 at 358 still counts
+    await tracker._on_header({"header": {"number": 359}})
+    await asyncio.sleep(0)
+
+    assert epochs == [([2], 357), ([1], 359)]
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.services.dividend_changes import DividendChangeLog
+
+HOTKEY_A = "5F2CsUDVbRbVMXTh9fAzF9GacjVX7UapvRxidrxe7z8BYckQ"
+HOTKEY_B = "5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v"
+
+
+def make_subnet(dividends: dict[str, int], block: int) -> DividendSnapshot:
+    return DividendSnapshot.from_subnet(1, list(dividends), list(dividends.values()), block)
+
+
+@pytest.fixture
+async def redis():
+    redis = FakeAsyncRedis()
+    yield redis
+    await redis.aclose()
+
+
+async def test_changes_since_a_block(redis):
+    changes = DividendChangeLog(redis, retention=60)
+    assert await changes.since(block=0) is None
+
+    first = make_subnet({HOTKEY_A: 10, HOTKEY_B: 20}, block=100)
+    second = make_subnet({HOTKEY_A: 11, HOTKEY_B: 20}, block=101)
+    third = make_subnet({HOTKEY_A: 12}, block=102)
+    await changes.reset(100)
+    await changes.append(second.diff(first), 101)
+    await changes.append(third.diff(second), 102)
+
+    since_start = await changes.since(block=100)
+    assert since_start is not None
+    # Only the latest change of every row
+    assert [(d.hotkey, d.dividends, d.block) for d in since_start.changed.to_dividends()] == [
+        (HOTKEY_A, 12, 102)
+    ]
+    assert [(d.hotkey, d.block) for d in since_start.removed.to_dividends()] == [
+        (HOTKEY_B, 102)
+    ]
+    assert since_start.block == 102
+
+    since_second = await changes.since(block=101)
+    assert since_second is not None
+    assert len(since_second.changed) == 1
+    assert len(since_second.removed) == 1
+
+    latest = await changes.since(block=102)
+    assert latest is not None
+    assert len(latest.changed) == len(latest.removed) == 0
+    assert latest.block == 102
+
+    # Before the start of the log
+    assert await changes.since(block=99) is None
+
+
+async def test_changes_since_a_timestamp(redis):
+    changes = DividendChangeLog(redis, retention=60)
+    first = make_subnet({HOTKEY_A: 10}, block=100)
+    second = make_subnet({HOTKEY_A: 11}, block=101)
+    third = make_subnet({HOTKEY_A: 12}, block=102)
+    await changes.reset(100)
+    await changes.append(second.diff(first), 101)
+
+    cursor = await changes.since(timestamp=0.0)
+    assert cursor is None
+
+    cursor = await changes.since(block=100)
+    assert cursor is not None
+    await asyncio.sleep(0.01)
+    await changes.append(third.diff(second), 102)
+
+    polled = await changes.since(timestamp=cursor.timestamp)
+    assert polled is not None
+    assert [d.dividends for d in polled.changed.to_dividends()] == [12]
+    assert polled.block == 102
+    assert polled.timestamp > cursor.timestamp
+
+
+async def test_first_append_starts_the_log(redis):
+    changes = DividendChangeLog(redis, retention=60)
+    first = make_subnet({HOTKEY_A: 10}, block=100)
+    second = make_subnet({HOTKEY_A: 11}, block=101)
+
+    # The changes before it aren't known, the log starts at its block
+    await changes.append(second.diff(first), 101)
+
+    assert await changes.since(block=100) is None
+    since = await changes.since(block=101)
+    assert since is not None
+    assert len(since.changed) == 0
+
+
+async def test_trims_entries_past_retention(redis):
+    changes = DividendChangeLog(redis, retention=1)
+    first = make_subnet({HOTKEY_A: 10}, block=100)
+    second = make_subnet({HOTKEY_A: 11}, block=101)
+    third = make_subnet({HOTKEY_A: 12}, block=102)
+    await changes.reset(100)
+    await changes.append(second.diff(first), 101)
+
+    await asyncio.sleep(1.1)
+    await changes.append(third.diff(second), 102)
+
+    # The log is complete after the trimmed entry only, the stream itself is trimmed
+    # approximately, in whole nodes
+    assert await changes.since(block=100) is None
+    since = await changes.since(block=101)
+    assert since is not None
+    assert [d.dividends for d in since.changed.to_dividends()] == [12]
@@ -0,0 +1,57 @@
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import Dividend
+from mytask.services.dividend_index import DividendIndex
+
+HOTKEY_A = "5F2CsUDVbRbVMXTh9fAzF9GacjVX7UapvRxidrxe7z8BYckQ"
+HOTKEY_B = "5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v"
+
+
+def make_snapshot() -> dict[int, DividendSnapshot]:
+    return {
+        1: DividendSnapshot.from_subnet(1, [HOTKEY_A, HOTKEY_B], [10, 20], block=100),
+        2: DividendSnapshot.from_subnet(2, [HOTKEY_A], [30], block=100),
+        3: DividendSnapshot.from_subnet(3, [], [], block=100),
+    }
+
+
+def test_lookups():
+    index = DividendIndex()
+    index.replace_subnets(make_snapshot(), ttl=60, complete=True)
+
+    assert [d.dividends for d in index.get_by_hotkey(HOTKEY_A)] == [10, 30]
+    assert index.get(2, HOTKEY_B) == []
+    assert index.get(1, HOTKEY_B) == [
+        Dividend(netuid=1, hotkey=HOTKEY_B, dividends=20, block=100)
+    ]
+    assert len(index.get_subnet(3)) == 0
+    assert index.get_subnet(4) is None
+
+
+def test_hotkey_lookups_need_all_subnets():
+    index = DividendIndex()
+    index.replace_subnets(make_snapshot(), ttl=60)
+    assert index.get_by_hotkey(HOTKEY_A) is None
+
+    index.replace_subnets(make_snapshot(), ttl=60, complete=True)
+    index.invalidate([2])
+    assert index.get_by_hotkey(HOTKEY_A) is None
+    assert index.get_subnet(1) is not None
+
+
+def test_replace_subnet_updates_hotkeys():
+    index = DividendIndex()
+    index.replace_subnets(make_snapshot(), ttl=60, complete=True)
+    index.replace_subnets(
+        {1: DividendSnapshot.from_subnet(1, [HOTKEY_B], [25], block=101)}, ttl=60
+    )
+
+    assert [(d.netuid, d.dividends) for d in index.get_by_hotkey(HOTKEY_A)] == [(2, 30)]
+    assert [(d.netuid, d.dividends) for d in index.get_by_hotkey(HOTKEY_B)] == [(1, 25)]
+
+
+def test_expired():
+    index = DividendIndex()
+    index.replace_subnets(make_snapshot(), ttl=0, complete=True)
+
+    assert index.get_by_hotkey(HOTKEY_A) is None
+    assert index.get(1, HOTKEY_A) is None
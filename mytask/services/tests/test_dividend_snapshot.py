@@ -0,0 +1,76 @@
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import Dividend
+
+
+def _snapshot() -> DividendSnapshot:
+    return DividendSnapshot.concat(
+        [
+            DividendSnapshot.from_subnet(2, ["a", "b"], [5, 7], block=100),
+            DividendSnapshot.from_subnet(1, ["b", "c"], [7, 3], block=None),
+        ]
+    )
+
+
+def test_concat_interns_hotkeys():
+    snapshot = _snapshot()
+
+    assert snapshot.hotkeys == ["a", "b", "c"]
+    assert snapshot.to_dividends() == [
+        Dividend(netuid=2, hotkey="a", dividends=5, block=100),
+        Dividend(netuid=2, hotkey="b", dividends=7, block=100),
+        Dividend(netuid=1, hotkey="b", dividends=7),
+        Dividend(netuid=1, hotkey="c", dividends=3),
+    ]
+
+
+def test_filter_sort_and_totals():
+    snapshot = _snapshot()
+
+    assert [row[0] for row in snapshot.filter(hotkey="b").rows()] == [2, 1]
+    assert len(snapshot.filter(hotkey="missing")) == 0
+    # Stable, so the rows with 7 keep their order
+    assert [row[1] for row in snapshot.sort("dividends", descending=True).rows()] == [
+        "b",
+        "b",
+        "a",
+        "c",
+    ]
+    assert snapshot.total_by_netuid() == {1: 10, 2: 12}
+
+
+def test_split_by_netuid_compacts_hotkeys():
+    subnets = _snapshot().split_by_netuid([1, 2, 3])
+
+    assert subnets[1].hotkeys == ["b", "c"]
+    assert subnets[2].hotkeys == ["a", "b"]
+    assert len(subnets[3]) == 0
+
+
+def test_columns_round_trip():
+    snapshot = _snapshot()
+    columns = snapshot.to_columns()
+
+    assert DividendSnapshot.from_columns(columns) == snapshot
+    assert (
+        DividendSnapshot.from_columns(
+            type(columns).model_validate_json(columns.model_dump_json())
+        )
+        == snapshot
+    )
+
+
+def test_diff_finds_changed_and_removed_rows():
+    previous = _snapshot()
+    current = DividendSnapshot.concat(
+        [
+            DividendSnapshot.from_subnet(2, ["b", "d"], [7, 1], block=101),
+            DividendSnapshot.from_subnet(1, ["b", "c"], [7, 4], block=101),
+        ]
+    )
+
+    diff = current.diff(previous)
+
+    assert list(diff.changed.rows()) == [(2, "d", 1, 101), (1, "c", 4, 101)]
+    assert list(diff.removed.rows()) == [(2, "a", 5, 101)]
+    assert diff.netuids() == {1, 2}
+    assert len(current.diff(current)) == 0
@@ -0,0 +1,102 @@
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import Dividend
+from mytask.services.dividend_store import DividendStore
+
+HOTKEY_A = "5F2CsUDVbRbVMXTh9fAzF9GacjVX7UapvRxidrxe7z8BYckQ"
+HOTKEY_B = "5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v"
+HOTKEY_C = "5GrwvaEF5zXb26Fz9rcQpDWS57CtERHpNehXCPcNoHGKutQY"
+
+
+def make_snapshot() -> dict[int, DividendSnapshot]:
+    return {
+        1: DividendSnapshot.from_subnet(1, [HOTKEY_A, HOTKEY_B], [10, 20], block=100),
+        2: DividendSnapshot.from_subnet(2, [HOTKEY_A], [30], block=100),
+    }
+
+
+@pytest.fixture
+async def store():
+    redis = FakeAsyncRedis()
+    yield DividendStore(redis, ttl=60)
+    await redis.aclose()
+
+
+async def test_lookups(store: DividendStore):
+    await store.replace_subnets(make_snapshot(), complete=True)
+
+    assert await store.get(1, HOTKEY_B) == [
+        Dividend(netuid=1, hotkey=HOTKEY_B, dividends=20, block=100)
+    ]
+    assert await store.get(2, HOTKEY_B) == []
+    assert await store.get(3, HOTKEY_B) is None
+    assert sorted(d.dividends for d in await store.get_subnet(1) or []) == [10, 20]
+    assert await store.get_subnet(3) is None
+    assert [(d.netuid, d.dividends) for d in await store.get_by_hotkey(HOTKEY_A) or []] == [
+        (1, 10),
+        (2, 30),
+    ]
+    assert 0 < await store.redis.ttl("dividends:netuid:1") <= 60
+    assert 0 < await store.redis.ttl(f"dividends:hotkey:{HOTKEY_A}") <= 60
+
+
+async def test_hotkey_lookups_need_all_subnets(store: DividendStore):
+    await store.replace_subnets(make_snapshot())
+
+    assert await store.get_by_hotkey(HOTKEY_A) is None
+    assert await store.get(2, HOTKEY_A) is not None
+
+
+async def test_replace_drops_removed_hotkeys(store: DividendStore):
+    await store.replace_subnets(make_snapshot(), complete=True)
+
+    await store.replace_subnets(
+        {
+            1: DividendSnapshot.from_subnet(1, [HOTKEY_B, HOTKEY_C], [21, 40], block=101),
+            2: DividendSnapshot.from_subnet(2, [], [], block=101),
+        }
+    )
+
+    assert await store.get(1, HOTKEY_A) == []
+    assert await store.get(1, HOTKEY_C) == [
+        Dividend(netuid=1, hotkey=HOTKEY_C, dividends=40, block=101)
+    ]
+    # Subnets without dividends aren't stored
+    assert await store.get_subnet(2) is None
+    assert await store.redis.smembers(f"dividends:hotkey:{HOTKEY_A}") == set()
+    assert await store.redis.smembers(f"dividends:hotkey:{HOTKEY_B}") == {b"1"}
+    assert await store.redis.smembers(f"dividends:hotkey:{HOTKEY_C}") == {b"1"}
+    # No temporary hashes are left behind
+    assert sorted(await store.redis.keys("dividends:netuid:*")) == [b"dividends:netuid:1"]
+
+
+async def test_apply_changes(store: DividendStore):
+    previous = make_snapshot()
+    await store.replace_subnets(previous, complete=True)
+
+    dividends_by_netuid = {
+        1: DividendSnapshot.from_subnet(1, [HOTKEY_A, HOTKEY_C], [11, 40], block=101),
+        2: DividendSnapshot.from_subnet(2, [HOTKEY_A], [30], block=101),
+        3: DividendSnapshot.from_subnet(3, [HOTKEY_B], [50], block=101),
+    }
+    diff = DividendSnapshot.concat(dividends_by_netuid.values()).diff(
+        DividendSnapshot.concat(previous.values())
+    )
+    await store.apply_changes(dividends_by_netuid, diff, complete=True)
+
+    assert sorted(
+        (d.hotkey, d.dividends, d.block) for d in await store.get_subnet(1) or []
+    ) == sorted([(HOTKEY_A, 11, 101), (HOTKEY_C, 40, 101)])
+    # Unchanged subnets get the new block too
+    assert await store.get(2, HOTKEY_A) == [
+        Dividend(netuid=2, hotkey=HOTKEY_A, dividends=30, block=101)
+    ]
+    # Subnets that weren't stored are written in full
+    assert await store.get(3, HOTKEY_B) == [
+        Dividend(netuid=3, hotkey=HOTKEY_B, dividends=50, block=101)
+    ]
+    assert [(d.netuid, d.dividends) for d in await store.get_by_hotkey(HOTKEY_B) or []] == [
+        (3, 50)
+    ]
@@ -0,0 +1,84 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from mytask.services.runtime_metadata import CachedRuntimeSubstrate, RuntimeMetadataCache
+
+
+async def test_metadata_is_downloaded_once(tmp_path):
+    fetches = 0
+
+    async def fetch() -> dict:
+        nonlocal fetches
+        fetches += 1
+        await asyncio.sleep(0.01)
+        return {"runtime_info": {"specVersion": 1}, "metadata": "0x00"}
+
+    cache = RuntimeMetadataCache(tmp_path)
+    entries = await asyncio.gather(*(cache.get("genesis-1", fetch) for _ in range(3)))
+    assert fetches == 1
+    assert entries[0] == entries[2]
+
+    # Another process reads it from disk
+    assert await RuntimeMetadataCache(tmp_path).get("genesis-1", fetch) == entries[0]
+    assert fetches == 1
+
+    await cache.get("genesis-2", fetch)
+    assert fetches == 2
+
+
+async def test_unreadable_metadata_is_downloaded_again(tmp_path):
+    (tmp_path / "genesis-1.json").write_text("{")
+
+    async def fetch() -> dict:
+        return {"metadata": "0x00"}
+
+    assert await RuntimeMetadataCache(tmp_path).get("genesis-1", fetch) == {
+        "metadata": "0x00"
+    }
+
+
+def _compact(value: int) -> str:
+    # Single-byte SCALE compact, enough for these lengths
+    assert value < 64
+    return f"{value << 2:02x}"
+
+
+def _metadata(version: int, body: str) -> str:
+    return "6d657461" + f"{version:02x}" + body
+
+
+# A registry with a single `u8` type and no pallets
+REGISTRY = _compact(1) + "00" + "00" + "00" + "0503" + "00"
+# Extrinsic version 4, no signed extensions, and the runtime type
+METADATA_V14 = _metadata(14, REGISTRY + "00" + "00" + "04" + "00" + "00")
+# Extrinsic version 4, its address, call, signature and extra types, no signed extensions;
+# the runtime type, no runtime APIs, the outer enums and no custom metadata
+METADATA_V15 = _metadata(15, REGISTRY + "00" + "04" + "00" * 5 + "00" + "00" + "00" * 3 + "00")
+
+
+async def test_runtime_is_built_from_cached_metadata(tmp_path):
+    cache = RuntimeMetadataCache(tmp_path)
+    entry = {
+        "runtime_info": {"specVersion": 7, "transactionVersion": 1},
+        "metadata": "0x" + METADATA_V14,
+        # `Option<Vec<u8>>` as returned by `Metadata_metadata_at_version`
+        "metadata_v15": "0x01" + _compact(len(METADATA_V15) // 2) + METADATA_V15,
+    }
+    await cache.get("0xgenesis-7", AsyncMock(return_value=entry))
+
+    substrate = CachedRuntimeSubstrate("ws://localhost", metadata_cache=cache, ss58_format=42)
+    substrate.get_chain_head = AsyncMock(return_value="0xhead")  # type: ignore
+    substrate.get_block_hash = AsyncMock(return_value="0xgenesis")  # type: ignore
+    substrate.get_block_runtime_version_for = AsyncMock(return_value=7)  # type: ignore
+    substrate._fetch_runtime_metadata = AsyncMock()  # type: ignore[method-assign]
+
+    runtime = await substrate.init_runtime()
+
+    substrate._fetch_runtime_metadata.assert_not_called()
+    assert runtime.runtime_version == 7
+    assert runtime.metadata is not None
+    assert runtime.metadata.value[1]["V14"]["extrinsic"]["version"] == 4
+    assert runtime.registry is not None
+    # The type map `AsyncSubstrateInterface` decodes with is loaded from the registry
+    assert substrate.registry_type_map == {"u8": 0}
+    assert substrate.runtime_cache.retrieve(runtime_version=7) is runtime
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from async_substrate_interface.errors import SubstrateRequestException
+
+from mytask.services.substrate_pool import SubstratePool
+
+
+class FakeSubstrate:
+    def __init__(self, name: str, fail: bool = False):
+        self.name = name
+        self.fail = fail
+
+    async def initialize(self):
+        pass
+
+    async def get_chain_head(self) -> str:
+        if self.fail:
+            raise ConnectionResetError("connection lost")
+        return "0x00"
+
+    async def close(self):
+        pass
+
+
+def make_pool(*substrates: FakeSubstrate) -> SubstratePool:
+    pool = SubstratePool([f"wss://{s.name}" for s in substrates])
+    for connection, substrate in zip(pool.connections, substrates):
+        connection.substrate = substrate  # type: ignore
+        connection.healthy = True
+    return pool
+
+
+async def test_routes_to_least_loaded():
+    pool = make_pool(FakeSubstrate("a"), FakeSubstrate("b"))
+
+    async with pool.connection() as first:
+        async with pool.connection() as second:
+            assert {first.name, second.name} == {"a", "b"}
+
+    await pool.close()
+
+
+async def test_fails_over_and_reconnects():
+    broken = FakeSubstrate("a", fail=True)
+    pool = make_pool(broken, FakeSubstrate("b"))
+    used = []
+
+    async def query(substrate) -> str:
+        used.append(substrate.name)
+        return await substrate.get_chain_head()
+
+    assert await pool.run(query) == "0x00"
+    assert used == ["a", "b"]
+    assert not pool.connections[0].healthy
+
+    # The connection is replaced in the background
+    reconnecting = pool.connections[0].reconnecting
+    assert reconnecting is not None
+    reconnecting.cancel()
+    pool.connections[0].substrate = FakeSubstrate("a")  # type: ignore
+    await pool._connect(pool.connections[0])
+    assert pool.connections[0].healthy
+
+    await pool.close()
+
+
+async def test_gives_up_after_retries():
+    pool = make_pool(FakeSubstrate("a"))
+    pool.retries = 1
+    calls = 0
+
+    async def query(substrate):
+        nonlocal calls
+        calls += 1
+        raise SubstrateRequestException("unknown block")
+
+    with pytest.raises(SubstrateRequestException):
+        await pool.run(query)
+    assert calls == 2
+
+    await asyncio.sleep(0)
+    await pool.close()
+
+
+async def test_callers_can_skip_retries():
+    pool = make_pool(FakeSubstrate("a"), FakeSubstrate("b"))
+    calls = 0
+
+    async def query(substrate):
+        nonlocal calls
+        calls += 1
+        raise SubstrateRequestException("unknown block")
+
+    with pytest.raises(SubstrateRequestException):
+        await pool.run(query, retries=0)
+    assert calls == 1
+
+    await pool.close()
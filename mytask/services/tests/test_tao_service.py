@@ -20,7 +20,8 @@ async def test_initialize():
 async def test_get_dividends_all_netuids():
     service = TaoService(redis_cache)
     await service.initialize()
-    dividends, is_cached = await service.get_cached_dividends(netuid=None, hotkey=None)
+    snapshot, is_cached = await service.get_cached_dividends(netuid=None, hotkey=None)
+    dividends = snapshot.to_dividends()
 
     assert isinstance(dividends, list)
     assert all(isinstance(d, Dividend) for d in dividends)
@@ -33,9 +34,10 @@ async def test_get_dividends_specific_netuid():
     service = TaoService(redis_cache)
     await service.initialize()
 
-    dividends, is_cached = await service.get_cached_dividends(
+    snapshot, is_cached = await service.get_cached_dividends(
         netuid=TEST_NETUID, hotkey=None
     )
+    dividends = snapshot.to_dividends()
     assert isinstance(dividends, list)
     assert all(d.netuid == TEST_NETUID for d in dividends)
 
@@ -44,9 +46,10 @@ async def test_get_dividends_with_hotkey():
     service = TaoService(redis_cache)
     await service.initialize()
 
-    dividends, is_cached = await service.get_cached_dividends(
+    snapshot, is_cached = await service.get_cached_dividends(
         netuid=TEST_NETUID, hotkey=TEST_HOTKEY
     )
+    dividends = snapshot.to_dividends()
     assert isinstance(dividends, list)
     assert all(d.hotkey == TEST_HOTKEY for d in dividends)
 
@@ -0,0 +1,284 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from mytask.common.cache_status import CacheStatus
+from mytask.common.redis_cache import RedisCache
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import TaoDividendDAO
+from mytask.services.tao_service import ALL_DIVIDENDS_KEY, DividendWrite, TaoService
+
+HOTKEY_A = "5F2CsUDVbRbVMXTh9fAzF9GacjVX7UapvRxidrxe7z8BYckQ"
+HOTKEY_B = "5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v"
+
+
+def make_snapshot(block: int = 100) -> DividendSnapshot:
+    return DividendSnapshot.concat(
+        [
+            DividendSnapshot.from_subnet(1, [HOTKEY_A, HOTKEY_B], [10, 20], block=block),
+            DividendSnapshot.from_subnet(2, [HOTKEY_A], [30], block=block),
+        ]
+    )
+
+
+@pytest.fixture
+async def service():
+    redis = FakeAsyncRedis()
+    service = TaoService(RedisCache(redis))
+    yield service
+    await redis.aclose()
+
+
+async def test_cold_stream_queries_the_chain_once(service: TaoService):
+    calls = 0
+
+    async def refresh_snapshot() -> DividendSnapshot:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return make_snapshot()
+
+    service._refresh_snapshot = refresh_snapshot  # type: ignore[method-assign]
+
+    streams = await asyncio.gather(
+        *(service.stream_cached_dividends(None, None) for _ in range(10))
+    )
+    assert calls == 1
+
+    for batches, _ in streams:
+        netuids = [int(batch.netuids[0]) async for batch in batches]
+        assert netuids == [1, 2]
+
+    # The snapshot was cached, the next stream doesn't query the chain
+    await service.stream_cached_dividends(None, None)
+    assert calls == 1
+
+
+async def test_misses_read_the_cache_once(service: TaoService):
+    service.fallback_max_age = 60
+    persisted = AsyncMock(return_value=make_snapshot())
+    service._get_persisted_dividends = persisted  # type: ignore[method-assign]
+    service._refresh_snapshot = AsyncMock(return_value=make_snapshot())  # type: ignore
+    subnet = make_snapshot().filter(netuid=1)
+    service._refresh_subnet = AsyncMock(return_value=subnet)  # type: ignore[method-assign]
+    read = []
+    get_many_entries = service.cache.get_many_entries
+
+    async def spy(keys, result_type):
+        read.extend(keys)
+        return await get_many_entries(keys, result_type)
+
+    with patch.object(service.cache, "get_many_entries", spy):
+        _, status = await service.get_cached_dividends(1, None)
+        assert status == CacheStatus.DATABASE
+        # The subnet, then the full snapshot that could answer it
+        assert read == ["netuid:1", ALL_DIVIDENDS_KEY]
+
+        read.clear()
+        _, status = await service.get_cached_dividends(None, None)
+        assert status == CacheStatus.DATABASE
+        assert read == [ALL_DIVIDENDS_KEY]
+
+    await asyncio.gather(*service.cache._refreshing.values())
+    service._refresh_snapshot.assert_awaited_once()
+    service._refresh_subnet.assert_awaited_once_with(1)
+
+
+async def test_patching_a_stale_snapshot_keeps_it_stale(service: TaoService):
+    now = time.time()
+    await service.cache.set(
+        ALL_DIVIDENDS_KEY,
+        make_snapshot(),
+        value_type=DividendSnapshot,
+        fresh_until=now - 10,
+        expires_at=now + 50,
+    )
+
+    patch = DividendSnapshot.from_subnet(2, [HOTKEY_B], [40], block=101)
+    await service._update_snapshot({2: patch})
+
+    entry = await service.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+    assert entry is not None
+    assert entry.is_stale()
+    assert (entry.fresh_until, entry.expires_at) == (now - 10, now + 50)
+    assert [d.dividends for d in entry.value.filter(netuid=2).to_dividends()] == [40]
+    assert 49_000 < await service.cache.redis.pttl(ALL_DIVIDENDS_KEY) <= 50_000
+
+
+async def test_refreshed_subnets_are_patched_into_the_snapshot(service: TaoService):
+    await service.cache.set(
+        ALL_DIVIDENDS_KEY, make_snapshot(), ttl=60, stale_ttl=60, value_type=DividendSnapshot
+    )
+    before = await service.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+    assert before is not None
+
+    await service._update_snapshot(
+        {
+            2: DividendSnapshot.from_subnet(2, [HOTKEY_A, HOTKEY_B], [31, 40], block=101),
+            # New subnets are added
+            3: DividendSnapshot.from_subnet(3, [HOTKEY_B], [50], block=101),
+        }
+    )
+
+    entry = await service.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+    assert entry is not None
+    assert [(d.netuid, d.hotkey, d.dividends, d.block) for d in entry.value.to_dividends()] == [
+        (1, HOTKEY_A, 10, 100),
+        (1, HOTKEY_B, 20, 100),
+        (2, HOTKEY_A, 31, 101),
+        (2, HOTKEY_B, 40, 101),
+        (3, HOTKEY_B, 50, 101),
+    ]
+    assert (entry.fresh_until, entry.expires_at) == (before.fresh_until, before.expires_at)
+
+
+async def test_subnets_are_not_patched_into_a_missing_snapshot(service: TaoService):
+    await service._update_snapshot({2: make_snapshot().filter(netuid=2)})
+
+    assert await service.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot) is None
+
+
+async def test_refreshing_a_subnet(service: TaoService):
+    await service.cache.set(
+        ALL_DIVIDENDS_KEY, make_snapshot(), ttl=60, value_type=DividendSnapshot
+    )
+    refreshed = DividendSnapshot.from_subnet(1, [HOTKEY_A], [11], block=101)
+    service._query_dividends = AsyncMock(return_value=refreshed)  # type: ignore[method-assign]
+    service.writer.put = AsyncMock()  # type: ignore[method-assign]
+
+    assert await service._refresh_subnets([1]) == {1: refreshed}
+
+    entry = await service.cache.get_entry(ALL_DIVIDENDS_KEY, DividendSnapshot)
+    assert entry is not None
+    assert entry.value.filter(netuid=1) == refreshed
+    assert entry.value.filter(netuid=2) == make_snapshot().filter(netuid=2)
+    # Hotkey lookups see the refreshed subnet
+    assert await service.store.get(1, HOTKEY_B) == []
+    assert [d.dividends for d in service.index.get(1, HOTKEY_A) or []] == [11]
+    write = service.writer.put.await_args.args[0]
+    assert [(d.hotkey, d.dividends) for d in write.dividends.to_dividends()] == [(HOTKEY_A, 11)]
+    assert [(d.hotkey, d.block) for d in write.removed.to_dividends()] == [(HOTKEY_B, 101)]
+
+
+async def test_queued_rows_keep_the_time_of_their_block(service: TaoService):
+    block_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    service.block_times[100] = block_time
+    dividends_by_netuid = make_snapshot().split_by_netuid()
+    write = service._rows_to_persist(dividends_by_netuid, None)
+    # Newer blocks pushed the block out before the write
+    service.block_times.clear()
+
+    unknown = DividendWrite(
+        DividendSnapshot.from_subnet(3, [HOTKEY_A], [50], block=7),
+        DividendSnapshot.empty(),
+        {},
+        [3],
+        time.time(),
+    )
+    with patch("mytask.services.tao_service.TaoDividendTable") as table:
+        table.return_value.upsert_many = AsyncMock()
+        await service._persist_dividends([write, unknown])
+
+    rows = table.return_value.upsert_many.await_args.args[0]
+    assert [(row.netuid, row.dividend) for row in rows] == [(1, 10), (1, 20), (2, 30)]
+    assert {row.created_at for row in rows} == {block_time}
+    # Subnet 3 wasn't written, it's written in full again with the next refresh
+    assert set(service._checkpoints) == {1, 2}
+
+
+async def test_removed_rows_are_marked(service: TaoService):
+    service.block_times[101] = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    # Hotkey B left subnet 1, hotkey A's dividend on subnet 2 dropped to 0
+    current = {
+        1: DividendSnapshot.from_subnet(1, [HOTKEY_A], [10], block=101),
+        2: DividendSnapshot.from_subnet(2, [HOTKEY_A], [0], block=101),
+    }
+    diff = DividendSnapshot.concat(current.values()).diff(make_snapshot())
+    write = service._rows_to_persist(current, diff)
+
+    with patch("mytask.services.tao_service.TaoDividendTable") as table:
+        table.return_value.upsert_many = AsyncMock()
+        await service._persist_dividends([write])
+
+    rows = table.return_value.upsert_many.await_args.args[0]
+    assert sorted((row.netuid, row.hotkey, row.dividend, row.removed) for row in rows) == [
+        (1, HOTKEY_B, 0, True),
+        (2, HOTKEY_A, 0, False),
+    ]
+
+
+async def test_checkpoints_advance_once_written(service: TaoService):
+    service.fallback_max_age = 60
+    service.block_times[100] = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    dividends_by_netuid = make_snapshot().split_by_netuid()
+    write = service._rows_to_persist(dividends_by_netuid, None)
+    assert write.full_netuids == [1, 2]
+    assert service._checkpoints == {}
+
+    with patch("mytask.services.tao_service.TaoDividendTable") as table:
+        table.return_value.upsert_many = AsyncMock(side_effect=ConnectionError)
+        with pytest.raises(ConnectionError):
+            await service._persist_dividends([write])
+        assert service._checkpoints == {}
+
+        table.return_value.upsert_many = AsyncMock()
+        await service._persist_dividends([write])
+    assert service._checkpoints == {1: write.queued_at, 2: write.queued_at}
+
+    # Unchanged subnets aren't due anymore
+    previous = make_snapshot()
+    write = service._rows_to_persist(dividends_by_netuid, previous.diff(previous))
+    assert write.full_netuids == []
+    assert len(write.dividends) == 0
+
+
+async def test_persisted_dividends_leave_out_removed_hotkeys(service: TaoService):
+    service.fallback_max_age = 60
+    now = datetime.now(timezone.utc)
+    rows = [
+        TaoDividendDAO(netuid=1, hotkey=HOTKEY_A, dividend=0, block=101, created_at=now),
+        TaoDividendDAO(
+            netuid=1, hotkey=HOTKEY_B, dividend=0, block=101, created_at=now, removed=True
+        ),
+    ]
+    with patch("mytask.services.tao_service.TaoDividendTable") as table:
+        table.return_value.get_latest = AsyncMock(return_value=rows)
+        dividends = await service._get_persisted_dividends(1)
+
+    assert dividends is not None
+    # A dividend of 0 is still a dividend
+    assert [(d.hotkey, d.dividends) for d in dividends.to_dividends()] == [(HOTKEY_A, 0)]
+
+
+async def test_failed_initialize_closes_the_connections(service: TaoService):
+    with (
+        patch.object(service.subtensor, "initialize", AsyncMock()),
+        patch.object(service.subtensor, "close", AsyncMock()) as close_subtensor,
+        patch.object(service.pool, "initialize", AsyncMock(side_effect=ConnectionError)),
+        patch.object(service.pool, "close", AsyncMock()) as close_pool,
+    ):
+        with pytest.raises(ConnectionError):
+            await service.initialize()
+
+    close_subtensor.assert_awaited_once()
+    close_pool.assert_awaited_once()
+    # Failed services don't follow invalidations, they are dropped
+    assert service.cache._invalidation_callbacks == []
+
+
+async def test_invalidation_callback_lives_with_the_service(service: TaoService):
+    with (
+        patch.object(service.subtensor, "initialize", AsyncMock()),
+        patch.object(service.subtensor, "close", AsyncMock()),
+        patch.object(service.pool, "initialize", AsyncMock()),
+        patch.object(service.pool, "close", AsyncMock()),
+    ):
+        await service.initialize()
+        assert service.cache._invalidation_callbacks == [service._on_cache_invalidation]
+
+        await service.close()
+        assert service.cache._invalidation_callbacks == []
@@ -1,6 +1,11 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mytask.common.table import BaseTable
+from mytask.common.partitions import DailyPartitions
+from mytask.common.settings import get_settings
+from mytask.common.table import BaseTable, get_async_engine
 from mytask.models.tao import TaoDividendDAO, TaoDividendModel
 
 
@@ -8,6 +13,105 @@ class TaoDividendTable(BaseTable[TaoDividendDAO, TaoDividendModel]):
     def __init__(self, session: AsyncSession | None = None):
         super().__init__(TaoDividendDAO, TaoDividendModel, session)
 
+    async def get_history(
+        self,
+        start: datetime,
+        end: datetime,
+        netuid: int | None = None,
+        hotkey: str | None = None,
+        limit: int = 1000,
+    ) -> list[TaoDividendDAO]:
+        """
+        Get the dividends read between two times, oldest first.
+
+        The time range only scans the partitions it overlaps, and the netuid or hotkey goes
+        through their `(netuid, created_at)` and `(hotkey, created_at)` indexes.
+
+        Args:
+            start (datetime): The earliest block time, inclusive.
+            end (datetime): The latest block time, exclusive.
+            netuid (int | None): Only dividends on this subnet.
+            hotkey (str | None): Only dividends of this hotkey.
+            limit (int): The maximum number of dividends.
+
+        Returns:
+            list[TaoDividendDAO]: The dividends.
+        """
+        stmt = select(*self._columns).where(
+            TaoDividendModel.created_at >= start, TaoDividendModel.created_at < end
+        )
+        if netuid is not None:
+            stmt = stmt.where(TaoDividendModel.netuid == netuid)
+        if hotkey is not None:
+            stmt = stmt.where(TaoDividendModel.hotkey == hotkey)
+        stmt = stmt.order_by(
+            TaoDividendModel.created_at, TaoDividendModel.netuid, TaoDividendModel.hotkey
+        ).limit(limit)
+
+        async with self._session() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return self._to_models(rows)
+
+    async def get_latest(
+        self, since: datetime, netuid: int | None = None
+    ) -> list[TaoDividendDAO]:
+        """
+        Get the latest dividend of every hotkey, among the dividends read since a time.
+
+        Refreshes only write the dividends that changed, so the latest state of a hotkey is its
+        latest row, which may be older than the latest refresh. Hotkeys removed from their
+        subnet have a latest row with `removed` set.
+
+        Args:
+            since (datetime): The earliest block time to look at.
+            netuid (int | None): Only dividends on this subnet.
+
+        Returns:
+            list[TaoDividendDAO]: The latest dividends, ordered by netuid and hotkey.
+        """
+        rank = (
+            func.row_number()
+            .over(
+                partition_by=(TaoDividendModel.netuid, TaoDividendModel.hotkey),
+                order_by=(TaoDividendModel.created_at.desc(), TaoDividendModel.block.desc()),
+            )
+            .label("rank")
+        )
+        ranked = select(*self._columns, rank).where(TaoDividendModel.created_at >= since)
+        if netuid is not None:
+            ranked = ranked.where(TaoDividendModel.netuid == netuid)
+        latest = ranked.subquery()
+        stmt = (
+            select(*(latest.c[column.key] for column in self._columns))
+            .where(latest.c.rank == 1)
+            .order_by(latest.c.netuid, latest.c.hotkey)
+        )
+
+        async with self._session() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return self._to_models(rows)
+
+
+async def maintain_tao_dividend_partitions() -> None:
+    """
+    Create the upcoming daily partitions of `tao_dividends` and drop the expired ones.
+
+    Only PostgreSQL tables are partitioned, this does nothing on other databases.
+    """
+    settings = get_settings()
+    partitions = DailyPartitions(
+        TaoDividendModel.__tablename__,
+        retention_days=settings.dividends_history_retention_days,
+        premake_days=settings.dividends_partition_premake_days,
+    )
+    async with get_async_engine().begin() as connection:
+        if connection.dialect.name != "postgresql":
+            return
+        await partitions.ensure(connection)
+        await partitions.drop_expired(connection)
+
 
 if __name__ == "__main__":
     import asyncio
@@ -21,4 +125,3 @@ if __name__ == "__main__":
         ))
 
     asyncio.run(main())
-
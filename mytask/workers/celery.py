@@ -16,6 +16,20 @@ app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Worker processes connect to the chain on start, see `warm_up_tao_service`
+    worker_proc_alive_timeout=120,
+    beat_schedule={
+        "refresh-dividends": {
+            "task": "mytask.workers.tasks.refresh_dividends",
+            "schedule": settings.dividends_refresh_interval,
+            # Don't pile up refreshes if the workers fall behind
+            "options": {"expires": settings.dividends_refresh_interval},
+        },
+        "maintain-dividend-partitions": {
+            "task": "mytask.workers.tasks.maintain_dividend_partitions",
+            "schedule": 24 * 60 * 60,
+        },
+    },
 )
 
 # Load tasks from all modules in the tasks package
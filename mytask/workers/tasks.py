@@ -3,33 +3,58 @@ from datetime import datetime, timedelta
 
 from bittensor import Balance
 from celery import shared_task
+from celery.signals import worker_process_init
 
 from mytask.common.logger import get_logger
 from mytask.common.settings import get_settings
 from mytask.services.chutes_service import ChutesService
 from mytask.services.datura_service import DaturaService
 from mytask.services.tao_service import get_tao_service
+from mytask.tables.tao import maintain_tao_dividend_partitions
 from mytask.workers.celery import app
 
 logger = get_logger()
 settings = get_settings()
 
 
+# The event loop of this worker process, see `get_worker_loop`
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the event loop of this worker process, created on first use and kept open.
+
+    The `TaoService` singleton and everything it owns, like the substrate connections and
+    asyncio locks and queues, is bound to the loop it was created on, so every task of the
+    process has to run on that same loop. Worker processes run one task at a time.
+    """
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
 def run_async(coro):
     """Helper function to run async code in a synchronous Celery task."""
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        # Create a new event loop if one doesn't exist in the current thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def warm_up_tao_service(**kwargs):
+    """
+    Initialize the TaoService when a worker process starts instead of in its first task.
 
+    The service is created on the process's event loop, which every task runs on, see
+    `get_worker_loop`, so the tasks reuse its connections.
+    """
+    logger.info("Warming up TaoService")
     try:
-        return loop.run_until_complete(coro)
-    finally:
-        # Close the loop if we created a new one
-        if loop != asyncio.get_event_loop_policy().get_event_loop():
-            loop.close()
+        run_async(get_tao_service())
+    except Exception as e:
+        # The first task initializes it again
+        logger.error(f"Warming up TaoService failed: {str(e)}", exc_info=True)
 
 
 @app.task
@@ -148,3 +173,51 @@ def analyze_sentiment_and_stake(netuid: int, hotkey: str):
             f"Error in analyze_sentiment_and_stake task: {str(e)}", exc_info=True
         )
         raise
+
+
+@app.task
+def refresh_dividends():
+    """
+    Refresh the dividends of all subnets in the cache before they expire.
+
+    Scheduled by Celery beat every `dividends_refresh_interval` seconds.
+    """
+    logger.info("Starting refresh_dividends task")
+
+    async def _run():
+        tao_service = await get_tao_service()
+        count = await tao_service.refresh_dividends(
+            stagger=settings.dividends_refresh_stagger,
+            jitter=settings.dividends_refresh_jitter,
+        )
+        # The worker's event loop only runs while a task does, queued writes would wait for
+        # the next task
+        await tao_service.writer.flush()
+        return count
+
+    try:
+        count = run_async(_run())
+        logger.info(f"Refreshed {count} dividends")
+        return {"status": "completed", "dividends": count}
+    except Exception as e:
+        logger.error(f"Error in refresh_dividends task: {str(e)}", exc_info=True)
+        raise
+
+
+@app.task
+def maintain_dividend_partitions():
+    """
+    Create the upcoming daily partitions of `tao_dividends` and drop the expired ones.
+
+    Scheduled by Celery beat once a day, partitions are created a week ahead.
+    """
+    logger.info("Starting maintain_dividend_partitions task")
+
+    try:
+        run_async(maintain_tao_dividend_partitions())
+        return {"status": "completed"}
+    except Exception as e:
+        logger.error(
+            f"Error in maintain_dividend_partitions task: {str(e)}", exc_info=True
+        )
+        raise
@@ -1,10 +1,26 @@
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi import BackgroundTasks
 
-from mytask.models.tao import GetTaoDividendsResponse, TaoDividendBase
-from mytask.routers.v1.tao import get_tao_dividends, run_sentiment_task
+from mytask.common.cache_status import CacheStatus
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.models.tao import (
+    GetTaoDividendChangesResponse,
+    GetTaoDividendHistoryResponse,
+    GetTaoDividendsResponse,
+    TaoDividendBase,
+    TaoDividendDAO,
+    TaoDividendResponseItem,
+)
+from mytask.routers.v1.tao import (
+    get_tao_dividend_changes,
+    get_tao_dividend_history,
+    get_tao_dividends,
+    run_sentiment_task,
+)
+from mytask.services.dividend_changes import DividendChanges
 from mytask.services.tao_service import Dividend
 
 
@@ -34,19 +50,21 @@ async def test_get_tao_dividends_without_trade(
     # Setup mocks
     mock_tao_service = AsyncMock()
     mock_tao_service.get_cached_dividends.return_value = (
-        [
-            Dividend(
-                netuid=18,
-                hotkey="5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v",
-                dividends=1000,
-            ),
-            Dividend(
-                netuid=19,
-                hotkey="5GNJqTPyNqANBkUVMN1LPPrxXnFouWXoe2wNSmmEoLctxiZY",
-                dividends=2000,
-            ),
-        ],
-        True,
+        DividendSnapshot.from_dividends(
+            [
+                Dividend(
+                    netuid=18,
+                    hotkey="5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v",
+                    dividends=1000,
+                ),
+                Dividend(
+                    netuid=19,
+                    hotkey="5GNJqTPyNqANBkUVMN1LPPrxXnFouWXoe2wNSmmEoLctxiZY",
+                    dividends=2000,
+                ),
+            ]
+        ),
+        CacheStatus.FRESH,
     )
     mock_get_tao_service.return_value = mock_tao_service
 
@@ -66,6 +84,7 @@ async def test_get_tao_dividends_without_trade(
     for dividend in response.dividends:
         assert isinstance(dividend, TaoDividendBase)
         assert dividend.cached is True
+        assert dividend.cache_status == CacheStatus.FRESH
         assert dividend.stake_tx_triggered is False
 
     # Verify no sentiment task was triggered
@@ -81,19 +100,21 @@ async def test_get_tao_dividends_with_trade(
     # Setup mocks
     mock_tao_service = AsyncMock()
     mock_tao_service.get_cached_dividends.return_value = (
-        [
-            Dividend(
-                netuid=18,
-                hotkey="5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v",
-                dividends=1000,
-            ),
-            Dividend(
-                netuid=19,
-                hotkey="5GNJqTPyNqANBkUVMN1LPPrxXnFouWXoe2wNSmmEoLctxiZY",
-                dividends=2000,
-            ),
-        ],
-        True,
+        DividendSnapshot.from_dividends(
+            [
+                Dividend(
+                    netuid=18,
+                    hotkey="5FFApaS75bv5pJHfAp2FVLBj9ZaXuFDjEypsaBNc1wCfe52v",
+                    dividends=1000,
+                ),
+                Dividend(
+                    netuid=19,
+                    hotkey="5GNJqTPyNqANBkUVMN1LPPrxXnFouWXoe2wNSmmEoLctxiZY",
+                    dividends=2000,
+                ),
+            ]
+        ),
+        CacheStatus.FRESH,
     )
     mock_get_tao_service.return_value = mock_tao_service
 
@@ -114,12 +135,102 @@ async def test_get_tao_dividends_with_trade(
     for dividend in response.dividends:
         assert isinstance(dividend, TaoDividendBase)
         assert dividend.cached is True
+        assert dividend.cache_status == CacheStatus.FRESH
         assert dividend.stake_tx_triggered is True
 
     # Verify the sentiment task was added to background tasks
     assert len(background_tasks.tasks) == 1
 
 
+@patch("mytask.routers.v1.tao.run_sentiment_task")
+async def test_get_tao_dividends_stream(mock_run_sentiment_task, mock_dividends):
+    """Test the get_tao_dividends endpoint in NDJSON streaming mode"""
+
+    async def batches():
+        for dividend in mock_dividends:
+            yield DividendSnapshot.from_dividends([dividend])
+
+    mock_tao_service = AsyncMock()
+    mock_tao_service.stream_cached_dividends.return_value = (batches(), CacheStatus.MISS)
+
+    response = await get_tao_dividends(
+        netuid=None,
+        hotkey=None,
+        trade=False,
+        stream=True,
+        tao_service=mock_tao_service,
+    )
+
+    assert response.media_type == "application/x-ndjson"
+    chunks = [chunk async for chunk in response.body_iterator]
+    items = [
+        TaoDividendResponseItem.model_validate_json(line)
+        for chunk in chunks
+        for line in chunk.splitlines()
+    ]
+    assert len(chunks) == 2
+    assert [item.dividend for item in items] == [1000, 2000]
+    assert all(item.cache_status == CacheStatus.MISS for item in items)
+    mock_tao_service.get_cached_dividends.assert_not_called()
+
+
+async def test_get_tao_dividend_changes(mock_dividends):
+    """Test the get_tao_dividend_changes endpoint with a block cursor"""
+    mock_tao_service = AsyncMock()
+    mock_tao_service.get_dividend_changes.return_value = (
+        DividendChanges(
+            changed=DividendSnapshot.from_dividends(mock_dividends[:1]),
+            removed=DividendSnapshot.from_dividends(mock_dividends[1:]),
+            block=101,
+            timestamp=1700000000.0,
+        ),
+        False,
+    )
+
+    response = await get_tao_dividend_changes(
+        since_block=100, since=None, tao_service=mock_tao_service
+    )
+
+    assert isinstance(response, GetTaoDividendChangesResponse)
+    assert response.block == 101
+    assert response.full is False
+    assert [(c.netuid, c.dividend, c.removed) for c in response.changes] == [
+        (18, 1000, False),
+        (19, 0, True),
+    ]
+    mock_tao_service.get_dividend_changes.assert_awaited_once_with(100, None)
+
+
+async def test_get_tao_dividend_history():
+    """Test the get_tao_dividend_history endpoint defaults to the last day"""
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    mock_tao_service = AsyncMock()
+    mock_tao_service.get_dividend_history.return_value = [
+        TaoDividendDAO(
+            netuid=18, hotkey="abc", dividend=1000, block=100, created_at=created_at
+        )
+    ]
+
+    response = await get_tao_dividend_history(
+        netuid=18,
+        hotkey=None,
+        start=None,
+        end=datetime(2025, 1, 2),
+        limit=10,
+        tao_service=mock_tao_service,
+        session=None,
+    )
+
+    assert isinstance(response, GetTaoDividendHistoryResponse)
+    assert [(d.netuid, d.block, d.created_at) for d in response.dividends] == [
+        (18, 100, created_at)
+    ]
+    end = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    mock_tao_service.get_dividend_history.assert_awaited_once_with(
+        end - timedelta(days=1), end, netuid=18, hotkey=None, limit=10, session=None
+    )
+
+
 # We'll test the run_sentiment_task function integration directly
 def test_run_sentiment_task():
     """Test the run_sentiment_task function with mocks for celery task"""
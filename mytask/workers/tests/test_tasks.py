@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from mytask.common.singleton import async_singleton
+from mytask.common.write_behind import WriteBehindQueue
+from mytask.workers import tasks
+from mytask.workers.tasks import refresh_dividends, run_async, warm_up_tao_service
+
+
+class LoopBoundTaoService:
+    """Like the TaoService, only usable on the event loop it was created on"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.writer = WriteBehindQueue(self._persist_dividends)
+        self.persisted: list[int] = []
+
+    async def refresh_dividends(self, stagger: float = 0, jitter: float = 0) -> int:
+        assert asyncio.get_running_loop() is self.loop
+        await self.writer.put(42)
+        return 42
+
+    async def _persist_dividends(self, batch: list[int]) -> None:
+        self.persisted.extend(batch)
+
+
+@pytest.fixture
+def worker_loop():
+    """Run tasks through the real `run_async`, on a fresh worker loop"""
+    with patch("mytask.workers.tasks.run_async", run_async):
+        yield
+    loop = tasks._worker_loop
+    if loop is not None:
+        # Background tasks of the service, like the writer's consumer
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+        tasks._worker_loop = None
+
+
+@patch("mytask.workers.tasks.get_tao_service")
+def test_refresh_dividends(mock_get_tao_service):
+    """Test the refresh_dividends task refreshes through the TaoService"""
+    mock_tao_service = AsyncMock()
+    mock_tao_service.refresh_dividends.return_value = 42
+    mock_get_tao_service.return_value = mock_tao_service
+
+    result = refresh_dividends()
+
+    assert result == {"status": "completed", "dividends": 42}
+    mock_tao_service.refresh_dividends.assert_awaited_once()
+
+
+def test_tasks_run_on_the_loop_of_the_warm_up(worker_loop):
+    """Test a task reuses the TaoService created when the worker process started"""
+
+    @async_singleton
+    async def get_tao_service():
+        return LoopBoundTaoService()
+
+    with patch("mytask.workers.tasks.get_tao_service", get_tao_service):
+        warm_up_tao_service()
+        result = refresh_dividends()
+
+    assert result == {"status": "completed", "dividends": 42}
+
+
+def test_refresh_dividends_runs_again_in_the_same_process(worker_loop):
+    """Test beat can run refresh_dividends more than once per worker process"""
+
+    @async_singleton
+    async def get_tao_service():
+        return LoopBoundTaoService()
+
+    with patch("mytask.workers.tasks.get_tao_service", get_tao_service):
+        first = refresh_dividends()
+        second = refresh_dividends()
+
+    assert first == second == {"status": "completed", "dividends": 42}
+
+
+def test_refresh_dividends_persists_every_run(worker_loop):
+    """Test the writes queued by each refresh are flushed before its task returns"""
+    service = None
+
+    @async_singleton
+    async def get_tao_service():
+        nonlocal service
+        service = LoopBoundTaoService()
+        return service
+
+    with patch("mytask.workers.tasks.get_tao_service", get_tao_service):
+        refresh_dividends()
+        assert service.persisted == [42]
+        refresh_dividends()
+
+    assert service.persisted == [42, 42]
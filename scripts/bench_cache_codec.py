@@ -0,0 +1,132 @@
+"""
+Benchmark cache entry serialization for the all-subnets dividend list.
+
+Compares the previous `json.dumps` + recursive `_parse_with_type` path with the codecs of
+`mytask.common.cache_codec`, for a list of `Dividend` models and for a columnar
+`DividendSnapshot`.
+
+    uv run python scripts/bench_cache_codec.py [number of dividends]
+"""
+
+import inspect
+import json
+import random
+import string
+import sys
+import time
+from typing import Any, Callable, get_args, get_origin
+
+from pydantic import BaseModel
+
+from mytask.common.cache_codec import (
+    CacheCodec,
+    CompressedCodec,
+    JsonCodec,
+    MsgpackCodec,
+    OrjsonCodec,
+)
+from mytask.common.redis_cache import cache_entry_type
+from mytask.models.dividend_snapshot import DividendSnapshot
+from mytask.services.tao_service import Dividend
+
+ROUNDS = 5
+
+
+def legacy_dumps(value: list[BaseModel]) -> bytes:
+    return json.dumps([item.model_dump() for item in value]).encode()
+
+
+def legacy_parse_with_type(data: Any, type_hint: Any) -> Any:
+    if inspect.isclass(type_hint) and issubclass(type_hint, BaseModel):
+        return type_hint.model_validate(data)
+
+    origin = get_origin(type_hint)
+    if origin is list:
+        item_type = get_args(type_hint)[0]
+        return [legacy_parse_with_type(item, item_type) for item in data]
+    return data
+
+
+def legacy_loads(data: bytes) -> list[Dividend]:
+    return legacy_parse_with_type(json.loads(data), list[Dividend])
+
+
+def make_dividends(count: int) -> list[Dividend]:
+    alphabet = string.ascii_letters + string.digits
+    hotkeys = ["5" + "".join(random.choices(alphabet, k=47)) for _ in range(count // 4)]
+    return [
+        Dividend(
+            netuid=random.randint(0, 128),
+            hotkey=random.choice(hotkeys),
+            dividends=random.randint(0, 2**40),
+        )
+        for _ in range(count)
+    ]
+
+
+def best_of(func: Callable[[], Any]) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def report(name: str, dumps: Callable[[], bytes], loads: Callable[[bytes], Any]):
+    data = dumps()
+    dump_time = best_of(dumps)
+    load_time = best_of(lambda: loads(data))
+    print(
+        f"{name:<20} size={len(data) / 1024:>9.1f}KB "
+        f"dumps={dump_time * 1000:>8.2f}ms loads={load_time * 1000:>8.2f}ms"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    dividends = make_dividends(count)
+    print(f"{count} dividends, best of {ROUNDS} rounds")
+
+    report("legacy json", lambda: legacy_dumps(dividends), legacy_loads)
+
+    entry_type = cache_entry_type(list[Dividend])
+    entry = entry_type.model_construct(
+        value=dividends, fresh_until=0, expires_at=0, delta=0
+    )
+
+    codecs: list[tuple[str, Callable[[], CacheCodec]]] = [
+        ("json", JsonCodec),
+        ("json+zlib", lambda: CompressedCodec(JsonCodec(), threshold=0)),
+        ("json+zstd", lambda: CompressedCodec(JsonCodec(), "zstd", threshold=0)),
+        ("orjson", OrjsonCodec),
+        ("msgpack", MsgpackCodec),
+    ]
+    snapshot_entry_type = cache_entry_type(DividendSnapshot)
+    snapshot_entry = snapshot_entry_type.model_construct(
+        value=DividendSnapshot.from_dividends(dividends),
+        fresh_until=0,
+        expires_at=0,
+        delta=0,
+    )
+
+    for name, factory in codecs:
+        try:
+            codec = factory()
+        except ImportError as e:
+            print(f"{name:<20} skipped: {e}")
+            continue
+        report(
+            name,
+            lambda: codec.dumps(entry),
+            lambda data: codec.loads(entry_type, data),
+        )
+        report(
+            f"{name} columnar",
+            lambda: codec.dumps(snapshot_entry),
+            lambda data: codec.loads(snapshot_entry_type, data),
+        )
+
+
+if __name__ == "__main__":
+    main()
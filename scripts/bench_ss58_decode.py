@@ -0,0 +1,66 @@
+"""
+Benchmark decoding the hotkeys of a dividend snapshot.
+
+Compares calling `decode_account_id` on every `query_map` key with the memoized, batched
+`AccountIdDecoder`, cold (first snapshot) and warm (every later refresh).
+
+    uv run python scripts/bench_ss58_decode.py [number of subnets] [hotkeys per subnet]
+"""
+
+import random
+import sys
+import time
+from typing import Callable
+
+from bittensor.core.chain_data import decode_account_id
+
+from mytask.services.account_ids import AccountIdDecoder
+
+ROUNDS = 5
+
+
+def make_pages(subnets: int, hotkeys: int) -> list[list[tuple[tuple[int, ...]]]]:
+    # Hotkeys are registered on several subnets, draw every page from a shared population
+    population = [
+        tuple(random.randrange(256) for _ in range(32)) for _ in range(hotkeys * 4)
+    ]
+    return [
+        [(account_id,) for account_id in random.sample(population, hotkeys)]
+        for _ in range(subnets)
+    ]
+
+
+def best_of(func: Callable[[], object], setup: Callable[[], None] = lambda: None) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    subnets = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    hotkeys = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    pages = make_pages(subnets, hotkeys)
+    decoder = AccountIdDecoder()
+
+    def per_key():
+        for page in pages:
+            [decode_account_id(key) for key in page]
+
+    def batched():
+        for page in pages:
+            decoder.decode_many(page)
+
+    print(f"{subnets} subnets x {hotkeys} hotkeys, best of {ROUNDS} rounds per snapshot")
+    print(f"{'decode_account_id':<20} {best_of(per_key) * 1000:8.2f}ms")
+    cold = best_of(batched, setup=decoder.clear)
+    print(f"{'decoder cold':<20} {cold * 1000:8.2f}ms")
+    warm = best_of(batched)
+    print(f"{'decoder warm':<20} {warm * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark persisting a dividend snapshot to `tao_dividends`.
+
+Compares `BaseTable.create` per row, the previous path, with one executemany INSERT and with
+`BaseTable.create_many`, which uses COPY on PostgreSQL. The rows are deleted afterwards.
+
+    uv run python scripts/bench_table_insert.py [database url] [number of dividends]
+"""
+
+import asyncio
+import random
+import string
+import sys
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from mytask.common.base import MyTaskBaseModel
+from mytask.common.settings import get_settings
+from mytask.models.tao import TaoDividendDAO, TaoDividendModel
+from mytask.tables.tao import TaoDividendTable
+
+
+def make_dividends(count: int) -> list[TaoDividendDAO]:
+    return [
+        TaoDividendDAO(
+            netuid=i % 128,
+            hotkey="5" + "".join(random.choices(string.ascii_letters, k=47)),
+            dividend=random.randrange(2**31),
+        )
+        for i in range(count)
+    ]
+
+
+async def main() -> None:
+    url = sys.argv[1] if len(sys.argv) > 1 else get_settings().postgres_dsn
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+psycopg://", 1)
+
+    engine = create_async_engine(url)
+    session_factory = async_sessionmaker(engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(MyTaskBaseModel.metadata.create_all)
+
+    async def create_each(dividends: list[TaoDividendDAO]) -> None:
+        # Like `TaoDividendTable().create`, which commits and closes its session per row
+        for dividend in dividends:
+            async with session_factory() as session:
+                await TaoDividendTable(session).create(dividend)
+                await session.commit()
+
+    async def insert_many(dividends: list[TaoDividendDAO]) -> None:
+        async with session_factory() as session:
+            await session.execute(
+                insert(TaoDividendModel), [d.model_dump() for d in dividends]
+            )
+            await session.commit()
+
+    async def create_many(dividends: list[TaoDividendDAO]) -> None:
+        async with session_factory() as session:
+            await TaoDividendTable(session).create_many(dividends)
+            await session.commit()
+
+    methods: list[tuple[str, Callable[[list[TaoDividendDAO]], Awaitable[None]]]] = [
+        ("create per row", create_each),
+        ("executemany INSERT", insert_many),
+        ("create_many", create_many),
+    ]
+
+    print(f"{count} dividends, {engine.dialect.name}+{engine.dialect.driver}")
+    for name, method in methods:
+        dividends = make_dividends(count)
+        start = time.perf_counter()
+        await method(dividends)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<20} {elapsed * 1000:9.1f}ms {count / elapsed:10.0f} rows/s")
+
+        async with session_factory() as session:
+            await session.execute(
+                delete(TaoDividendModel).where(
+                    TaoDividendModel.id.in_([d.id for d in dividends])
+                )
+            )
+            await session.commit()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
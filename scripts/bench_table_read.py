@@ -0,0 +1,109 @@
+"""
+Benchmark reading rows of `tao_dividends` as DAOs.
+
+Compares the previous path, ORM objects converted with `model_validate` one by one, with
+`model_construct` on column tuples, and with `BaseTable.filter` and `BaseTable.iterate`, which
+select column tuples and validate them with one precompiled validator. The rows are deleted
+afterwards.
+
+    uv run python scripts/bench_table_read.py [database url] [number of dividends]
+"""
+
+import asyncio
+import random
+import string
+import sys
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from mytask.common.base import MyTaskBaseModel
+from mytask.common.settings import get_settings
+from mytask.models.tao import TaoDividendDAO, TaoDividendModel
+from mytask.tables.tao import TaoDividendTable
+
+
+def make_dividends(count: int, block: int) -> list[TaoDividendDAO]:
+    return [
+        TaoDividendDAO(
+            netuid=i % 128,
+            hotkey="5" + "".join(random.choices(string.ascii_letters, k=47)),
+            dividend=random.randrange(2**31),
+            block=block,
+        )
+        for i in range(count)
+    ]
+
+
+async def main() -> None:
+    url = sys.argv[1] if len(sys.argv) > 1 else get_settings().postgres_dsn
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+psycopg://", 1)
+
+    engine = create_async_engine(url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as connection:
+        await connection.run_sync(MyTaskBaseModel.metadata.create_all)
+
+    # Only the rows of this run are read, they have their own block
+    block = random.randrange(2**62)
+    async with session_factory() as session:
+        await TaoDividendTable(session).create_many(make_dividends(count, block))
+        await session.commit()
+
+    async def orm_model_validate(session: AsyncSession) -> list[TaoDividendDAO]:
+        result = await session.execute(
+            select(TaoDividendModel).where(TaoDividendModel.block == block)
+        )
+        return [TaoDividendDAO.model_validate(obj) for obj in result.scalars().all()]
+
+    async def columns_model_construct(session: AsyncSession) -> list[TaoDividendDAO]:
+        columns = TaoDividendTable(session)._columns
+        names = [column.key for column in columns]
+        result = await session.execute(
+            select(*columns).where(TaoDividendModel.block == block)
+        )
+        return [
+            TaoDividendDAO.model_construct(**dict(zip(names, row))) for row in result.all()
+        ]
+
+    async def filter(session: AsyncSession) -> list[TaoDividendDAO]:
+        return await TaoDividendTable(session).filter(block=block)
+
+    async def iterate(session: AsyncSession) -> list[TaoDividendDAO]:
+        return [
+            dividend
+            async for dividend in TaoDividendTable(session).iterate(
+                batch_size=5000, block=block
+            )
+        ]
+
+    methods: list[
+        tuple[str, Callable[[AsyncSession], Awaitable[list[TaoDividendDAO]]]]
+    ] = [
+        ("ORM + model_validate", orm_model_validate),
+        ("columns + model_construct", columns_model_construct),
+        ("filter", filter),
+        ("iterate", iterate),
+    ]
+
+    print(f"{count} dividends, {engine.dialect.name}+{engine.dialect.driver}")
+    for name, method in methods:
+        async with session_factory() as session:
+            start = time.perf_counter()
+            dividends = await method(session)
+            elapsed = time.perf_counter() - start
+        assert len(dividends) == count, f"{name} read {len(dividends)} dividends"
+        print(f"{name:<26} {elapsed * 1000:9.1f}ms {count / elapsed:10.0f} rows/s")
+
+    async with session_factory() as session:
+        await session.execute(delete(TaoDividendModel).where(TaoDividendModel.block == block))
+        await session.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,6 +5,7 @@ from pathlib import Path
 
 from mytask.common.base import MyTaskBaseModel
 from mytask.common.table import get_async_engine
+from mytask.tables.tao import maintain_tao_dividend_partitions
 
 # Dynamically import all modules under mytask.models
 for _, name, ispkg in pkgutil.iter_modules(
@@ -20,6 +21,8 @@ async def create_tables():
     # Create tables using the engine
     async with engine.begin() as conn:
         await conn.run_sync(MyTaskBaseModel.metadata.create_all)
+    # Partitioned tables can't be written to before their partitions exist
+    await maintain_tao_dividend_partitions()
 
 
 asyncio.run(create_tables())